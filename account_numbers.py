@@ -0,0 +1,112 @@
+"""
+Account number allocation and lookup.
+
+Numbers are 'VIT', a 12-digit sequence value and a Luhn check digit. Sequence
+values come from the single-row account_number_sequence table, so allocating
+a number is one UPDATE with no probe queries, and concurrent callers can never
+receive the same value. Python and SQL (format_account_number() in
+schema.sql) produce identical numbers.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+
+ACCOUNT_NUMBER_RE = re.compile(r'^VIT[0-9]{13}$')
+# Transfer recipients remembered by RecipientCache
+RECIPIENT_CACHE_SIZE = int(os.environ.get('RECIPIENT_CACHE_SIZE', 10_000))
+
+
+def luhn_check_digit(digits):
+    """Check digit that makes digits + check pass the Luhn test"""
+    total = 0
+    for position, char in enumerate(reversed(digits)):
+        d = int(char)
+        if position % 2 == 0:
+            d *= 2
+            if d > 9:
+                d -= 9
+        total += d
+    return (10 - total % 10) % 10
+
+
+def format_account_number(seq):
+    digits = f"{seq:012d}"
+    return f"VIT{digits}{luhn_check_digit(digits)}"
+
+
+def has_valid_check_digit(account_number):
+    """
+    True if the number's last digit matches its Luhn check digit.
+
+    Numbers issued before the sequence allocator have random last digits, so
+    a mismatch means "possibly mistyped", not "invalid".
+    """
+    if not isinstance(account_number, str) or not ACCOUNT_NUMBER_RE.match(account_number):
+        return False
+    return luhn_check_digit(account_number[3:15]) == int(account_number[15])
+
+
+def recipient_not_found_message(account_number):
+    if has_valid_check_digit(account_number):
+        return 'Recipient account not found'
+    return 'Recipient account not found. Please check the account number for typos'
+
+
+def reserve_account_numbers(conn, count):
+    """
+    Reserve `count` consecutive numbers in one statement and commit at once,
+    so the sequence row is locked only for that statement. Unused numbers
+    are simply skipped.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "UPDATE account_number_sequence SET next_value = LAST_INSERT_ID(next_value + %s) WHERE id = 1",
+            (count,)
+        )
+        # LAST_INSERT_ID(expr) is reported back as the statement's insert id
+        end = cursor.lastrowid
+        conn.commit()
+    finally:
+        cursor.close()
+    return [format_account_number(seq) for seq in range(end - count, end)]
+
+
+class RecipientCache:
+    """
+    Least-recently-used map of account_number -> {account_id, user_id,
+    account_type, currency} for transfer recipients, so a repeat transfer
+    skips the lookup query.
+
+    None of these columns change once an account exists. Status is not
+    cached: only active accounts are stored, and transfer_money checks both
+    accounts' status under lock in any case.
+    """
+
+    def __init__(self, max_size=RECIPIENT_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, account_number):
+        with self._lock:
+            account = self._entries.get(account_number)
+            if account is not None:
+                self._entries.move_to_end(account_number)
+            return account
+
+    def put(self, account_number, account):
+        entry = {key: account[key] for key in ('account_id', 'user_id', 'account_type', 'currency')}
+        with self._lock:
+            self._entries[account_number] = entry
+            self._entries.move_to_end(account_number)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, account_number):
+        with self._lock:
+            self._entries.pop(account_number, None)
+
+
+recipient_cache = RecipientCache()
@@ -0,0 +1,286 @@
+"""
+Paginated admin listings of all accounts and all loans.
+
+Pages are read with keyset cursors: each page seeks past the (sort column,
+id) of the previous page's last row, so the hundredth page costs the same as
+the first. Every sortable column and every search has an index behind it
+(see database/migrations/010_admin_listing_indexes.sql):
+
+  - sort columns: accounts by account_id, account_number or balance; loans
+    by applied_at, loan_amount or loan_id. Accounts are not sortable by
+    customer name: a customer can own several accounts, so no single index
+    gives the (name, account_id) order
+  - `q` searches by prefix. An account number ('VIT...' or digits) uses
+    accounts.account_number, anything with an '@' uses users.email, and
+    anything else users.full_name
+
+A hot account is sorted and filtered by accounts.balance, without the
+credits still in its balance slots; the balance shown includes them.
+"""
+import base64
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from approvals import ACCOUNT_TYPES, LOAN_TYPES
+from codec import codec_for
+from hot_accounts import ACCOUNT_BALANCE_SQL, ACCOUNT_ROLLUPS_JOIN
+
+ADMIN_PAGE_SIZE = 50
+ADMIN_MAX_PAGE_SIZE = 200
+CURSOR_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+ACCOUNT_STATUSES = ('pending', 'active', 'suspended', 'closed')
+LOAN_STATUSES = ('pending', 'approved', 'rejected', 'disbursed', 'closed')
+
+ACCOUNT_NUMBER_PREFIX = re.compile(r'^(VIT)?\d+$', re.IGNORECASE)
+CURRENCY = re.compile(r'^[A-Z]{3}$')
+
+
+def _parse_datetime(value):
+    return datetime.strptime(value, CURSOR_DATETIME_FORMAT)
+
+
+# Sort name -> (column, type of its cursor value); the first is the default
+ACCOUNT_SORTS = {
+    'account_id': ('a.account_id', int),
+    'account_number': ('a.account_number', str),
+    'balance': ('a.balance', Decimal),
+}
+LOAN_SORTS = {
+    'applied_at': ('l.applied_at', _parse_datetime),
+    'loan_amount': ('l.loan_amount', Decimal),
+    'loan_id': ('l.loan_id', int),
+}
+
+
+def encode_listing_cursor(sort, descending, row, id_field):
+    """Opaque keyset cursor for the last row of a listing page"""
+    value = row['sort_key']
+    if isinstance(value, datetime):
+        value = value.strftime(CURSOR_DATETIME_FORMAT)
+    key = f"{sort}|{'desc' if descending else 'asc'}|{row[id_field]}|{value}"
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+
+def decode_listing_cursor(cursor_value, sorts, sort, descending):
+    """
+    Return (sort value, id) from a listing cursor. A cursor is only valid
+    for the sort and order it was issued for.
+    """
+    try:
+        cursor_sort, order, id_part, value = base64.urlsafe_b64decode(cursor_value.encode()).decode().split('|', 3)
+        if cursor_sort != sort or order != ('desc' if descending else 'asc'):
+            raise ValueError
+        return sorts[sort][1](value), int(id_part)
+    except (ValueError, UnicodeDecodeError, InvalidOperation):
+        raise ValueError('Invalid cursor')
+
+
+def parse_listing_page(args, sorts):
+    """Validate limit, sort, order and cursor; returns (limit, sort, descending, after)"""
+    limit = min(int(args.get('limit', ADMIN_PAGE_SIZE)), ADMIN_MAX_PAGE_SIZE)
+    if limit <= 0:
+        raise ValueError('Invalid page size')
+    sort = args.get('sort') or next(iter(sorts))
+    if sort not in sorts:
+        raise ValueError('Invalid sort column')
+    order = args.get('order') or 'desc'
+    if order not in ('asc', 'desc'):
+        raise ValueError('Invalid order')
+    descending = order == 'desc'
+    after = decode_listing_cursor(args['cursor'], sorts, sort, descending) if args.get('cursor') else None
+    return limit, sort, descending, after
+
+
+def _parse_choices(value, choices, name):
+    values = [v for v in value.split(',') if v]
+    if any(v not in choices for v in values):
+        raise ValueError(f'Invalid {name}')
+    return values
+
+
+def _parse_amount(value, name):
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f'Invalid {name}')
+
+
+def _parse_search(value):
+    value = value.strip()
+    if not value:
+        return None
+    if ACCOUNT_NUMBER_PREFIX.match(value):
+        return 'account_number', value
+    if '@' in value:
+        return 'email', value
+    return 'full_name', value
+
+
+def parse_account_filters(args):
+    """Validate the status, type, currency, balance range and search filters"""
+    filters = {}
+    if args.get('status'):
+        filters['statuses'] = _parse_choices(args['status'], ACCOUNT_STATUSES, 'status')
+    if args.get('account_type'):
+        filters['account_types'] = _parse_choices(args['account_type'], ACCOUNT_TYPES, 'account_type')
+    if args.get('currency'):
+        if not CURRENCY.match(args['currency'].upper()):
+            raise ValueError('Invalid currency')
+        filters['currency'] = args['currency'].upper()
+    if args.get('min_balance'):
+        filters['min_balance'] = _parse_amount(args['min_balance'], 'min_balance')
+    if args.get('max_balance'):
+        filters['max_balance'] = _parse_amount(args['max_balance'], 'max_balance')
+    if args.get('q'):
+        filters['search'] = _parse_search(args['q'])
+    return filters
+
+
+def parse_loan_filters(args):
+    """Validate the status, type, amount range and search filters"""
+    filters = {}
+    if args.get('status'):
+        filters['statuses'] = _parse_choices(args['status'], LOAN_STATUSES, 'status')
+    if args.get('loan_type'):
+        filters['loan_types'] = _parse_choices(args['loan_type'], LOAN_TYPES, 'loan_type')
+    if args.get('min_amount'):
+        filters['min_amount'] = _parse_amount(args['min_amount'], 'min_amount')
+    if args.get('max_amount'):
+        filters['max_amount'] = _parse_amount(args['max_amount'], 'max_amount')
+    if args.get('q'):
+        filters['search'] = _parse_search(args['q'])
+    return filters
+
+
+def _like_prefix(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def _in(column, values, conditions, params):
+    conditions.append(f"{column} IN ({', '.join(['%s'] * len(values))})")
+    params.extend(values)
+
+
+def _search(search, conditions, params):
+    if search:
+        field, value = search
+        column = 'a.account_number' if field == 'account_number' else f'u.{field}'
+        conditions.append(f"{column} LIKE %s")
+        params.append(_like_prefix(value))
+
+
+def _page(sql, conditions, params, column, id_column, descending, after, limit):
+    """Add the keyset seek, ORDER BY and LIMIT to a listing query"""
+    order = 'DESC' if descending else 'ASC'
+    seek = '<' if descending else '>'
+    if after and column == id_column:
+        conditions.append(f"{id_column} {seek} %s")
+        params.append(after[1])
+    elif after:
+        conditions.append(f"({column} {seek} %s OR ({column} = %s AND {id_column} {seek} %s))")
+        params.extend([after[0], after[0], after[1]])
+    if conditions:
+        sql += f"\n        WHERE {' AND '.join(conditions)}"
+    order_by = f"{column} {order}" if column == id_column else f"{column} {order}, {id_column} {order}"
+    sql += f"\n        ORDER BY {order_by}\n        LIMIT %s"
+    params.append(limit)
+    return sql, params
+
+
+def build_accounts_query(filters, sort='account_id', descending=True, after=None, limit=ADMIN_PAGE_SIZE):
+    """
+    One page of all accounts, with the columns of the account_summary view.
+    `after` is a (sort value, account_id) keyset position.
+    """
+    column = ACCOUNT_SORTS[sort][0]
+    conditions = []
+    params = []
+    if filters.get('statuses'):
+        _in('a.status', filters['statuses'], conditions, params)
+    if filters.get('account_types'):
+        _in('a.account_type', filters['account_types'], conditions, params)
+    if filters.get('currency'):
+        conditions.append("a.currency = %s")
+        params.append(filters['currency'])
+    if 'min_balance' in filters:
+        conditions.append("a.balance >= %s")
+        params.append(filters['min_balance'])
+    if 'max_balance' in filters:
+        conditions.append("a.balance <= %s")
+        params.append(filters['max_balance'])
+    _search(filters.get('search'), conditions, params)
+
+    sql = f"""
+        SELECT
+            a.account_id,
+            a.account_number,
+            a.account_type,
+            {ACCOUNT_BALANCE_SQL} as balance,
+            a.currency,
+            a.status,
+            u.full_name,
+            u.email,
+            u.phone,
+            COALESCE(r.transaction_count, 0) as transaction_count,
+            COALESCE(r.total_credits, 0) as total_credits,
+            COALESCE(r.total_debits, 0) as total_debits,
+            r.last_activity,
+            {column} as sort_key
+        FROM accounts a
+        JOIN users u ON a.user_id = u.user_id
+        {ACCOUNT_ROLLUPS_JOIN}"""
+    return _page(sql, conditions, params, column, 'a.account_id', descending, after, limit)
+
+
+def build_loans_query(filters, sort='applied_at', descending=True, after=None, limit=ADMIN_PAGE_SIZE):
+    """One page of all loans. `after` is a (sort value, loan_id) keyset position."""
+    column = LOAN_SORTS[sort][0]
+    conditions = []
+    params = []
+    if filters.get('statuses'):
+        _in('l.status', filters['statuses'], conditions, params)
+    if filters.get('loan_types'):
+        _in('l.loan_type', filters['loan_types'], conditions, params)
+    if 'min_amount' in filters:
+        conditions.append("l.loan_amount >= %s")
+        params.append(filters['min_amount'])
+    if 'max_amount' in filters:
+        conditions.append("l.loan_amount <= %s")
+        params.append(filters['max_amount'])
+    _search(filters.get('search'), conditions, params)
+
+    sql = f"""
+        SELECT
+            l.loan_id,
+            l.loan_type,
+            l.loan_amount,
+            l.interest_rate,
+            l.tenure_months,
+            l.monthly_emi,
+            l.status,
+            u.full_name,
+            u.email,
+            a.account_number,
+            l.applied_at,
+            {column} as sort_key
+        FROM loans l
+        JOIN users u ON l.user_id = u.user_id
+        JOIN accounts a ON l.account_id = a.account_id"""
+    return _page(sql, conditions, params, column, 'l.loan_id', descending, after, limit)
+
+
+def listing_page(cursor, sql, params, limit, sort, descending, id_field):
+    """
+    Run a listing query built with limit + 1 on a plain cursor and return
+    (rows, has_more, next_cursor). The rows are response dicts without the
+    sort_key column.
+    """
+    cursor.execute(sql, params)
+    codec = codec_for(cursor.description, omit=('sort_key',))
+    rows = cursor.fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_listing_cursor(sort, descending, codec.raw(rows[-1]), id_field) if has_more else None
+    return codec.rows(rows), has_more, next_cursor
@@ -0,0 +1,117 @@
+"""
+Vectorised loan amortisation.
+
+Schedules for many loans are computed together, one month at a time, with
+numpy arrays of integer paise. Interest uses the same monthly rate as
+calculate_emi() in schema.sql: the annual rate / 1200 rounded to 6 decimal
+places. That rate is held as an integer number of millionths, so every
+interest amount is rounded half-up exactly, just as Decimal would round it,
+and no floating-point error builds up over the life of a loan.
+
+The stored monthly_emi is rounded to paise, so a schedule never comes out
+exactly even. The final installment settles whatever balance remains. The
+principal columns therefore always sum to the loan amount, and the final
+payment differs from monthly_emi by a few paise at most.
+"""
+from collections import namedtuple
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+
+CENTS = Decimal('0.01')
+RATE_SCALE = 1_000_000
+
+Schedule = namedtuple('Schedule', ['payment', 'principal', 'interest', 'balance'])
+
+
+def to_cents(amount):
+    """Decimal rupees to integer paise"""
+    return int((Decimal(amount) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents):
+    return (Decimal(int(cents)) / 100).quantize(CENTS)
+
+
+def monthly_rate_micros(annual_rates):
+    """
+    Monthly rates in millionths, rounded like calculate_emi()'s DECIMAL(10,6)
+    monthly_rate. `annual_rates` are percentages with at most 2 decimals
+    (loans.interest_rate is DECIMAL(5,2)).
+    """
+    basis_points = np.array([to_cents(rate) for rate in annual_rates], dtype=np.int64)
+    # rate / 1200 * 10^6 == basis_points * 25 / 3, rounded half-up
+    return (basis_points * 50 + 3) // 6
+
+
+def emi_cents(principal_cents, rate_micros, months):
+    """EMI in paise, as calculate_emi() computes it, for loans without a stored monthly_emi"""
+    principal = np.asarray(principal_cents, dtype=np.float64)
+    rate = np.asarray(rate_micros, dtype=np.float64) / RATE_SCALE
+    months = np.asarray(months, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = np.power(1 + rate, months)
+        emi = np.where(rate == 0, principal / months, principal * rate * growth / (growth - 1))
+    return np.rint(emi).astype(np.int64)
+
+
+def amortise(principal_cents, rate_micros, emi, tenures, months=None):
+    """
+    Schedules for many loans at once.
+
+    All arguments are 1-D arrays with one entry per loan; amounts are in
+    paise. Returns a Schedule of (loans x months) int64 arrays, where column
+    m is installment m + 1 and `balance` is the outstanding principal after
+    that installment. `months` limits how many installments are computed
+    (default: the longest tenure). Installments past a loan's tenure are zero.
+    """
+    principal_cents = np.asarray(principal_cents, dtype=np.int64)
+    rate_micros = np.asarray(rate_micros, dtype=np.int64)
+    emi = np.asarray(emi, dtype=np.int64)
+    tenures = np.asarray(tenures, dtype=np.int64)
+    count = len(principal_cents)
+    if months is None:
+        months = int(tenures.max()) if count else 0
+
+    # balance * rate must fit in int64; fall back to Python integers if not
+    dtype = np.int64
+    if count and int(principal_cents.max()) * int(rate_micros.max()) >= 2 ** 62:
+        dtype = object
+        principal_cents, rate_micros, emi = (a.astype(object) for a in (principal_cents, rate_micros, emi))
+
+    payment = np.zeros((count, months), dtype=dtype)
+    principal = np.zeros((count, months), dtype=dtype)
+    interest = np.zeros((count, months), dtype=dtype)
+    balance = np.zeros((count, months), dtype=dtype)
+
+    outstanding = principal_cents.copy()
+    for m in range(months):
+        active = tenures > m
+        last = tenures == m + 1
+        # Exact half-up rounding of outstanding * rate / 10^6
+        month_interest = (outstanding * rate_micros + RATE_SCALE // 2) // RATE_SCALE
+        month_principal = np.minimum(np.maximum(emi - month_interest, 0), outstanding)
+        month_principal = np.where(last, outstanding, month_principal)
+        month_interest = np.where(active, month_interest, 0)
+        month_principal = np.where(active, month_principal, 0)
+
+        outstanding = outstanding - month_principal
+        interest[:, m] = month_interest
+        principal[:, m] = month_principal
+        payment[:, m] = month_interest + month_principal
+        balance[:, m] = outstanding
+
+    return Schedule(payment, principal, interest, balance)
+
+
+def installments(schedule, numbers, rows=None):
+    """
+    Row i's installment `numbers[i]` (1-based) as Decimal
+    (payment, principal, interest, remaining_balance) tuples. With `rows`,
+    row `rows[i]`'s installment `numbers[i]` instead.
+    """
+    rows = np.arange(len(numbers)) if rows is None else np.asarray(rows, dtype=np.int64)
+    columns = np.asarray(numbers, dtype=np.int64) - 1
+    picked = [part[rows, columns] for part in (schedule.payment, schedule.principal,
+                                               schedule.interest, schedule.balance)]
+    return [tuple(from_cents(value) for value in values) for values in zip(*picked)]
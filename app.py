@@ -1,30 +1,120 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
-import mysql.connector
+from flask import Flask, Response, g, render_template, request, jsonify, session, redirect, url_for
 from mysql.connector import Error
-from datetime import datetime
+from datetime import datetime, timedelta
+import base64
+import csv
+import io
+import itertools
+import json
 import os
+import time
+import zlib
+
+import metrics
+from account_numbers import recipient_cache, recipient_not_found_message
+from admin_listings import (ACCOUNT_SORTS, LOAN_SORTS, build_accounts_query, build_loans_query, listing_page,
+                            parse_account_filters, parse_listing_page, parse_loan_filters)
+from approvals import (ACCOUNT_TYPES, LOAN_TYPES, approve_accounts, decide_loans, parse_bulk_filter,
+                       parse_ids, pending_ids)
+from audit import (AUDIT_DATETIME_FORMAT, AUDIT_MAX_PAGE_SIZE, AUDIT_PAGE_SIZE, audit_log,
+                   build_audit_query, decode_audit_cursor, encode_audit_cursor)
+from change_feed import FEED_HEARTBEAT, change_feed
+from codec import JSONProvider, codec_for, fetch_rows
+from db import DB_STICKY_SECONDS, call_procedure, db_pool, get_db_connection, replica_set
+from hot_accounts import ACCOUNT_BALANCE_SQL, slot_consolidator
+from rates import RateUnavailable, rate_service
+from response_cache import owners, response_cache
+from stats import admin_stats
+from transaction_archive import transaction_archive
+from transfers import BATCH_DEFAULT_CHUNK, BATCH_MAX_ITEMS, execute_transfer_batch
 
 app = Flask(__name__)
 app.secret_key = 'vit_bank_secret_key_2024'
 
-# Database configuration
-DB_CONFIG = {
-    'host': '127.0.0.1',
-    'port': '3306',
-    'user': 'root',
-    'password': 'password',  # Update with your MySQL password
-    'database': 'bank_of_vit'
-}
 
+class TimedJSONProvider(JSONProvider):
+    """Records how long each response spends in JSON encoding"""
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            metrics.JSON_ENCODE_SECONDS.observe(time.perf_counter() - started, metrics.current_endpoint.get())
+
+
+app.json = TimedJSONProvider(app) if metrics.METRICS_ENABLED else JSONProvider(app)
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def format_dates(row, *fields):
+    """Convert the given datetime columns of a row to strings in place"""
+    for field in fields:
+        if row.get(field):
+            row[field] = row[field].strftime(DATETIME_FORMAT)
+    return row
+
+
+def cached_user_response(key, build):
+    """
+    Serve one of the user's dashboard reads from response_cache, building
+    it with `build()` (which returns the response dict) on a miss. Only
+    successful responses are cached. Answers If-None-Match with 304.
+    """
+    user_id = session['user_id']
+    entry = response_cache.get(user_id, key)
+    if entry is None:
+        snapshot = response_cache.snapshot(user_id)
+        payload = build()
+        if not payload.get('success'):
+            return jsonify(payload)
+        entry = response_cache.put(user_id, key, snapshot, app.json.dumps(payload).encode())
+
+    headers = {'ETag': f'"{entry.etag}"', 'Cache-Control': 'private, no-cache', 'Vary': 'Cookie'}
+    if request.if_none_match.contains(entry.etag):
+        return Response(status=304, headers=headers)
+    return Response(entry.body, mimetype='application/json', headers=headers)
+
+
+@app.before_request
+def start_request_timer():
+    if metrics.METRICS_ENABLED:
+        g.request_started = time.perf_counter()
+        metrics.current_endpoint.set(request.endpoint or '-')
+
+
+@app.after_request
+def record_request_time(response):
+    if metrics.METRICS_ENABLED and 'request_started' in g:
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - g.request_started,
+                                        request.endpoint or '-', request.method, str(response.status_code))
+    return response
+
+
+def after_write(user_ids):
+    """
+    Call once a write has committed: drops the cached responses of the
+    affected users, marks the admin dashboard totals stale, and reads this
+    session's own write from the primary until the replicas catch up
+    (DB_STICKY_SECONDS).
+    """
+    response_cache.bump(user_ids)
+    admin_stats.invalidate()
+    session['primary_until'] = time.time() + DB_STICKY_SECONDS
+
+
+def read_connection():
+    """
+    Connection for a read-only route: a replica, unless this session wrote
+    in the last DB_STICKY_SECONDS or someone else's write just changed the
+    user's accounts or loans (a transfer in, an approval).
+    """
+    recent = session.get('primary_until', 0) > time.time()
+    if not recent and 'user_id' in session:
+        recent = response_cache.changed_within(session['user_id'], DB_STICKY_SECONDS)
+    return get_db_connection(readonly=not recent)
 
-def get_db_connection():
-    """Create database connection"""
-    try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        return connection
-    except Error as e:
-        print(f"Error connecting to MySQL: {e}")
-        return None
 
 # ============================================
 # HOME ROUTES
@@ -77,6 +167,7 @@ def login():
             session['user_id'] = user['user_id']
             session['user_name'] = user['full_name']
             session['user_type'] = 'user'
+            audit_log.record('user', user['user_id'], 'login', 'user', user['user_id'])
             return jsonify({'success': True, 'message': 'Login successful'})
         else:
             return jsonify({'success': False, 'message': 'Invalid credentials or inactive account'})
@@ -109,6 +200,7 @@ def admin_login():
             session['admin_id'] = admin['admin_id']
             session['admin_name'] = admin['full_name']
             session['user_type'] = 'admin'
+            audit_log.record('admin', admin['admin_id'], 'login', 'admin', admin['admin_id'])
             return jsonify({'success': True, 'message': 'Admin login successful'})
         else:
             return jsonify({'success': False, 'message': 'Invalid admin credentials'})
@@ -131,7 +223,8 @@ def register():
         cursor = conn.cursor()
         
         # Call stored procedure
-        cursor.callproc('register_user', [
+        # OUT parameters: user_id, message
+        result = call_procedure(cursor, 'register_user', [
             data.get('email'),
             data.get('password'),
             data.get('full_name'),
@@ -139,21 +232,15 @@ def register():
             data.get('address'),
             data.get('dob'),
             data.get('aadhar'),
-            data.get('pan'),
-            0,  # OUT parameter for user_id
-            ''  # OUT parameter for message
-        ])
-
-        # Fetch OUT parameters
-        cursor.execute("SELECT @_register_user_8, @_register_user_9")
-        result = cursor.fetchone()
-        conn.commit()
+            data.get('pan')
+        ], 2)
 
         user_id = result[0] if result else None
         message = result[1] if result else 'Registration failed'
 
         # Handle None values properly
         if user_id is not None and user_id > 0:
+            admin_stats.invalidate()
             return jsonify({'success': True, 'message': message, 'user_id': user_id})
         else:
             return jsonify({'success': False, 'message': message or 'Registration failed'})
@@ -192,32 +279,31 @@ def get_user_accounts():
         return jsonify({'success': False, 'message': 'Not authenticated'})
 
     user_id = session['user_id']
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'success': False, 'message': 'Database connection failed'})
 
-    try:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT account_id, account_number, account_type, balance, 
-                   currency, status, created_at
-            FROM accounts 
-            WHERE user_id = %s
-            ORDER BY created_at DESC
-        """, (user_id,))
-        accounts = cursor.fetchall()
-
-        # Convert datetime to string
-        for account in accounts:
-            if account['created_at']:
-                account['created_at'] = account['created_at'].strftime('%Y-%m-%d %H:%M:%S')
+    def build():
+        conn = read_connection()
+        if not conn:
+            return {'success': False, 'message': 'Database connection failed'}
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT a.account_id, a.account_number, a.account_type, {ACCOUNT_BALANCE_SQL} as balance,
+                       a.currency, a.status, a.created_at
+                FROM accounts a
+                WHERE a.user_id = %s
+                ORDER BY a.created_at DESC
+            """, (user_id,))
+            accounts = fetch_rows(cursor)
+
+            return {'success': True, 'accounts': accounts}
+        except Error as e:
+            return {'success': False, 'message': str(e)}
+        finally:
+            cursor.close()
+            conn.close()
 
-        return jsonify({'success': True, 'accounts': accounts})
-    except Error as e:
-        return jsonify({'success': False, 'message': str(e)})
-    finally:
-        cursor.close()
-        conn.close()
+    return cached_user_response('accounts', build)
 
 
 @app.route('/api/user/create-account', methods=['POST'])
@@ -235,24 +321,15 @@ def create_account():
 
     try:
         cursor = conn.cursor()
-        cursor.callproc('create_account', [
-            user_id,
-            account_type,
-            0,   # OUT parameter for account_id
-            '',  # OUT parameter for account_number
-            ''   # OUT parameter for message
-        ])
-
-        # Fetch OUT parameters
-        cursor.execute("SELECT @_create_account_2, @_create_account_3, @_create_account_4")
-        result = cursor.fetchone()
-        conn.commit()
+        # OUT parameters: account_id, account_number, message
+        result = call_procedure(cursor, 'create_account', [user_id, account_type], 3)
 
         account_id = result[0] if result else None
         account_number = result[1] if result else None
         message = result[2] if result else 'Account creation failed'
 
         if account_id and account_id > 0:
+            after_write([user_id])
             return jsonify({
                 'success': True,
                 'message': message,
@@ -270,34 +347,303 @@ def create_account():
         conn.close()
 
 
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+TRANSACTION_TYPES = ('deposit', 'withdrawal', 'transfer', 'international_transfer')
+
+
+def encode_history_cursor(row):
+    """Opaque keyset cursor for the last row of a history page"""
+    key = f"{row['transaction_date'].strftime(DATETIME_FORMAT)}|{row['transaction_id']}"
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+
+def decode_history_cursor(cursor_value):
+    """Return (transaction_date, transaction_id) from a history cursor"""
+    try:
+        date_part, id_part = base64.urlsafe_b64decode(cursor_value.encode()).decode().split('|')
+        return datetime.strptime(date_part, DATETIME_FORMAT), int(id_part)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+
+
+def parse_history_filters(args):
+    """Validate the date range and type filters of a history request"""
+    filters = {}
+
+    if args.get('from_date'):
+        filters['from_date'] = datetime.strptime(args['from_date'], '%Y-%m-%d')
+    if args.get('to_date'):
+        # to_date is inclusive, so compare against the start of the next day
+        filters['to_date'] = datetime.strptime(args['to_date'], '%Y-%m-%d') + timedelta(days=1)
+
+    if args.get('type'):
+        types = [t for t in args['type'].split(',') if t]
+        if any(t not in TRANSACTION_TYPES for t in types):
+            raise ValueError('Invalid transaction type')
+        filters['types'] = types
+
+    direction = args.get('direction')
+    if direction:
+        if direction not in ('credit', 'debit'):
+            raise ValueError('Invalid direction')
+        filters['direction'] = direction
+
+    return filters
+
+
+def build_history_query(account_id, filters, after=None, limit=None, descending=True):
+    """
+    Build the transaction history query for one account.
+
+    Debits and credits are read by separate UNION ALL branches so each one
+    walks the (from_account, transaction_date) or (to_account, transaction_date)
+    index in order instead of evaluating an OR over the whole table. `after` is
+    a (transaction_date, transaction_id) keyset position; each branch seeks
+    straight to it, so every page costs the same however deep it is.
+    """
+    order = 'DESC' if descending else 'ASC'
+    seek = '<' if descending else '>'
+
+    branches = []
+    params = []
+    for direction, own_column, other_column, label in (
+        ('debit', 'from_account', 'to_account', 'Debit'),
+        ('credit', 'to_account', 'from_account', 'Credit'),
+    ):
+        if filters.get('direction') not in (None, direction):
+            continue
+
+        conditions = [f"t.{own_column} = %s"]
+        branch_params = [account_id]
+
+        if direction == 'credit':
+            # A self-transfer is listed once, as a debit
+            conditions.append("(t.from_account IS NULL OR t.from_account <> %s)")
+            branch_params.append(account_id)
+        if 'from_date' in filters:
+            conditions.append("t.transaction_date >= %s")
+            branch_params.append(filters['from_date'])
+        if 'to_date' in filters:
+            conditions.append("t.transaction_date < %s")
+            branch_params.append(filters['to_date'])
+        if filters.get('types'):
+            conditions.append(f"t.transaction_type IN ({', '.join(['%s'] * len(filters['types']))})")
+            branch_params.extend(filters['types'])
+        if after:
+            conditions.append(
+                f"(t.transaction_date {seek} %s OR (t.transaction_date = %s AND t.transaction_id {seek} %s))"
+            )
+            branch_params.extend([after[0], after[0], after[1]])
+
+        branch = f"""
+            SELECT
+                t.transaction_id,
+                t.transaction_type,
+                t.amount,
+                t.fee,
+                t.description,
+                t.transaction_date,
+                t.status,
+                '{label}' as type,
+                a.account_number as other_account
+            FROM transactions t
+            LEFT JOIN accounts a ON a.account_id = t.{other_column}
+            WHERE {' AND '.join(conditions)}
+            ORDER BY t.transaction_date {order}, t.transaction_id {order}"""
+        if limit:
+            branch += "\n            LIMIT %s"
+            branch_params.append(limit)
+
+        branches.append(f"({branch}\n        )")
+        params.extend(branch_params)
+
+    sql = "\n        UNION ALL\n        ".join(branches)
+    sql += f"\n        ORDER BY transaction_date {order}, transaction_id {order}"
+    if limit:
+        sql += "\n        LIMIT %s"
+        params.append(limit)
+
+    return sql, params
+
+
+def live_history_filters(filters, archived):
+    """`filters` limited to the months still in MySQL; older months come from `archived`"""
+    if archived.live_since is None:
+        return filters
+    return {**filters, 'from_date': max(filters.get('from_date', archived.live_since), archived.live_since)}
+
+
 @app.route('/api/user/transactions/<int:account_id>', methods=['GET'])
 def get_transactions(account_id):
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Not authenticated'})
 
-    conn = get_db_connection()
+    try:
+        limit = min(int(request.args.get('limit', HISTORY_PAGE_SIZE)), HISTORY_MAX_PAGE_SIZE)
+        if limit <= 0:
+            raise ValueError('Invalid page size')
+        after = decode_history_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        filters = parse_history_filters(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+    def build():
+        conn = read_connection()
+        if not conn:
+            return {'success': False, 'message': 'Database connection failed'}
+
+        try:
+            cursor = conn.cursor()
+            archived = transaction_archive.current()
+
+            # Fetch one extra row to know whether another page exists
+            sql, params = build_history_query(account_id, live_history_filters(filters, archived), after, limit + 1)
+            cursor.execute(sql, params)
+            codec = codec_for(cursor.description)
+            transactions = cursor.fetchall()
+            if len(transactions) <= limit:
+                # The page continues into the archived months
+                transactions += map(codec.to_tuple,
+                                    archived.history(account_id, filters, after, limit + 1 - len(transactions)))
+
+            has_more = len(transactions) > limit
+            transactions = transactions[:limit]
+            next_cursor = encode_history_cursor(codec.raw(transactions[-1])) if has_more else None
+
+            return {
+                'success': True,
+                'transactions': codec.rows(transactions),
+                'has_more': has_more,
+                'next_cursor': next_cursor
+            }
+        except Error as e:
+            return {'success': False, 'message': str(e)}
+        finally:
+            cursor.close()
+            conn.close()
+
+    return cached_user_response(('transactions', account_id, request.query_string), build)
+
+
+STATEMENT_COLUMNS = ('transaction_id', 'transaction_date', 'type', 'transaction_type', 'amount',
+                     'fee', 'description', 'other_account', 'status')
+STATEMENT_FETCH_SIZE = 500
+
+
+def stream_statement(conn, cursor, fmt, compress, archived_rows=()):
+    """
+    Yield statement rows as CSV or NDJSON while they arrive from the server.
+
+    `archived_rows` (oldest first, read one month file at a time) come
+    before the live rows. The cursor is unbuffered, so rows are pulled from
+    MySQL in batches of STATEMENT_FETCH_SIZE and memory stays flat however
+    long the history is. The connection goes back to the pool when the
+    stream ends or the client disconnects.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def emit(text):
+        data = text.encode('utf-8')
+        return compressor.compress(data) if compressor else data
+
+    try:
+        if fmt == 'csv':
+            writer.writerow(STATEMENT_COLUMNS)
+
+        archived_rows = iter(archived_rows)
+        while True:
+            rows = list(itertools.islice(archived_rows, STATEMENT_FETCH_SIZE)) or cursor.fetchmany(STATEMENT_FETCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                format_dates(row, 'transaction_date')
+                if fmt == 'csv':
+                    writer.writerow([row[column] for column in STATEMENT_COLUMNS])
+                else:
+                    buffer.write(json.dumps({column: row[column] for column in STATEMENT_COLUMNS}, default=str))
+                    buffer.write('\n')
+            chunk = emit(buffer.getvalue())
+            buffer.seek(0)
+            buffer.truncate()
+            if chunk:
+                yield chunk
+
+        if buffer.tell():
+            yield emit(buffer.getvalue())
+        if compressor:
+            yield compressor.flush()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+@app.route('/api/user/statement/<int:account_id>', methods=['GET'])
+def export_statement(account_id):
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'success': False, 'message': 'format must be csv or ndjson'})
+    compress = request.args.get('gzip') in ('1', 'true')
+
+    try:
+        filters = parse_history_filters(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+    conn = read_connection()
     if not conn:
         return jsonify({'success': False, 'message': 'Database connection failed'})
 
     try:
         cursor = conn.cursor(dictionary=True)
-        cursor.callproc('get_user_transactions', [account_id])
-
-        transactions = []
-        for result in cursor.stored_results():
-            transactions = result.fetchall()
-
-        # Convert datetime to string safely
-        for trans in transactions:
-            if 'transaction_date' in trans and trans['transaction_date']:
-                trans['transaction_date'] = trans['transaction_date'].strftime('%Y-%m-%d %H:%M:%S')
+        cursor.execute("SELECT account_number FROM accounts WHERE account_id = %s AND user_id = %s",
+                       (account_id, session['user_id']))
+        account = next(iter(cursor.fetchall()), None)
+        if not account:
+            cursor.close()
+            conn.close()
+            return jsonify({'success': False, 'message': 'Account not found'})
 
-        return jsonify({'success': True, 'transactions': transactions})
+        archived = transaction_archive.current()
+        sql, params = build_history_query(account_id, live_history_filters(filters, archived), descending=False)
+        cursor.execute(sql, params)
     except Error as e:
-        return jsonify({'success': False, 'message': str(e)})
-    finally:
         cursor.close()
         conn.close()
+        return jsonify({'success': False, 'message': str(e)})
+
+    filename = f"statement_{account['account_number']}.{fmt}"
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    if compress:
+        filename += '.gz'
+        mimetype = 'application/gzip'
+
+    return Response(
+        stream_statement(conn, cursor, fmt, compress,
+                         archived.iter_history(account_id, filters, descending=False)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+
+def international_rate(to_account, conn=None):
+    """
+    (rate, version) for a transfer from an INR account to `to_account`, or
+    (None, None) when no conversion applies or no rate is configured (the
+    procedure then rejects the transfer if it needs one). Stale rates are
+    rechecked on `conn` when given.
+    """
+    if to_account['account_type'] != 'international':
+        return None, None
+    try:
+        return rate_service.get('INR', to_account['currency'], conn)
+    except RateUnavailable:
+        return None, None
 
 
 @app.route('/api/user/transfer', methods=['POST'])
@@ -305,6 +651,8 @@ def transfer_money():
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Not authenticated'})
 
+    # Credits that land in hot-account slots are folded in the background
+    slot_consolidator.ensure_running()
     data = request.json
     from_account = data.get('from_account')
     to_account_number = data.get('to_account_number')
@@ -319,44 +667,50 @@ def transfer_money():
         cursor = conn.cursor(dictionary=True)
 
         # Get to_account_id from account_number
-        cursor.execute(
-            "SELECT account_id, status FROM accounts WHERE account_number = %s",
-            (to_account_number,)
-        )
-        to_account = cursor.fetchone()
+        to_account = recipient_cache.get(to_account_number)
+        cached = to_account is not None
+        if not cached:
+            cursor.execute(
+                "SELECT account_id, user_id, status, account_type, currency FROM accounts WHERE account_number = %s",
+                (to_account_number,)
+            )
+            to_account = cursor.fetchone()
 
-        if not to_account:
-            return jsonify({'success': False, 'message': 'Recipient account not found'})
+            if not to_account:
+                return jsonify({'success': False, 'message': recipient_not_found_message(to_account_number)})
 
-        if to_account['status'] != 'active':
-            return jsonify({'success': False, 'message': 'Recipient account is not active'})
+            if to_account['status'] != 'active':
+                return jsonify({'success': False, 'message': 'Recipient account is not active'})
 
         to_account_id = to_account['account_id']
+        rate, rate_version = international_rate(to_account, conn)
 
-        cursor.callproc('transfer_money', [
+        # OUT parameters: transaction_id, message
+        result = call_procedure(cursor, 'transfer_money', [
             from_account,
             to_account_id,
             amount,
             description,
-            0,   # OUT parameter for transaction_id
-            ''   # OUT parameter for message
-        ])
-
-        # Fetch OUT parameters
-        cursor.execute("SELECT @_transfer_money_4, @_transfer_money_5")
-        result = cursor.fetchone()
-        conn.commit()
+            rate,
+            rate_version
+        ], 2)
 
         transaction_id = result[0] if result else None
         message = result[1] if result else 'Transfer failed'
 
         if transaction_id and transaction_id > 0:
+            if not cached:
+                recipient_cache.put(to_account_number, to_account)
+            after_write([session['user_id'], to_account['user_id']])
             return jsonify({
                 'success': True,
                 'message': message,
                 'transaction_id': transaction_id
             })
         else:
+            if cached:
+                # Look the recipient up again next time, in case it was closed
+                recipient_cache.discard(to_account_number)
             return jsonify({'success': False, 'message': message})
     except Error as e:
         if conn:
@@ -367,11 +721,56 @@ def transfer_money():
         conn.close()
 
 
+@app.route('/api/user/transfer/batch', methods=['POST'])
+def transfer_money_batch():
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+
+    data = request.json
+    from_account = data.get('from_account')
+    items = data.get('transfers')
+    atomic = bool(data.get('atomic', False))
+
+    try:
+        from_account = int(from_account)
+        chunk_size = int(data.get('chunk_size', BATCH_DEFAULT_CHUNK))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Invalid source account or chunk size'})
+
+    if not isinstance(items, list) or not items or not all(isinstance(item, dict) for item in items):
+        return jsonify({'success': False, 'message': 'transfers must be a non-empty list'})
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({'success': False, 'message': f'At most {BATCH_MAX_ITEMS} transfers per batch'})
+
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'success': False, 'message': 'Database connection failed'})
+
+    try:
+        results = execute_transfer_batch(conn, session['user_id'], from_account, items, chunk_size, atomic)
+        succeeded = sum(1 for result in results if result['success'])
+        if succeeded:
+            recipients = [result['to_account_number'] for result in results if result['success']]
+            after_write({session['user_id']} | owners(conn, 'accounts', 'account_number', recipients))
+        return jsonify({
+            'success': succeeded > 0,
+            'message': f'{succeeded} of {len(results)} transfers completed',
+            'results': results
+        })
+    except Error as e:
+        conn.rollback()
+        return jsonify({'success': False, 'message': str(e)})
+    finally:
+        conn.close()
+
+
 @app.route('/api/user/deposit', methods=['POST'])
 def deposit_money():
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Not authenticated'})
 
+    # Credits that land in hot-account slots are folded in the background
+    slot_consolidator.ensure_running()
     data = request.json
     account_id = data.get('account_id')
     amount = data.get('amount')
@@ -382,17 +781,13 @@ def deposit_money():
 
     try:
         cursor = conn.cursor()
-        cursor.callproc('deposit_money', [
-            account_id,
-            amount,
-            ''   # OUT parameter for message
-        ])
-
-        cursor.execute("SELECT @_deposit_money_2")
-        result = cursor.fetchone()
-        conn.commit()
+        # OUT parameter: message
+        result = call_procedure(cursor, 'deposit_money', [account_id, amount], 1)
 
         message = result[0] if result else 'Deposit failed'
+        # Any account may be deposited into; the cached views are its owner's
+        if message == 'Deposit successful':
+            after_write(owners(conn, 'accounts', 'account_id', [account_id]))
         return jsonify({'success': True, 'message': message})
     except Error as e:
         if conn:
@@ -417,26 +812,21 @@ def apply_loan():
 
     try:
         cursor = conn.cursor()
-        cursor.callproc('apply_loan', [
+        # OUT parameters: loan_id, message
+        result = call_procedure(cursor, 'apply_loan', [
             user_id,
             data.get('account_id'),
             data.get('loan_type'),
             data.get('loan_amount'),
             data.get('tenure_months'),
-            data.get('purpose'),
-            0,   # OUT parameter for loan_id
-            ''   # OUT parameter for message
-        ])
-
-        # Fetch OUT parameters
-        cursor.execute("SELECT @_apply_loan_6, @_apply_loan_7")
-        result = cursor.fetchone()
-        conn.commit()
+            data.get('purpose')
+        ], 2)
 
         loan_id = result[0] if result else None
         message = result[1] if result else 'Loan application failed'
 
         if loan_id and loan_id > 0:
+            after_write([user_id])
             return jsonify({
                 'success': True,
                 'message': message,
@@ -459,31 +849,28 @@ def get_user_loans():
         return jsonify({'success': False, 'message': 'Not authenticated'})
 
     user_id = session['user_id']
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'success': False, 'message': 'Database connection failed'})
 
-    try:
-        cursor = conn.cursor(dictionary=True)
-        cursor.callproc('get_user_loans', [user_id])
+    def build():
+        conn = read_connection()
+        if not conn:
+            return {'success': False, 'message': 'Database connection failed'}
 
-        loans = []
-        for result in cursor.stored_results():
-            loans = result.fetchall()
+        try:
+            cursor = conn.cursor()
+            cursor.callproc('get_user_loans', [user_id])
 
-        # Convert datetime to string safely
-        for loan in loans:
-            if 'applied_at' in loan and loan['applied_at']:
-                loan['applied_at'] = loan['applied_at'].strftime('%Y-%m-%d %H:%M:%S')
-            if 'approved_at' in loan and loan['approved_at']:
-                loan['approved_at'] = loan['approved_at'].strftime('%Y-%m-%d %H:%M:%S')
+            loans = []
+            for result in cursor.stored_results():
+                loans = fetch_rows(result)
 
-        return jsonify({'success': True, 'loans': loans})
-    except Error as e:
-        return jsonify({'success': False, 'message': str(e)})
-    finally:
-        cursor.close()
-        conn.close()
+            return {'success': True, 'loans': loans}
+        except Error as e:
+            return {'success': False, 'message': str(e)}
+        finally:
+            cursor.close()
+            conn.close()
+
+    return cached_user_response('loans', build)
 
 # ============================================
 # ADMIN DASHBOARD ROUTES
@@ -502,22 +889,17 @@ def get_pending_accounts():
     if 'admin_id' not in session:
         return jsonify({'success': False, 'message': 'Not authenticated'})
 
-    conn = get_db_connection()
+    conn = read_connection()
     if not conn:
         return jsonify({'success': False, 'message': 'Database connection failed'})
 
     try:
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
         cursor.callproc('get_pending_accounts')
 
         accounts = []
         for result in cursor.stored_results():
-            accounts = result.fetchall()
-
-        # Convert datetime to string safely
-        for account in accounts:
-            if 'created_at' in account and account['created_at']:
-                account['created_at'] = account['created_at'].strftime('%Y-%m-%d %H:%M:%S')
+            accounts = fetch_rows(result)
 
         return jsonify({'success': True, 'accounts': accounts})
     except Error as e:
@@ -532,22 +914,17 @@ def get_pending_loans():
     if 'admin_id' not in session:
         return jsonify({'success': False, 'message': 'Not authenticated'})
 
-    conn = get_db_connection()
+    conn = read_connection()
     if not conn:
         return jsonify({'success': False, 'message': 'Database connection failed'})
 
     try:
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
         cursor.callproc('get_pending_loans')
 
         loans = []
         for result in cursor.stored_results():
-            loans = result.fetchall()
-
-        # Convert datetime to string safely
-        for loan in loans:
-            if 'applied_at' in loan and loan['applied_at']:
-                loan['applied_at'] = loan['applied_at'].strftime('%Y-%m-%d %H:%M:%S')
+            loans = fetch_rows(result)
 
         return jsonify({'success': True, 'loans': loans})
     except Error as e:
@@ -557,6 +934,36 @@ def get_pending_loans():
         conn.close()
 
 
+def pending_feed_stream(cursor):
+    """Server-sent events: a batch of queue changes, a reset, or a keep-alive comment"""
+    while True:
+        events, cursor = change_feed.wait(cursor, FEED_HEARTBEAT)
+        if events is None:
+            yield f"id: {cursor}\nevent: reset\ndata: {{}}\n\n"
+        elif events:
+            yield f"id: {cursor}\ndata: {json.dumps(events, default=str)}\n\n"
+        else:
+            yield ": keep-alive\n\n"
+
+
+@app.route('/api/admin/pending-feed', methods=['GET'])
+def pending_feed():
+    """
+    Stream changes to the pending account and loan queues.
+
+    A client without a cursor (or with one that is too old) first receives a
+    `reset` event and should then load the full lists; after that it only
+    receives the items that were added or resolved. EventSource resends the
+    last id as Last-Event-ID when it reconnects.
+    """
+    if 'admin_id' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('cursor')
+    return Response(pending_feed_stream(cursor), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 @app.route('/api/admin/approve-account', methods=['POST'])
 def approve_account():
     if 'admin_id' not in session:
@@ -572,17 +979,13 @@ def approve_account():
 
     try:
         cursor = conn.cursor()
-        cursor.callproc('approve_account', [
-            account_id,
-            admin_id,
-            ''   # OUT parameter for message
-        ])
-
-        cursor.execute("SELECT @_approve_account_2")
-        result = cursor.fetchone()
-        conn.commit()
+        # OUT parameter: message
+        result = call_procedure(cursor, 'approve_account', [account_id, admin_id], 1)
 
         message = result[0] if result else 'Approval failed'
+        # approve_account audits the status change in its own transaction
+        if message == 'Account approved successfully':
+            after_write(owners(conn, 'accounts', 'account_id', [account_id]))
         return jsonify({'success': True, 'message': message})
     except Error as e:
         if conn:
@@ -593,6 +996,10 @@ def approve_account():
         conn.close()
 
 
+# approve_loan() messages for the decisions that change a loan's status
+LOAN_DECISION_MESSAGES = ('Loan approved and amount disbursed', 'Loan rejected')
+
+
 @app.route('/api/admin/approve-loan', methods=['POST'])
 def approve_loan():
     if 'admin_id' not in session:
@@ -609,18 +1016,13 @@ def approve_loan():
 
     try:
         cursor = conn.cursor()
-        cursor.callproc('approve_loan', [
-            loan_id,
-            admin_id,
-            approve,
-            ''   # OUT parameter for message
-        ])
-
-        cursor.execute("SELECT @_approve_loan_3")
-        result = cursor.fetchone()
-        conn.commit()
+        # OUT parameter: message
+        result = call_procedure(cursor, 'approve_loan', [loan_id, admin_id, approve], 1)
 
         message = result[0] if result else 'Loan approval failed'
+        # approve_loan audits the status change in its own transaction
+        if message in LOAN_DECISION_MESSAGES:
+            after_write(owners(conn, 'loans', 'loan_id', [loan_id]))
         return jsonify({'success': True, 'message': message})
     except Error as e:
         if conn:
@@ -631,24 +1033,131 @@ def approve_loan():
         conn.close()
 
 
+def bulk_targets(data, ids_field, type_field, types, date_field):
+    """Ids from an explicit list, or from a filter over the pending queue"""
+    if ids_field in data:
+        return parse_ids(data[ids_field]), None
+    filters = parse_bulk_filter(data.get('filter') or {}, type_field, types, date_field)
+    if not filters:
+        raise ValueError(f'Provide {ids_field} or a filter')
+    return None, filters
+
+
+@app.route('/api/admin/approve-accounts', methods=['POST'])
+def bulk_approve_accounts():
+    """Approve a list of account ids, or every pending account matching a filter"""
+    if 'admin_id' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+
+    data = request.json or {}
+    try:
+        account_ids, filters = bulk_targets(data, 'account_ids', 'account_type', ACCOUNT_TYPES, 'created_before')
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
+    admin_id = session['admin_id']
+
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'success': False, 'message': 'Database connection failed'})
+
+    try:
+        if account_ids is None:
+            cursor = conn.cursor(dictionary=True)
+            account_ids = pending_ids(cursor, 'accounts', filters)
+            cursor.close()
+            conn.commit()
+        outcomes = approve_accounts(conn, admin_id, account_ids)
+        approved_ids = [account_id for account_id in account_ids if outcomes[account_id][0]]
+        if approved_ids:
+            after_write(owners(conn, 'accounts', 'account_id', approved_ids))
+    except Error as e:
+        conn.rollback()
+        return jsonify({'success': False, 'message': str(e)})
+    finally:
+        conn.close()
+
+    results = []
+    for account_id in account_ids:
+        approved, message = outcomes[account_id]
+        results.append({'account_id': account_id, 'success': approved, 'message': message})
+    approved_count = sum(1 for result in results if result['success'])
+    return jsonify({
+        'success': True,
+        'message': f'{approved_count} of {len(results)} account(s) approved',
+        'results': results
+    })
+
+
+@app.route('/api/admin/approve-loans', methods=['POST'])
+def bulk_approve_loans():
+    """Approve (approve: true) or reject a list of loan ids, or every pending loan matching a filter"""
+    if 'admin_id' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+
+    data = request.json or {}
+    approve = data.get('approve')
+    if not isinstance(approve, bool):
+        return jsonify({'success': False, 'message': 'approve must be true or false'})
+    try:
+        loan_ids, filters = bulk_targets(data, 'loan_ids', 'loan_type', LOAN_TYPES, 'applied_before')
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
+    admin_id = session['admin_id']
+
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'success': False, 'message': 'Database connection failed'})
+
+    try:
+        if loan_ids is None:
+            cursor = conn.cursor(dictionary=True)
+            loan_ids = pending_ids(cursor, 'loans', filters)
+            cursor.close()
+            conn.commit()
+        outcomes = decide_loans(conn, admin_id, loan_ids, approve)
+        decided_ids = [loan_id for loan_id in loan_ids if outcomes[loan_id][0]]
+        if decided_ids:
+            after_write(owners(conn, 'loans', 'loan_id', decided_ids))
+    except Error as e:
+        conn.rollback()
+        return jsonify({'success': False, 'message': str(e)})
+    finally:
+        conn.close()
+
+    results = []
+    for loan_id in loan_ids:
+        done, message = outcomes[loan_id]
+        results.append({'loan_id': loan_id, 'success': done, 'message': message})
+    done_count = sum(1 for result in results if result['success'])
+    return jsonify({
+        'success': True,
+        'message': f"{done_count} of {len(results)} loan(s) {'approved' if approve else 'rejected'}",
+        'results': results
+    })
+
+
 @app.route('/api/admin/all-accounts', methods=['GET'])
 def get_all_accounts():
     if 'admin_id' not in session:
         return jsonify({'success': False, 'message': 'Not authenticated'})
 
-    conn = get_db_connection()
+    try:
+        limit, sort, descending, after = parse_listing_page(request.args, ACCOUNT_SORTS)
+        filters = parse_account_filters(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+    conn = read_connection()
     if not conn:
         return jsonify({'success': False, 'message': 'Database connection failed'})
 
     try:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT * FROM account_summary
-            ORDER BY account_id DESC
-        """)
-        accounts = cursor.fetchall()
+        cursor = conn.cursor()
+        # Fetch one extra row to know whether another page exists
+        sql, params = build_accounts_query(filters, sort, descending, after, limit + 1)
+        accounts, has_more, next_cursor = listing_page(cursor, sql, params, limit, sort, descending, 'account_id')
 
-        return jsonify({'success': True, 'accounts': accounts})
+        return jsonify({'success': True, 'accounts': accounts, 'has_more': has_more, 'next_cursor': next_cursor})
     except Error as e:
         return jsonify({'success': False, 'message': str(e)})
     finally:
@@ -661,38 +1170,22 @@ def get_all_loans():
     if 'admin_id' not in session:
         return jsonify({'success': False, 'message': 'Not authenticated'})
 
-    conn = get_db_connection()
+    try:
+        limit, sort, descending, after = parse_listing_page(request.args, LOAN_SORTS)
+        filters = parse_loan_filters(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+    conn = read_connection()
     if not conn:
         return jsonify({'success': False, 'message': 'Database connection failed'})
 
     try:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT 
-                l.loan_id,
-                l.loan_type,
-                l.loan_amount,
-                l.interest_rate,
-                l.tenure_months,
-                l.monthly_emi,
-                l.status,
-                u.full_name,
-                u.email,
-                a.account_number,
-                l.applied_at
-            FROM loans l
-            JOIN users u ON l.user_id = u.user_id
-            JOIN accounts a ON l.account_id = a.account_id
-            ORDER BY l.applied_at DESC
-        """)
-        loans = cursor.fetchall()
-
-        # Convert datetime to string safely
-        for loan in loans:
-            if 'applied_at' in loan and loan['applied_at']:
-                loan['applied_at'] = loan['applied_at'].strftime('%Y-%m-%d %H:%M:%S')
+        cursor = conn.cursor()
+        sql, params = build_loans_query(filters, sort, descending, after, limit + 1)
+        loans, has_more, next_cursor = listing_page(cursor, sql, params, limit, sort, descending, 'loan_id')
 
-        return jsonify({'success': True, 'loans': loans})
+        return jsonify({'success': True, 'loans': loans, 'has_more': has_more, 'next_cursor': next_cursor})
     except Error as e:
         return jsonify({'success': False, 'message': str(e)})
     finally:
@@ -705,58 +1198,100 @@ def get_admin_stats():
     if 'admin_id' not in session:
         return jsonify({'success': False, 'message': 'Not authenticated'})
 
+    # ?exact=1 bypasses the cached snapshot and recomputes now
+    force = request.args.get('exact') in ('1', 'true')
+
+    try:
+        stats, as_of, cached = admin_stats.get(force=force)
+        return jsonify({'success': True, 'stats': stats, 'as_of': as_of, 'cached': cached})
+    except Error as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+
+@app.route('/api/admin/exchange-rates', methods=['GET'])
+def get_exchange_rates():
+    if 'admin_id' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+
+    try:
+        rates, version = rate_service.snapshot()
+    except Error as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+    return jsonify({
+        'success': True,
+        'version': version,
+        'rates': [
+            {'from_currency': from_curr, 'to_currency': to_curr, 'rate': rate}
+            for (from_curr, to_curr), rate in sorted(rates.items())
+        ]
+    })
+
+
+@app.route('/api/admin/exchange-rates', methods=['POST'])
+def update_exchange_rates():
+    if 'admin_id' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+
+    updates = (request.json or {}).get('rates')
+    if not isinstance(updates, list) or not updates or not all(isinstance(u, dict) for u in updates):
+        return jsonify({'success': False, 'message': 'rates must be a non-empty list'})
+
     conn = get_db_connection()
     if not conn:
         return jsonify({'success': False, 'message': 'Database connection failed'})
 
     try:
-        cursor = conn.cursor(dictionary=True)
+        updated = rate_service.bulk_update(conn, updates)
+        _, version = rate_service.snapshot()
+        audit_log.record('exchange_rates', None, 'update', 'admin', session['admin_id'],
+                         {'count': updated, 'version': version})
+        return jsonify({'success': True, 'message': f'{updated} rate(s) updated', 'version': version})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
+    except Error as e:
+        return jsonify({'success': False, 'message': str(e)})
+    finally:
+        conn.close()
+
+
+@app.route('/api/admin/audit', methods=['GET'])
+def get_audit_log():
+    if 'admin_id' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+
+    entity_type = request.args.get('entity_type')
+    if not entity_type:
+        return jsonify({'success': False, 'message': 'entity_type is required'})
+    try:
+        entity_id = int(request.args['entity_id']) if request.args.get('entity_id') else None
+        limit = min(int(request.args.get('limit', AUDIT_PAGE_SIZE)), AUDIT_MAX_PAGE_SIZE)
+        if limit <= 0:
+            raise ValueError('Invalid page size')
+        after = decode_audit_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        filters = parse_history_filters({key: request.args.get(key) for key in ('from_date', 'to_date')})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+    conn = read_connection()
+    if not conn:
+        return jsonify({'success': False, 'message': 'Database connection failed'})
 
-        # Get various statistics using aggregate functions
-        cursor.execute("""
-            SELECT 
-                COUNT(*) as total_users,
-                SUM(CASE WHEN is_active = TRUE THEN 1 ELSE 0 END) as active_users
-            FROM users
-        """)
-        user_stats = cursor.fetchone()
-
-        cursor.execute("""
-            SELECT 
-                COUNT(*) as total_accounts,
-                SUM(CASE WHEN status = 'active' THEN 1 ELSE 0 END) as active_accounts,
-                SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END) as pending_accounts,
-                SUM(balance) as total_balance
-            FROM accounts
-        """)
-        account_stats = cursor.fetchone()
-
-        cursor.execute("""
-            SELECT 
-                COUNT(*) as total_loans,
-                SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END) as pending_loans,
-                SUM(CASE WHEN status IN ('approved', 'disbursed') THEN loan_amount ELSE 0 END) as total_loan_amount
-            FROM loans
-        """)
-        loan_stats = cursor.fetchone()
-
-        cursor.execute("""
-            SELECT 
-                COUNT(*) as total_transactions,
-                SUM(amount) as total_transaction_amount
-            FROM transactions
-            WHERE status = 'completed'
-        """)
-        transaction_stats = cursor.fetchone()
-
-        stats = {
-            'users': user_stats,
-            'accounts': account_stats,
-            'loans': loan_stats,
-            'transactions': transaction_stats
-        }
-
-        return jsonify({'success': True, 'stats': stats})
+    try:
+        cursor = conn.cursor(dictionary=True)
+        sql, params = build_audit_query(entity_type, entity_id, filters.get('from_date'), filters.get('to_date'),
+                                        after, limit + 1)
+        cursor.execute(sql, params)
+        events = cursor.fetchall()
+
+        has_more = len(events) > limit
+        events = events[:limit]
+        next_cursor = encode_audit_cursor(events[-1]) if has_more else None
+        for event in events:
+            event['details'] = json.loads(event['details']) if event['details'] else None
+            event['created_at'] = event['created_at'].strftime(AUDIT_DATETIME_FORMAT)
+
+        return jsonify({'success': True, 'events': events, 'has_more': has_more, 'next_cursor': next_cursor})
     except Error as e:
         return jsonify({'success': False, 'message': str(e)})
     finally:
@@ -764,5 +1299,36 @@ def get_admin_stats():
         conn.close()
 
 
+@app.route('/api/admin/pool-stats', methods=['GET'])
+def get_pool_stats():
+    if 'admin_id' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+
+    return jsonify({
+        'success': True,
+        'pool': db_pool.stats(),
+        'replicas': replica_set.stats(),
+        'response_cache': response_cache.stats(),
+        'hot_accounts': slot_consolidator.stats()
+    })
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    pool = db_pool.stats()
+    audit_stats = audit_log.stats()
+    gauges = {
+        'bank_db_pool_size': ('Maximum connections in the pool', pool['size']),
+        'bank_db_pool_open': ('Open connections', pool['open']),
+        'bank_db_pool_in_use': ('Connections currently borrowed', pool['in_use']),
+        'bank_db_pool_waiters': ('Requests waiting for a connection', pool['waiters']),
+        'bank_db_pool_timeouts_total': ('Checkouts that timed out', pool['timeouts']),
+        'bank_audit_pending_events': ('Audit events buffered in memory', audit_stats['pending']),
+        'bank_audit_spilled_events_total': ('Audit events written to the spill file', audit_stats['spilled']),
+        'bank_audit_spill_failures_total': ('Audit events the spill file could not take', audit_stats['spill_failures'])
+    }
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,209 @@
+"""
+Bulk approval of pending accounts and loans.
+
+Items are processed in chunks, one transaction per chunk. Each chunk locks
+its rows with a single SELECT ... FOR UPDATE and applies the decision with
+set-based statements instead of one procedure call per item. The audit
+events of the status changes are inserted in the same transaction.
+"""
+from datetime import datetime
+
+from mysql.connector import Error
+
+from audit import INSERT_SQL as AUDIT_INSERT_SQL, status_change_rows
+from transfers import RETRYABLE_ERRORS
+
+BULK_MAX_ITEMS = 10000
+BULK_DEFAULT_CHUNK = 500
+
+# Filters a bulk request may use instead of a list of ids
+ACCOUNT_TYPES = ('savings', 'current', 'international')
+LOAN_TYPES = ('home', 'education', 'personal', 'vehicle')
+
+
+def parse_bulk_filter(data, type_field, types, date_field):
+    """Validate a {<type_field>, created_before|applied_before} filter"""
+    conditions = {}
+    if data.get(type_field):
+        if data[type_field] not in types:
+            raise ValueError(f'Invalid {type_field}')
+        conditions['type'] = data[type_field]
+    before = data.get(date_field)
+    if before:
+        try:
+            conditions['before'] = datetime.strptime(before, '%Y-%m-%d %H:%M:%S' if ' ' in before else '%Y-%m-%d')
+        except ValueError:
+            raise ValueError(f'Invalid {date_field}')
+    return conditions
+
+
+def pending_ids(cursor, table, filters, limit=BULK_MAX_ITEMS):
+    """
+    Ids of pending accounts or loans matching a filter, oldest first.
+
+    Both tables have a (status, created_at|applied_at) index, so this is a
+    range read of the pending queue.
+    """
+    id_column, type_column, date_column = {
+        'accounts': ('account_id', 'account_type', 'created_at'),
+        'loans': ('loan_id', 'loan_type', 'applied_at'),
+    }[table]
+    conditions = ["status = 'pending'"]
+    params = []
+    if 'type' in filters:
+        conditions.append(f"{type_column} = %s")
+        params.append(filters['type'])
+    if 'before' in filters:
+        conditions.append(f"{date_column} < %s")
+        params.append(filters['before'])
+    cursor.execute(
+        f"SELECT {id_column} FROM {table} WHERE {' AND '.join(conditions)} ORDER BY {date_column} LIMIT %s",
+        params + [limit]
+    )
+    return [row[id_column] for row in cursor.fetchall()]
+
+
+def parse_ids(values):
+    """De-duplicated positive integer ids, in request order"""
+    if not isinstance(values, list):
+        raise ValueError('ids must be a list')
+    ids = []
+    seen = set()
+    for value in values:
+        if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+            raise ValueError(f'Invalid id: {value!r}')
+        if value not in seen:
+            seen.add(value)
+            ids.append(value)
+    if len(ids) > BULK_MAX_ITEMS:
+        raise ValueError(f'At most {BULK_MAX_ITEMS} items per request')
+    return ids
+
+
+def _in_chunks(conn, ids, chunk_size, apply, failure_message):
+    """
+    Run `apply(cursor, chunk)` per chunk in its own transaction, retrying
+    deadlocks. A chunk that still fails is rolled back and each of its items
+    is reported with `failure_message`; later chunks still run.
+    """
+    results = {}
+    chunk_size = max(1, chunk_size)
+    cursor = conn.cursor(dictionary=True)
+    try:
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            for attempt in range(3):
+                try:
+                    conn.start_transaction()
+                    chunk_results = apply(cursor, chunk)
+                    conn.commit()
+                    break
+                except Error as e:
+                    conn.rollback()
+                    if e.errno not in RETRYABLE_ERRORS or attempt == 2:
+                        chunk_results = {item_id: (False, failure_message) for item_id in chunk}
+                        break
+            results.update(chunk_results)
+    finally:
+        cursor.close()
+    return results
+
+
+def _lock(cursor, table, id_column, columns, ids):
+    cursor.execute(
+        f"SELECT {id_column}, {columns} FROM {table} "
+        f"WHERE {id_column} IN ({', '.join(['%s'] * len(ids))}) ORDER BY {id_column} FOR UPDATE",
+        sorted(ids)
+    )
+    return {row[id_column]: row for row in cursor.fetchall()}
+
+
+def approve_accounts(conn, admin_id, account_ids, chunk_size=BULK_DEFAULT_CHUNK):
+    """
+    Approve many pending accounts with one UPDATE per chunk.
+
+    Same checks and messages as the approve_account procedure. Returns
+    {account_id: (approved, message)}.
+    """
+    def apply(cursor, chunk):
+        rows = _lock(cursor, 'accounts', 'account_id', 'status', chunk)
+        results = {}
+        approve = []
+        for account_id in chunk:
+            row = rows.get(account_id)
+            if not row:
+                results[account_id] = (False, 'Account not found')
+            elif row['status'] != 'pending':
+                results[account_id] = (False, 'Account is not in pending status')
+            else:
+                approve.append(account_id)
+                results[account_id] = (True, 'Account approved successfully')
+        if approve:
+            cursor.execute(
+                f"UPDATE accounts SET status = 'active', approved_by = %s, approved_at = CURRENT_TIMESTAMP "
+                f"WHERE account_id IN ({', '.join(['%s'] * len(approve))})",
+                [admin_id] + approve
+            )
+            cursor.executemany(AUDIT_INSERT_SQL,
+                               status_change_rows('account', approve, 'pending', 'active', 'admin', admin_id))
+        return results
+
+    return _in_chunks(conn, account_ids, chunk_size, apply, 'Account approval failed due to an error')
+
+
+def decide_loans(conn, admin_id, loan_ids, approve, chunk_size=BULK_DEFAULT_CHUNK):
+    """
+    Approve (and disburse) or reject many pending loans, set-based per chunk.
+
+    An approval chunk is one UPDATE of the loans, one UPDATE crediting every
+    affected account, and one multi-row INSERT of the disbursement
+    transactions, with the same effects and messages as approve_loan.
+    Loans are locked before accounts, in id order, as in approve_loan.
+    Returns {loan_id: (done, message)}.
+    """
+    def apply(cursor, chunk):
+        rows = _lock(cursor, 'loans', 'loan_id', 'status, loan_amount, account_id', chunk)
+        results = {}
+        decided = []
+        for loan_id in chunk:
+            row = rows.get(loan_id)
+            if not row:
+                results[loan_id] = (False, 'Loan not found')
+            elif row['status'] != 'pending':
+                results[loan_id] = (False, 'Loan is not in pending status')
+            else:
+                decided.append(loan_id)
+                results[loan_id] = (True, 'Loan approved and amount disbursed' if approve else 'Loan rejected')
+        if not decided:
+            return results
+
+        cursor.execute(
+            f"UPDATE loans SET status = %s, approved_by = %s, approved_at = CURRENT_TIMESTAMP "
+            f"WHERE loan_id IN ({', '.join(['%s'] * len(decided))})",
+            ['disbursed' if approve else 'rejected', admin_id] + decided
+        )
+        cursor.executemany(AUDIT_INSERT_SQL, status_change_rows(
+            'loan', decided, 'pending', 'disbursed' if approve else 'rejected', 'admin', admin_id
+        ))
+        if approve:
+            credits = {}
+            for loan_id in decided:
+                account_id = rows[loan_id]['account_id']
+                credits[account_id] = credits.get(account_id, 0) + rows[loan_id]['loan_amount']
+            account_ids = sorted(credits)
+            _lock(cursor, 'accounts', 'account_id', 'balance', account_ids)
+            cursor.execute(
+                f"UPDATE accounts SET balance = balance + CASE account_id "
+                f"{' '.join(['WHEN %s THEN %s'] * len(account_ids))} END "
+                f"WHERE account_id IN ({', '.join(['%s'] * len(account_ids))})",
+                [value for account_id in account_ids for value in (account_id, credits[account_id])] + account_ids
+            )
+            cursor.executemany(
+                "INSERT INTO transactions (to_account, transaction_type, amount, description) "
+                "VALUES (%s, 'deposit', %s, %s)",
+                [(rows[loan_id]['account_id'], rows[loan_id]['loan_amount'], f"Loan disbursement - Loan ID: {loan_id}")
+                 for loan_id in decided]
+            )
+        return results
+
+    return _in_chunks(conn, loan_ids, chunk_size, apply, 'Loan approval failed due to an error')
@@ -0,0 +1,442 @@
+"""
+Asyncio serving mode for the Bank of VIT API.
+
+The hot API routes are reimplemented here on Quart and aiomysql, so a
+request waiting on MySQL does not hold a thread and independent queries
+(such as the four admin statistics aggregates) run concurrently. Every other
+route, including templates and static files, is passed through to the
+regular Flask app from app.py, so both modes serve the same API.
+
+Run with an ASGI server:
+    hypercorn async_app:application --bind 127.0.0.1:5001
+
+The synchronous mode (`python app.py`) is unchanged.
+"""
+import asyncio
+import os
+import time
+
+import aiomysql
+from asgiref.wsgi import WsgiToAsgi
+from pymysql.constants import CLIENT
+from quart import Quart, Response, jsonify, request, session
+from werkzeug.exceptions import HTTPException
+
+import app as sync_app
+from account_numbers import recipient_cache, recipient_not_found_message
+from codec import JSONProvider, codec_for
+from db import DB_CONFIG, DB_STICKY_SECONDS, POOL_CONFIG, procedure_call_sql, replica_set
+from hot_accounts import ACCOUNT_BALANCE_SQL, slot_consolidator
+from rates import rate_service
+from response_cache import response_cache
+from stats import STATS_QUERIES, add_archived_totals, admin_stats, stats_params
+from transaction_archive import transaction_archive
+
+ASYNC_POOL_CONFIG = {
+    'minsize': int(os.environ.get('ASYNC_DB_POOL_MIN', 1)),
+    'maxsize': int(os.environ.get('ASYNC_DB_POOL_SIZE', 50)),
+    'pool_recycle': int(POOL_CONFIG['max_lifetime'])
+}
+
+quart_app = Quart(__name__, static_folder=None)
+quart_app.json = JSONProvider(quart_app)
+# Same key and cookie format as Flask, so sessions work across both apps
+quart_app.secret_key = sync_app.app.secret_key
+
+db_pool = None
+# Replica address -> pool; replica health comes from db.replica_set
+replica_pools = {}
+
+
+async def open_pool(config, **overrides):
+    return await aiomysql.create_pool(
+        host=config['host'],
+        port=int(config['port']),
+        user=config['user'],
+        password=config['password'],
+        db=config['database'],
+        autocommit=True,
+        # Write procedures are called together with the SELECT of their OUT parameters
+        client_flag=CLIENT.MULTI_STATEMENTS,
+        **{**ASYNC_POOL_CONFIG, **overrides}
+    )
+
+
+@quart_app.before_serving
+async def create_pool():
+    global db_pool
+    db_pool = await open_pool(DB_CONFIG)
+    for replica in replica_set.replicas:
+        # Connect lazily, so a replica that is down does not stop startup
+        replica_pools[replica.address] = await open_pool(replica.config, minsize=0)
+
+
+@quart_app.after_serving
+async def close_pool():
+    for pool in [db_pool, *replica_pools.values()]:
+        pool.close()
+        await pool.wait_closed()
+
+
+def after_write(user_ids):
+    """Same as app.after_write()"""
+    response_cache.bump(user_ids)
+    admin_stats.invalidate()
+    session['primary_until'] = time.time() + DB_STICKY_SECONDS
+
+
+def read_replica():
+    """Replica for a read-only route, or None for the primary (see app.read_connection())"""
+    if session.get('primary_until', 0) > time.time():
+        return None
+    if 'user_id' in session and response_cache.changed_within(session['user_id'], DB_STICKY_SECONDS):
+        return None
+    return replica_set.pick()
+
+
+async def on_read_pool(readonly, run):
+    """`await run(pool)` on a replica when `readonly` allows, falling back to the primary"""
+    replica = read_replica() if readonly else None
+    pool = replica_pools[replica.address] if replica else None
+    # A replica with every connection in use sends the read to the primary at once
+    if pool and (pool.freesize or pool.size < pool.maxsize):
+        try:
+            return await run(pool)
+        except aiomysql.OperationalError as e:
+            replica_set.mark_down(replica, e)
+    return await run(db_pool)
+
+
+async def fetch_all(sql, params=(), readonly=False):
+    """Run one read query on a pooled connection"""
+    async def run(pool):
+        async with pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(sql, params)
+                return await cursor.fetchall()
+
+    return await on_read_pool(readonly, run)
+
+
+async def fetch_encoded(sql, params=(), readonly=False):
+    """Run one read query; returns its RowCodec and tuple rows (see codec.py)"""
+    async def run(pool):
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(sql, params)
+                return codec_for(cursor.description), await cursor.fetchall()
+
+    return await on_read_pool(readonly, run)
+
+
+async def call_read_procedure(name, args=(), readonly=False):
+    """Call a procedure and return its last result set as response dicts"""
+    async def run(pool):
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.callproc(name, args)
+                rows = codec_for(cursor.description).rows(await cursor.fetchall()) if cursor.description else []
+                while await cursor.nextset():
+                    pass
+                return rows
+
+    return await on_read_pool(readonly, run)
+
+
+async def call_write_procedure(cursor, name, args, out_count, transaction=False):
+    """
+    Call a write procedure and return its OUT parameters as a tuple in one
+    round trip, as db.call_procedure() does. With `transaction`, the CALL is wrapped in
+    START TRANSACTION ... COMMIT in the same query; the caller rolls back if
+    it raises.
+    """
+    sql = procedure_call_sql(name, len(args), out_count)
+    if transaction:
+        sql = f"START TRANSACTION; {sql}; COMMIT"
+    await cursor.execute(sql, args)
+    row = None
+    while True:
+        if cursor.description:
+            row = await cursor.fetchone()
+        if not await cursor.nextset():
+            return tuple(row.values()) if isinstance(row, dict) else row
+
+
+async def cached_user_response(key, build):
+    """Same as app.cached_user_response(), with an async `build`"""
+    user_id = session['user_id']
+    entry = response_cache.get(user_id, key)
+    if entry is None:
+        snapshot = response_cache.snapshot(user_id)
+        payload = await build()
+        if not payload.get('success'):
+            return jsonify(payload)
+        entry = response_cache.put(user_id, key, snapshot, quart_app.json.dumps(payload).encode())
+
+    headers = {'ETag': f'"{entry.etag}"', 'Cache-Control': 'private, no-cache', 'Vary': 'Cookie'}
+    if request.if_none_match.contains(entry.etag):
+        return Response('', status=304, headers=headers)
+    return Response(entry.body, mimetype='application/json', headers=headers)
+
+# ============================================
+# USER ROUTES
+# ============================================
+
+
+@quart_app.route('/api/user/accounts', methods=['GET'])
+async def get_user_accounts():
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+
+    async def build():
+        try:
+            codec, accounts = await fetch_encoded(f"""
+                SELECT a.account_id, a.account_number, a.account_type, {ACCOUNT_BALANCE_SQL} as balance,
+                       a.currency, a.status, a.created_at
+                FROM accounts a
+                WHERE a.user_id = %s
+                ORDER BY a.created_at DESC
+            """, (session['user_id'],), readonly=True)
+
+            return {'success': True, 'accounts': codec.rows(accounts)}
+        except aiomysql.Error as e:
+            return {'success': False, 'message': str(e)}
+
+    return await cached_user_response('accounts', build)
+
+
+@quart_app.route('/api/user/transactions/<int:account_id>', methods=['GET'])
+async def get_transactions(account_id):
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+
+    try:
+        limit = min(int(request.args.get('limit', sync_app.HISTORY_PAGE_SIZE)), sync_app.HISTORY_MAX_PAGE_SIZE)
+        if limit <= 0:
+            raise ValueError('Invalid page size')
+        after = sync_app.decode_history_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        filters = sync_app.parse_history_filters(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+    async def build():
+        try:
+            archived = transaction_archive.current()
+            sql, params = sync_app.build_history_query(account_id, sync_app.live_history_filters(filters, archived),
+                                                       after, limit + 1)
+            codec, transactions = await fetch_encoded(sql, params, readonly=True)
+            transactions = list(transactions)
+            if len(transactions) <= limit:
+                # Parquet reads block, so they run off the event loop
+                transactions += map(codec.to_tuple, await asyncio.to_thread(
+                    archived.history, account_id, filters, after, limit + 1 - len(transactions)))
+
+            has_more = len(transactions) > limit
+            transactions = transactions[:limit]
+            next_cursor = sync_app.encode_history_cursor(codec.raw(transactions[-1])) if has_more else None
+
+            return {
+                'success': True,
+                'transactions': codec.rows(transactions),
+                'has_more': has_more,
+                'next_cursor': next_cursor
+            }
+        except aiomysql.Error as e:
+            return {'success': False, 'message': str(e)}
+
+    return await cached_user_response(('transactions', account_id, request.query_string), build)
+
+
+@quart_app.route('/api/user/transfer', methods=['POST'])
+async def transfer_money():
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+
+    # Credits that land in hot-account slots are folded in the background
+    slot_consolidator.ensure_running()
+    data = await request.get_json()
+    from_account = data.get('from_account')
+    to_account_number = data.get('to_account_number')
+    amount = data.get('amount')
+    description = data.get('description', 'Money transfer')
+    # Checking for new rates may query MySQL, so keep it off the event loop,
+    # and finish it before this request takes a connection of its own
+    await asyncio.to_thread(rate_service.refresh)
+
+    try:
+        async with db_pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                to_account = recipient_cache.get(to_account_number)
+                cached = to_account is not None
+                if not cached:
+                    await cursor.execute(
+                        "SELECT account_id, user_id, status, account_type, currency FROM accounts "
+                        "WHERE account_number = %s",
+                        (to_account_number,)
+                    )
+                    to_account = await cursor.fetchone()
+
+                    if not to_account:
+                        return jsonify({'success': False, 'message': recipient_not_found_message(to_account_number)})
+
+                    if to_account['status'] != 'active':
+                        return jsonify({'success': False, 'message': 'Recipient account is not active'})
+
+                rate, rate_version = sync_app.international_rate(to_account)
+
+                # OUT parameters: transaction_id, message
+                result = await call_write_procedure(cursor, 'transfer_money', [
+                    from_account,
+                    to_account['account_id'],
+                    amount,
+                    description,
+                    rate,
+                    rate_version
+                ], 2)
+
+        transaction_id = result[0] if result else None
+        message = result[1] if result else 'Transfer failed'
+
+        if transaction_id and transaction_id > 0:
+            if not cached:
+                recipient_cache.put(to_account_number, to_account)
+            after_write([session['user_id'], to_account['user_id']])
+            return jsonify({'success': True, 'message': message, 'transaction_id': transaction_id})
+        else:
+            if cached:
+                recipient_cache.discard(to_account_number)
+            return jsonify({'success': False, 'message': message})
+    except aiomysql.Error as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+
+@quart_app.route('/api/user/deposit', methods=['POST'])
+async def deposit_money():
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+
+    # Credits that land in hot-account slots are folded in the background
+    slot_consolidator.ensure_running()
+    data = await request.get_json()
+
+    try:
+        async with db_pool.acquire() as conn:
+            # deposit_money has no transaction of its own
+            try:
+                async with conn.cursor() as cursor:
+                    # OUT parameter: message
+                    result = await call_write_procedure(
+                        cursor, 'deposit_money', [data.get('account_id'), data.get('amount')], 1, transaction=True
+                    )
+            except aiomysql.Error:
+                await conn.rollback()
+                raise
+
+            message = result[0] if result else 'Deposit failed'
+            # Any account may be deposited into; the cached views are its owner's
+            if message == 'Deposit successful':
+                async with conn.cursor() as cursor:
+                    await cursor.execute("SELECT user_id FROM accounts WHERE account_id = %s", (data.get('account_id'),))
+                    after_write([row[0] for row in await cursor.fetchall()])
+
+        return jsonify({'success': True, 'message': message})
+    except aiomysql.Error as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+
+@quart_app.route('/api/user/loans', methods=['GET'])
+async def get_user_loans():
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+
+    async def build():
+        try:
+            loans = await call_read_procedure('get_user_loans', [session['user_id']], readonly=True)
+
+            return {'success': True, 'loans': loans}
+        except aiomysql.Error as e:
+            return {'success': False, 'message': str(e)}
+
+    return await cached_user_response('loans', build)
+
+# ============================================
+# ADMIN ROUTES
+# ============================================
+
+
+@quart_app.route('/api/admin/pending-accounts', methods=['GET'])
+async def get_pending_accounts():
+    if 'admin_id' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+
+    try:
+        accounts = await call_read_procedure('get_pending_accounts', readonly=True)
+
+        return jsonify({'success': True, 'accounts': accounts})
+    except aiomysql.Error as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+
+@quart_app.route('/api/admin/pending-loans', methods=['GET'])
+async def get_pending_loans():
+    if 'admin_id' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+
+    try:
+        loans = await call_read_procedure('get_pending_loans', readonly=True)
+
+        return jsonify({'success': True, 'loans': loans})
+    except aiomysql.Error as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+
+@quart_app.route('/api/admin/stats', methods=['GET'])
+async def get_admin_stats():
+    if 'admin_id' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'})
+
+    force = request.args.get('exact') in ('1', 'true')
+    snapshot = None if force else admin_stats.peek()
+    if snapshot:
+        stats, as_of = snapshot
+        return jsonify({'success': True, 'stats': stats, 'as_of': as_of, 'cached': True})
+
+    try:
+        # The four aggregates run concurrently on separate connections
+        token = admin_stats.begin_refresh()
+        archived = transaction_archive.current()
+        groups = list(STATS_QUERIES)
+        results = await asyncio.gather(*(
+            fetch_all(STATS_QUERIES[group], stats_params(group, archived), readonly=True) for group in groups
+        ))
+        stats = add_archived_totals({group: rows[0] for group, rows in zip(groups, results)}, archived)
+        as_of = admin_stats.store(stats, token)
+        return jsonify({'success': True, 'stats': stats, 'as_of': as_of, 'cached': False})
+    except aiomysql.Error as e:
+        admin_stats.invalidate()
+        return jsonify({'success': False, 'message': str(e)})
+
+# ============================================
+# ASGI ENTRY POINT
+# ============================================
+
+
+flask_asgi = WsgiToAsgi(sync_app.app)
+
+
+def is_async_route(scope):
+    """True if the Quart app implements this path and method"""
+    adapter = quart_app.url_map.bind('localhost')
+    try:
+        adapter.match(scope['path'], method=scope['method'])
+        return True
+    except HTTPException:
+        return False
+
+
+async def application(scope, receive, send):
+    """Serve ported routes on Quart and everything else through Flask"""
+    if scope['type'] == 'lifespan' or (scope['type'] == 'http' and is_async_route(scope)):
+        await quart_app(scope, receive, send)
+    else:
+        await flask_asgi(scope, receive, send)
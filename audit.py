@@ -0,0 +1,271 @@
+"""
+Append-only audit log.
+
+Status changes and admin actions are recorded in audit_log rather than in
+the transactions ledger. Events are buffered in memory and written by a
+background thread in multi-row INSERTs, at least every AUDIT_FLUSH_INTERVAL
+seconds or as soon as AUDIT_BATCH_SIZE events are waiting, so recording an
+event never adds a database round trip to a request. Each event keeps the
+time it was recorded, not the time it was flushed.
+
+While the database is unreachable, up to AUDIT_BUFFER_MAX events are kept in
+memory. Further events are appended to AUDIT_SPILL_FILE and written back
+once the buffer has drained, so no event is dropped; if the spill file
+cannot be written either, they are kept in memory past the limit, so a
+full disk never fails the request that records an event. Spilled events
+and failed spills are counted in /metrics. A spilled event stays in the
+file until the flush that writes it has committed. Status changes made in the database (approvals, loan closures) are
+not buffered: they are inserted with INSERT_SQL, or status_change_rows(), in
+the transaction that makes the change.
+
+audit_log rejects UPDATE and DELETE (see the triggers in schema.sql).
+"""
+import atexit
+import base64
+import itertools
+import json
+import os
+import sys
+import threading
+from collections import deque
+from datetime import datetime
+
+from mysql.connector import Error
+
+from db import get_db_connection
+
+AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL', 1))
+AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', 500))
+# Events kept in memory while the database is unreachable; later ones go to the spill file
+AUDIT_BUFFER_MAX = int(os.environ.get('AUDIT_BUFFER_MAX', 100_000))
+# Events beyond AUDIT_BUFFER_MAX, one JSON array per line, until they can be written
+AUDIT_SPILL_FILE = os.environ.get('AUDIT_SPILL_FILE', 'audit_spill.jsonl')
+
+AUDIT_PAGE_SIZE = 100
+AUDIT_MAX_PAGE_SIZE = 500
+AUDIT_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+INSERT_SQL = (
+    "INSERT INTO audit_log (entity_type, entity_id, action, actor_type, actor_id, details, created_at) "
+    "VALUES (%s, %s, %s, %s, %s, %s, %s)"
+)
+
+
+def status_change_rows(entity_type, entity_ids, from_status, to_status, actor_type='system', actor_id=None):
+    """INSERT_SQL rows recording a status change of several entities, for use in the same transaction"""
+    details = json.dumps({'from': from_status, 'to': to_status})
+    now = datetime.now()
+    return [(entity_type, entity_id, 'status_change', actor_type, actor_id, details, now)
+            for entity_id in entity_ids]
+
+
+class AuditWriter:
+    """Buffers audit events and writes them in batches from a daemon thread"""
+
+    def __init__(self, connect=get_db_connection, flush_interval=AUDIT_FLUSH_INTERVAL,
+                 batch_size=AUDIT_BATCH_SIZE, max_buffer=AUDIT_BUFFER_MAX, spill_file=AUDIT_SPILL_FILE):
+        self.connect = connect
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_buffer = max_buffer
+        self.spill_file = spill_file
+        self.spilled = 0
+        self.spill_failures = 0
+        # Lines of the claimed spill file reloaded into the buffer but not yet written
+        self._reloaded = 0
+        self._buffer = deque()
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+
+    def record(self, entity_type, entity_id, action, actor_type='system', actor_id=None, details=None):
+        """Queue one event; returns immediately"""
+        event = (
+            entity_type, entity_id, action, actor_type, actor_id,
+            json.dumps(details, default=str) if details is not None else None,
+            datetime.now()
+        )
+        if len(self._buffer) >= self.max_buffer:
+            try:
+                self._spill(event)
+            except OSError as e:
+                self.spill_failures += 1
+                print(f"audit: cannot write {self.spill_file}, event kept in memory: {e}", file=sys.stderr)
+                self._buffer.append(event)
+        else:
+            self._buffer.append(event)
+        self._ensure_started()
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write every buffered event, then any spilled ones; returns the number written"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                while self._buffer:
+                    batch = []
+                    while self._buffer and len(batch) < self.batch_size:
+                        batch.append(self._buffer.popleft())
+                    try:
+                        self._write(batch)
+                    except Error as e:
+                        # Put the batch back in order and retry on the next flush
+                        self._buffer.extendleft(reversed(batch))
+                        print(f"audit: flush failed, {len(self._buffer)} event(s) buffered: {e}", file=sys.stderr)
+                        return written
+                    written += len(batch)
+                try:
+                    # Everything reloaded last time is now written
+                    self._release_reloaded()
+                    if not self._reload_spilled():
+                        return written
+                except OSError as e:
+                    print(f"audit: cannot read {self.spill_file}: {e}", file=sys.stderr)
+                    return written
+
+    def pending(self):
+        return len(self._buffer)
+
+    def stats(self):
+        return {'pending': len(self._buffer), 'spilled': self.spilled, 'spill_failures': self.spill_failures}
+
+    def _spill(self, event):
+        line = json.dumps(list(event[:6]) + [event[6].isoformat()]) + '\n'
+        with self._spill_lock:
+            with open(self.spill_file, 'a', encoding='utf-8') as f:
+                f.write(line)
+            self.spilled += 1
+
+    def _reload_spilled(self):
+        """
+        Copy spilled events back into the buffer, as many as it has room for;
+        returns how many. The spill file is first renamed to a name of this
+        process's own, so other processes keep appending to a new one. The
+        copied lines stay in that file until _release_reloaded() runs after
+        the buffer has been written.
+        """
+        room = self.max_buffer - len(self._buffer)
+        if room <= 0:
+            return 0
+        claimed = f"{self.spill_file}.{os.getpid()}"
+        with self._spill_lock:
+            if not os.path.exists(claimed):
+                try:
+                    os.replace(self.spill_file, claimed)
+                except FileNotFoundError:
+                    return 0
+            with open(claimed, encoding='utf-8') as f:
+                lines = list(itertools.islice(f, room))
+            if not lines:
+                os.remove(claimed)
+                return 0
+        self._reloaded = len(lines)
+        for line in lines:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                # Only a write cut short by a crash leaves a partial line
+                print(f"audit: unreadable spilled event skipped: {line!r}", file=sys.stderr)
+                continue
+            self._buffer.append(tuple(event[:6]) + (datetime.fromisoformat(event[6]),))
+        return len(lines)
+
+    def _release_reloaded(self):
+        """Drop the reloaded lines from the claimed spill file, once their events are written"""
+        if not self._reloaded:
+            return
+        claimed = f"{self.spill_file}.{os.getpid()}"
+        with self._spill_lock:
+            with open(claimed, encoding='utf-8') as f:
+                rest = f.readlines()[self._reloaded:]
+            if rest:
+                with open(f"{claimed}.tmp", 'w', encoding='utf-8') as f:
+                    f.writelines(rest)
+                os.replace(f"{claimed}.tmp", claimed)
+            else:
+                os.remove(claimed)
+        self._reloaded = 0
+
+    def _write(self, batch):
+        conn = self.connect()
+        if not conn:
+            raise Error(msg='Database connection failed')
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.executemany(INSERT_SQL, batch)
+                conn.commit()
+            except Error:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        finally:
+            conn.close()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+def encode_audit_cursor(row):
+    key = f"{row['created_at'].strftime(AUDIT_DATETIME_FORMAT)}|{row['audit_id']}"
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+
+def decode_audit_cursor(cursor_value):
+    """Return (created_at, audit_id) from an audit cursor"""
+    try:
+        date_part, id_part = base64.urlsafe_b64decode(cursor_value.encode()).decode().split('|')
+        return datetime.strptime(date_part, AUDIT_DATETIME_FORMAT), int(id_part)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+
+
+def build_audit_query(entity_type, entity_id=None, since=None, until=None, after=None, limit=AUDIT_PAGE_SIZE):
+    """
+    Events for one entity type (and optionally one entity) in [since, until),
+    newest first. `after` is a (created_at, audit_id) keyset position. Both
+    shapes are served in order by an index on (entity_type[, entity_id], created_at).
+    """
+    conditions = ["entity_type = %s"]
+    params = [entity_type]
+    if entity_id is not None:
+        conditions.append("entity_id = %s")
+        params.append(entity_id)
+    if since:
+        conditions.append("created_at >= %s")
+        params.append(since)
+    if until:
+        conditions.append("created_at < %s")
+        params.append(until)
+    if after:
+        conditions.append("(created_at < %s OR (created_at = %s AND audit_id < %s))")
+        params.extend([after[0], after[0], after[1]])
+
+    sql = f"""
+        SELECT audit_id, entity_type, entity_id, action, actor_type, actor_id, details, created_at
+        FROM audit_log
+        WHERE {' AND '.join(conditions)}
+        ORDER BY created_at DESC, audit_id DESC
+        LIMIT %s
+    """
+    params.append(limit)
+    return sql, params
+
+
+audit_log = AuditWriter()
@@ -0,0 +1,120 @@
+"""
+Measure create_account latency as the accounts table grows.
+
+    python -m benchmarks.account_numbers --steps 5 --step-size 200000 --concurrency 8
+
+Each step first bulk-inserts --step-size filler accounts (numbered from the
+account number sequence, like the app), then calls create_account --samples
+times from --concurrency threads at once and reports p50/p95/p99 latency. With
+the sequence allocator, latency should stay flat as the table grows and no
+call should fail on the UNIQUE constraint. Run it against a benchmark
+database only; the filler and sample accounts are not removed.
+"""
+import argparse
+import threading
+import time
+
+import mysql.connector
+
+from account_numbers import reserve_account_numbers
+from benchmarks.common import percentile
+from db import DB_CONFIG
+
+
+def bench_user(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT user_id FROM users WHERE is_active = TRUE ORDER BY user_id LIMIT 1")
+    row = cursor.fetchone()
+    cursor.close()
+    if not row:
+        raise SystemExit("No active user found; run `python -m benchmarks.datagen` first")
+    return row[0]
+
+
+def add_filler(conn, user_id, count, batch=10_000):
+    cursor = conn.cursor()
+    for start in range(0, count, batch):
+        size = min(batch, count - start)
+        numbers = reserve_account_numbers(conn, size)
+        cursor.executemany(
+            "INSERT INTO accounts (user_id, account_number, account_type, currency, status) "
+            "VALUES (%s, %s, 'savings', 'INR', 'closed')",
+            [(user_id, number) for number in numbers]
+        )
+        conn.commit()
+    cursor.close()
+
+
+def create_accounts(user_id, samples, concurrency):
+    """Call create_account `samples` times across threads; return latencies and failures"""
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+    per_thread = [samples // concurrency + (1 if i < samples % concurrency else 0) for i in range(concurrency)]
+
+    def worker(count):
+        conn = mysql.connector.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+        start_line.wait()
+        try:
+            for _ in range(count):
+                started = time.perf_counter()
+                try:
+                    cursor.callproc('create_account', [user_id, 'savings', 0, '', ''])
+                    cursor.execute("SELECT @_create_account_2, @_create_account_4")
+                    account_id, message = cursor.fetchone()
+                    conn.commit()
+                    error = None if account_id and account_id > 0 else message
+                except mysql.connector.Error as e:
+                    conn.rollback()
+                    error = str(e)
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    if error:
+                        failures.append(error)
+        finally:
+            cursor.close()
+            conn.close()
+
+    threads = [threading.Thread(target=worker, args=(count,)) for count in per_thread if count]
+    start_line = threading.Barrier(len(threads))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--steps', type=int, default=5)
+    parser.add_argument('--step-size', type=int, default=200_000, help='filler accounts added per step')
+    parser.add_argument('--samples', type=int, default=500, help='create_account calls per step')
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args(argv)
+
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        user_id = bench_user(conn)
+        print(f"{'accounts':>12} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'failures':>9}")
+        for step in range(args.steps + 1):
+            if step:
+                add_filler(conn, user_id, args.step_size)
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM accounts")
+            total = cursor.fetchone()[0]
+            cursor.close()
+
+            latencies, failures = create_accounts(user_id, args.samples, args.concurrency)
+            latencies.sort()
+            print(f"{total:>12,} {percentile(latencies, 50) * 1000:>9.2f} {percentile(latencies, 95) * 1000:>9.2f} "
+                  f"{percentile(latencies, 99) * 1000:>9.2f} {len(failures):>9}")
+            for message in sorted(set(failures)):
+                print(f"    failure: {message}")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
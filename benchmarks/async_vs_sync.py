@@ -0,0 +1,104 @@
+"""
+Compare the synchronous Flask app with the asyncio serving mode.
+
+Start both servers against the same database, e.g.
+    python app.py                                        # sync, port 5000
+    hypercorn async_app:application --bind 127.0.0.1:5001
+
+then run
+    python -m benchmarks.async_vs_sync --user-email alice@example.com --user-password secret
+
+Each mode is driven with the same concurrency for the same duration and the
+per-endpoint throughput and p50/p95/p99 latencies are printed side by side.
+"""
+import argparse
+import threading
+import time
+from collections import defaultdict
+
+from benchmarks.common import ApiClient, summarize
+
+
+def build_plan(user, admin):
+    """Endpoints to exercise: (label, client, method, path)"""
+    _, data, _ = user.request('GET', '/api/user/accounts')
+    accounts = (data or {}).get('accounts') or []
+    plan = [
+        ('user/accounts', user, 'GET', '/api/user/accounts'),
+        ('user/loans', user, 'GET', '/api/user/loans'),
+        # exact=1 bypasses the stats cache so the aggregates really run
+        ('admin/stats', admin, 'GET', '/api/admin/stats?exact=1'),
+        ('admin/pending-accounts', admin, 'GET', '/api/admin/pending-accounts')
+    ]
+    if accounts:
+        plan.append(('user/transactions', user, 'GET', f"/api/user/transactions/{accounts[0]['account_id']}"))
+    return plan
+
+
+def run_mode(base_url, args):
+    user = ApiClient(base_url).login(args.user_email, args.user_password)
+    admin = ApiClient(base_url).login(args.admin_email, args.admin_password, admin=True)
+    plan = build_plan(user, admin)
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def worker(offset):
+        clients = {id(client): client.clone() for _, client, _, _ in plan}
+        step = offset
+        while time.perf_counter() < deadline:
+            label, client, method, path = plan[step % len(plan)]
+            step += 1
+            try:
+                status, data, elapsed = clients[id(client)].request(method, path)
+                ok = status == 200 and data and data.get('success')
+            except OSError:
+                ok, elapsed = False, 0.0
+            with lock:
+                if ok:
+                    latencies[label].append(elapsed)
+                else:
+                    errors[label] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - started
+
+    return {label: summarize(latencies[label], errors[label], duration) for label, _, _, _ in plan}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sync-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--async-url', default='http://127.0.0.1:5001')
+    parser.add_argument('--user-email', required=True)
+    parser.add_argument('--user-password', required=True)
+    parser.add_argument('--admin-email', default='admin@bankvit.com')
+    parser.add_argument('--admin-password', default='admin123')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds per mode')
+    args = parser.parse_args(argv)
+
+    results = {}
+    for mode, url in (('sync', args.sync_url), ('async', args.async_url)):
+        print(f"Running {mode} mode against {url} ({args.concurrency} clients, {args.duration}s)...")
+        results[mode] = run_mode(url, args)
+
+    print()
+    print(f"{'endpoint':<24} {'mode':<6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for label in results['sync']:
+        for mode in ('sync', 'async'):
+            row = results[mode].get(label)
+            if row:
+                print(f"{label:<24} {mode:<6} {row['throughput_rps']:>9} {row['p50_ms']:>9} "
+                      f"{row['p95_ms']:>9} {row['p99_ms']:>9} {row['errors']:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Shared helpers for the benchmark scripts: a tiny HTTP client and latency stats."""
+import http.client
+import json
+import math
+import time
+from urllib.parse import urlsplit
+
+
+class ApiClient:
+    """Keep-alive JSON client that carries the Flask session cookie"""
+
+    def __init__(self, base_url, cookie=None, timeout=30):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.cookie = cookie
+        self._conn = None
+
+    def clone(self):
+        return ApiClient(f"http://{self.host}:{self.port}", self.cookie, self.timeout)
+
+    def request(self, method, path, payload=None):
+        """Return (status, parsed JSON body or None, elapsed seconds)"""
+        headers = {'Connection': 'keep-alive'}
+        body = None
+        if payload is not None:
+            body = json.dumps(payload)
+            headers['Content-Type'] = 'application/json'
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            started = time.perf_counter()
+            try:
+                self._conn.request(method, path, body=body, headers=headers)
+                response = self._conn.getresponse()
+                raw = response.read()
+            except (http.client.HTTPException, OSError):
+                # Server closed an idle keep-alive connection; reconnect once
+                self._conn.close()
+                self._conn = None
+                if attempt:
+                    raise
+                continue
+            elapsed = time.perf_counter() - started
+
+            set_cookie = response.getheader('Set-Cookie')
+            if set_cookie and set_cookie.startswith('session='):
+                self.cookie = set_cookie.split(';', 1)[0]
+
+            try:
+                data = json.loads(raw) if raw else None
+            except ValueError:
+                data = None
+            return response.status, data, elapsed
+
+    def login(self, email, password, admin=False):
+        path = '/api/admin-login' if admin else '/api/login'
+        status, data, _ = self.request('POST', path, {'email': email, 'password': password})
+        if status != 200 or not data or not data.get('success'):
+            raise RuntimeError(f"Login failed for {email}: {data}")
+        return self
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, errors, duration):
+    """Throughput and latency percentiles (ms) for one endpoint"""
+    values = sorted(latencies)
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'throughput_rps': round(len(values) / duration, 2) if duration else 0.0,
+        'p50_ms': round(percentile(values, 50) * 1000, 3),
+        'p95_ms': round(percentile(values, 95) * 1000, 3),
+        'p99_ms': round(percentile(values, 99) * 1000, 3),
+        'max_ms': round(values[-1] * 1000, 3) if values else 0.0
+    }
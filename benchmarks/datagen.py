@@ -0,0 +1,301 @@
+"""
+Seed the database with a synthetic bank for benchmarking.
+
+    python -m benchmarks.datagen --scale small      # ~1k users, 10k transactions
+    python -m benchmarks.datagen --scale medium     # ~50k users, 1M transactions
+    python -m benchmarks.datagen --scale large      # ~200k users, 10M transactions
+    python -m benchmarks.datagen --users 5000 --transactions 250000 --seed 7
+
+Generated customers use emails of the form bench<N>@bench.vit and the
+password given by --password, so the load driver can log in as them.
+
+Distributions:
+  * 1-3 accounts per user (mostly savings, some current and international),
+    about 2% still pending approval;
+  * transaction amounts are log-normal (median about 2,000);
+  * a few "hot" accounts (merchants, payroll) receive a large share of all
+    transfers, the rest are spread uniformly;
+  * transactions are spread over the last --days days in date order, and a
+    transfer is only generated when the sender can afford it, so final
+    balances are consistent with the ledger;
+  * about 5% of users have a loan in a mix of statuses.
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import mysql.connector
+
+from account_numbers import reserve_account_numbers
+from db import DB_CONFIG
+
+SCALES = {
+    'small': {'users': 1_000, 'transactions': 10_000},
+    'medium': {'users': 50_000, 'transactions': 1_000_000},
+    'large': {'users': 200_000, 'transactions': 10_000_000}
+}
+
+ACCOUNT_TYPES = (('savings', 0.70), ('current', 0.25), ('international', 0.05))
+LOAN_TYPES = (('home', 8.5), ('education', 9.0), ('personal', 12.5), ('vehicle', 10.0))
+LOAN_STATUSES = (('pending', 0.10), ('disbursed', 0.60), ('rejected', 0.20), ('closed', 0.10))
+FIRST_NAMES = ('Aarav', 'Vivaan', 'Aditya', 'Diya', 'Ananya', 'Ishaan', 'Kavya', 'Rohan', 'Saanvi', 'Arjun',
+               'Meera', 'Kabir', 'Riya', 'Vihaan', 'Anika', 'Reyansh', 'Myra', 'Sai', 'Tara', 'Dev')
+LAST_NAMES = ('Sharma', 'Verma', 'Iyer', 'Reddy', 'Nair', 'Patel', 'Gupta', 'Singh', 'Das', 'Menon',
+              'Rao', 'Khan', 'Joshi', 'Kulkarni', 'Bose', 'Pillai', 'Mehta', 'Chopra', 'Naidu', 'Kapoor')
+
+USD_RATE = Decimal('0.012')
+CENTS = Decimal('0.01')
+
+
+def weighted(rng, choices):
+    roll = rng.random()
+    for value, weight in choices:
+        roll -= weight
+        if roll <= 0:
+            return value
+    return choices[-1][0]
+
+
+def pan_for(n):
+    """Unique, trigger-valid PAN (ABCDE1234F) for the n-th generated user"""
+    letters = []
+    head = n // 10_000
+    for _ in range(5):
+        head, rem = divmod(head, 26)
+        letters.append(chr(ord('A') + rem))
+    return ''.join(letters) + f"{n % 10_000:04d}" + chr(ord('A') + n % 26)
+
+
+def emi(principal, annual_rate, months):
+    """Python equivalent of calculate_emi()"""
+    r = annual_rate / 1200
+    if r == 0:
+        return round(principal / months, 2)
+    factor = (1 + r) ** months
+    return round(principal * r * factor / (factor - 1), 2)
+
+
+class Seeder:
+    def __init__(self, conn, args):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.batch = args.batch
+
+    def next_id(self, table, column):
+        self.cursor.execute(f"SELECT COALESCE(MAX({column}), 0) + 1 FROM {table}")
+        return self.cursor.fetchone()[0]
+
+    def insert_many(self, sql, rows):
+        for start in range(0, len(rows), self.batch):
+            self.cursor.executemany(sql, rows[start:start + self.batch])
+            self.conn.commit()
+
+    def seed_users(self):
+        first_id = self.next_id('users', 'user_id')
+        today = datetime.now().date()
+        rows = []
+        for i in range(self.args.users):
+            n = first_id + i
+            dob = today - timedelta(days=self.rng.randint(18 * 366, 80 * 365))
+            rows.append((
+                n, f"bench{n}@bench.vit", self.args.password,
+                f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}",
+                f"9{self.rng.randint(0, 999_999_999):09d}", f"Bench address {n}", dob,
+                f"{100_000_000_000 + n:012d}", pan_for(n)
+            ))
+        self.insert_many(
+            "INSERT INTO users (user_id, email, password, full_name, phone, address, date_of_birth, "
+            "aadhar_number, pan_number) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+            rows
+        )
+        return [row[0] for row in rows]
+
+    def seed_accounts(self, user_ids):
+        first_id = self.next_id('accounts', 'account_id')
+        now = datetime.now()
+        counts = [min(3, 1 + int(self.rng.expovariate(1.5))) for _ in user_ids]
+        numbers = iter(reserve_account_numbers(self.conn, sum(counts)))
+        accounts = []
+        for user_id, count in zip(user_ids, counts):
+            for _ in range(count):
+                account_id = first_id + len(accounts)
+                account_type = weighted(self.rng, ACCOUNT_TYPES)
+                status = 'pending' if self.rng.random() < 0.02 else 'active'
+                created = now - timedelta(days=self.args.days + self.rng.randint(1, 365))
+                accounts.append({
+                    'account_id': account_id,
+                    'user_id': user_id,
+                    'account_number': next(numbers),
+                    'account_type': account_type,
+                    'currency': 'USD' if account_type == 'international' else 'INR',
+                    'status': status,
+                    'created_at': created,
+                    'balance': Decimal('0.00')
+                })
+        self.insert_many(
+            "INSERT INTO accounts (account_id, user_id, account_number, account_type, balance, currency, "
+            "status, created_at, approved_by, approved_at) VALUES (%s, %s, %s, %s, 0, %s, %s, %s, %s, %s)",
+            [(a['account_id'], a['user_id'], a['account_number'], a['account_type'], a['currency'],
+              a['status'], a['created_at'], 1 if a['status'] == 'active' else None,
+              a['created_at'] if a['status'] == 'active' else None) for a in accounts]
+        )
+        return accounts
+
+    def amount(self):
+        return Decimal(str(round(min(self.rng.lognormvariate(7.6, 1.1), 500_000), 2)))
+
+    def seed_transactions(self, accounts):
+        active = [a for a in accounts if a['status'] == 'active']
+        inr = [a for a in active if a['currency'] == 'INR']
+        hot_count = max(1, int(len(active) * self.args.hot_fraction))
+        hot = self.rng.sample(active, min(hot_count, len(active)))
+
+        total = self.args.transactions
+        start = datetime.now() - timedelta(days=self.args.days)
+        step = timedelta(days=self.args.days) / max(total, 1)
+        rows = []
+        written = 0
+        started = time.perf_counter()
+
+        for i in range(total):
+            when = start + step * i
+            roll = self.rng.random()
+            if roll < 0.30 or not inr:
+                account = self.rng.choice(active)
+                amount = self.amount()
+                account['balance'] += amount
+                rows.append((None, account['account_id'], 'deposit', amount, 0, account['currency'],
+                             'Cash deposit', when))
+            else:
+                sender = self.rng.choice(inr)
+                if self.rng.random() < self.args.hot_share:
+                    recipient = self.rng.choice(hot)
+                else:
+                    recipient = self.rng.choice(active)
+                amount = self.amount()
+                if recipient['account_type'] == 'international':
+                    fee = (amount * Decimal('0.02')).quantize(CENTS)
+                    credited = (amount * USD_RATE).quantize(CENTS)
+                    trans_type = 'international_transfer'
+                else:
+                    fee, credited, trans_type = Decimal('0.00'), amount, 'transfer'
+                if sender['balance'] < amount + fee or sender is recipient:
+                    # Cannot afford it: record a salary-style deposit instead
+                    sender['balance'] += amount
+                    rows.append((None, sender['account_id'], 'deposit', amount, 0, 'INR', 'Salary credit', when))
+                else:
+                    sender['balance'] -= amount + fee
+                    recipient['balance'] += credited
+                    rows.append((sender['account_id'], recipient['account_id'], trans_type, amount, fee, 'INR',
+                                 'Bench transfer', when))
+
+            if len(rows) >= self.batch:
+                written += self.flush_transactions(rows)
+                rows = []
+                self.progress('transactions', written, total, started)
+
+        written += self.flush_transactions(rows)
+        self.progress('transactions', written, total, started)
+        print()
+
+    def flush_transactions(self, rows):
+        if not rows:
+            return 0
+        self.cursor.executemany(
+            "INSERT INTO transactions (from_account, to_account, transaction_type, amount, fee, currency, "
+            "description, transaction_date) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+            rows
+        )
+        self.conn.commit()
+        return len(rows)
+
+    def write_balances(self, accounts):
+        rows = [(a['account_id'], a['user_id'], a['account_number'], a['account_type'], a['balance'])
+                for a in accounts if a['balance']]
+        self.insert_many(
+            "INSERT INTO accounts (account_id, user_id, account_number, account_type, balance) "
+            "VALUES (%s, %s, %s, %s, %s) ON DUPLICATE KEY UPDATE balance = VALUES(balance)",
+            rows
+        )
+
+    def seed_loans(self, accounts):
+        by_user = {}
+        for account in accounts:
+            if account['status'] == 'active':
+                by_user.setdefault(account['user_id'], account)
+        rows = []
+        for user_id, account in by_user.items():
+            if self.rng.random() >= self.args.loan_fraction:
+                continue
+            loan_type, rate = self.rng.choice(LOAN_TYPES)
+            principal = round(self.rng.uniform(50_000, 5_000_000), -3)
+            tenure = self.rng.choice((12, 24, 36, 60, 120, 240))
+            monthly = emi(principal, rate, tenure)
+            status = weighted(self.rng, LOAN_STATUSES)
+            applied = datetime.now() - timedelta(days=self.rng.randint(0, self.args.days))
+            decided = status != 'pending'
+            rows.append((user_id, account['account_id'], loan_type, principal, rate, tenure, monthly,
+                         round(monthly * tenure, 2), status, f"Bench {loan_type} loan", applied,
+                         1 if decided else None, applied + timedelta(days=2) if decided else None))
+        self.insert_many(
+            "INSERT INTO loans (user_id, account_id, loan_type, loan_amount, interest_rate, tenure_months, "
+            "monthly_emi, total_payable, status, purpose, applied_at, approved_by, approved_at) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+            rows
+        )
+        return len(rows)
+
+    @staticmethod
+    def progress(label, done, total, started):
+        elapsed = time.perf_counter() - started
+        rate = done / elapsed if elapsed else 0
+        sys.stdout.write(f"\r  {label}: {done:,}/{total:,} ({rate:,.0f} rows/s)")
+        sys.stdout.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--users', type=int, help='override the number of users')
+    parser.add_argument('--transactions', type=int, help='override the number of transactions')
+    parser.add_argument('--days', type=int, default=365, help='history length in days')
+    parser.add_argument('--hot-fraction', type=float, default=0.001, help='fraction of accounts that are hot')
+    parser.add_argument('--hot-share', type=float, default=0.2, help='share of transfers going to hot accounts')
+    parser.add_argument('--loan-fraction', type=float, default=0.05, help='fraction of users with a loan')
+    parser.add_argument('--password', default='bench123', help='password for generated users')
+    parser.add_argument('--batch', type=int, default=5000, help='rows per multi-row INSERT')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    scale = SCALES[args.scale]
+    args.users = args.users or scale['users']
+    args.transactions = args.transactions or scale['transactions']
+
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        seeder = Seeder(conn, args)
+        started = time.perf_counter()
+
+        print(f"Seeding {args.users:,} users...")
+        user_ids = seeder.seed_users()
+        accounts = seeder.seed_accounts(user_ids)
+        print(f"Seeded {len(accounts):,} accounts")
+
+        print(f"Seeding {args.transactions:,} transactions...")
+        seeder.seed_transactions(accounts)
+        seeder.write_balances(accounts)
+
+        loans = seeder.seed_loans(accounts)
+        print(f"Seeded {loans:,} loans")
+        print(f"Done in {time.perf_counter() - started:.1f}s")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
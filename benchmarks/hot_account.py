@@ -0,0 +1,190 @@
+"""
+Measure transfer throughput into one hot recipient, with and without
+balance slots.
+
+    python -m benchmarks.hot_account --concurrency 32 --duration 20 --slots 16
+
+--concurrency threads, each with its own sender account and connection,
+call transfer_money into the same recipient for --duration seconds. This
+runs twice: once with hot-account mode off, where every transfer waits for
+the recipient's row lock, and once with --slots balance slots, with a
+SlotConsolidator folding the slots every HOT_ACCOUNT_CONSOLIDATE_INTERVAL
+seconds as the app does. Transfers/s and p50/p95 latency are reported for
+each mode. The recipient's balance and its credit total in account_rollups
+(summed over its rollup slots) are then checked against the number of
+successful transfers. Afterwards the recipient is restored to its previous
+mode.
+
+Run it against a benchmark database only (`python -m benchmarks.datagen`);
+the transfers it makes are not reversed.
+"""
+import argparse
+import threading
+import time
+from decimal import Decimal
+
+import mysql.connector
+
+from benchmarks.common import percentile
+from db import DB_CONFIG, call_procedure
+from hot_accounts import (
+    ACCOUNT_BALANCE_SQL, ACCOUNT_ROLLUPS_JOIN, HOT_ACCOUNT_CONSOLIDATE_INTERVAL, SlotConsolidator
+)
+
+AMOUNT = Decimal('1.00')
+
+
+def connect():
+    return mysql.connector.connect(**DB_CONFIG)
+
+
+def setup(conn, concurrency):
+    """(recipient account_id, previous slot count, sender account_ids)"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT account_id, balance_slots FROM accounts "
+            "WHERE status = 'active' AND account_type = 'savings' ORDER BY account_id LIMIT %s",
+            (concurrency + 1,)
+        )
+        rows = cursor.fetchall()
+        if len(rows) < concurrency + 1:
+            raise SystemExit(f"Need {concurrency + 1} active savings accounts; run `python -m benchmarks.datagen`")
+        conn.commit()
+        recipient, slots = rows[0]
+        return recipient, slots, [row[0] for row in rows[1:]]
+    finally:
+        cursor.close()
+
+
+def balance(conn, account_id):
+    """(balance, total credits in account_rollups)"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            f"SELECT {ACCOUNT_BALANCE_SQL}, COALESCE(r.total_credits, 0) FROM accounts a "
+            f"{ACCOUNT_ROLLUPS_JOIN} WHERE a.account_id = %s",
+            (account_id,)
+        )
+        value = cursor.fetchone()
+        conn.commit()
+        return value
+    finally:
+        cursor.close()
+
+
+def set_slots(conn, account_id, slots):
+    cursor = conn.cursor()
+    try:
+        cursor.callproc('set_balance_slots', [account_id, slots, None])
+    finally:
+        cursor.close()
+
+
+def fund(conn, senders, transfers_per_sender):
+    """Deposit enough into every sender for the whole run"""
+    cursor = conn.cursor()
+    try:
+        for sender in senders:
+            call_procedure(cursor, 'deposit_money', [sender, AMOUNT * transfers_per_sender], 1)
+    finally:
+        cursor.close()
+
+
+def run(recipient, senders, duration):
+    """Transfer from every sender at once for `duration` seconds; returns (latencies, successes, failures)"""
+    latencies = []
+    failures = []
+    successes = [0]
+    lock = threading.Lock()
+    deadline = [0.0]
+
+    def worker(sender):
+        conn = connect()
+        cursor = conn.cursor()
+        mine = []
+        done = 0
+        errors = []
+        start_line.wait()
+        try:
+            while time.perf_counter() < deadline[0]:
+                started = time.perf_counter()
+                transaction_id, message = call_procedure(
+                    cursor, 'transfer_money', [sender, recipient, AMOUNT, 'Hot account bench', None, None], 2
+                )
+                mine.append(time.perf_counter() - started)
+                if transaction_id and transaction_id > 0:
+                    done += 1
+                else:
+                    errors.append(message)
+        finally:
+            cursor.close()
+            conn.close()
+        with lock:
+            latencies.extend(mine)
+            successes[0] += done
+            failures.extend(errors)
+
+    threads = [threading.Thread(target=worker, args=(sender,)) for sender in senders]
+    start_line = threading.Barrier(len(threads) + 1)
+    for thread in threads:
+        thread.start()
+    deadline[0] = time.perf_counter() + duration
+    start_line.wait()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), successes[0], failures
+
+
+def consolidate_until(stop, consolidator):
+    while not stop.wait(consolidator.interval):
+        consolidator.consolidate()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=32, help='concurrent senders')
+    parser.add_argument('--duration', type=float, default=20, help='seconds per mode')
+    parser.add_argument('--slots', type=int, default=16, help='balance slots in hot mode')
+    args = parser.parse_args(argv)
+
+    conn = connect()
+    recipient, previous_slots, senders = setup(conn, args.concurrency)
+    try:
+        # Generous upper bound on the transfers one sender can make
+        fund(conn, senders, int(args.duration * 5000))
+
+        print(f"{'mode':<14} {'transfers/s':>12} {'p50 ms':>9} {'p95 ms':>9} {'failures':>9} {'balance':>8}")
+        throughput = {}
+        for mode, slots in (('row lock', 0), (f'{args.slots} slots', args.slots)):
+            set_slots(conn, recipient, slots)
+            before, credits_before = balance(conn, recipient)
+
+            stop = threading.Event()
+            consolidator = SlotConsolidator(connect=connect, interval=HOT_ACCOUNT_CONSOLIDATE_INTERVAL)
+            folder = threading.Thread(target=consolidate_until, args=(stop, consolidator))
+            if slots:
+                folder.start()
+            latencies, successes, failures = run(recipient, senders, args.duration)
+            stop.set()
+            if slots:
+                folder.join()
+
+            after, credits_after = balance(conn, recipient)
+            check = 'ok' if after - before == credits_after - credits_before == AMOUNT * successes else 'WRONG'
+            throughput[mode] = successes / args.duration
+            print(f"{mode:<14} {throughput[mode]:>12,.0f} {percentile(latencies, 50) * 1000:>9.2f} "
+                  f"{percentile(latencies, 95) * 1000:>9.2f} {len(failures):>9} {check:>8}")
+            for message in sorted(set(failures)):
+                print(f"    failure: {message}")
+
+        base, hot = throughput.values()
+        if base:
+            print(f"Throughput with balance slots: {hot / base:.1f}x")
+    finally:
+        set_slots(conn, recipient, previous_slots)
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+"""
+Drive the running app with a realistic request mix and record latencies.
+
+    python -m benchmarks.loadtest --url http://127.0.0.1:5000 --concurrency 32 --duration 60
+    python -m benchmarks.loadtest --compare benchmarks/results/loadtest-20261017-101500.json
+
+Virtual users log in as the customers created by benchmarks.datagen
+(bench<N>@bench.vit) and as the admin, then loop over a weighted mix of
+login, account listing, history, transfer, deposit and admin endpoints.
+Per-endpoint throughput and p50/p95/p99 latency are printed and written as
+JSON to benchmarks/results/. With --compare, the run is checked against a
+previous result file and the command exits with status 1 if any endpoint's
+p95 latency or throughput regressed by more than --threshold percent.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import mysql.connector
+
+from benchmarks.common import ApiClient, summarize
+from db import DB_CONFIG
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+# Relative weight of each endpoint in the request mix
+DEFAULT_MIX = {
+    'login': 2,
+    'user/accounts': 25,
+    'user/transactions': 25,
+    'user/transfer': 10,
+    'user/deposit': 5,
+    'user/loans': 8,
+    'admin/stats': 10,
+    'admin/pending-accounts': 5,
+    'admin/pending-loans': 5,
+    'admin/all-accounts': 3,
+    'admin/all-loans': 2
+}
+
+
+def load_bench_users(limit, seed):
+    """Pick generated customers that have at least one active INR account"""
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT u.email, a.account_id, a.account_number
+            FROM users u
+            JOIN accounts a ON a.user_id = u.user_id
+            WHERE u.email LIKE 'bench%%@bench.vit' AND a.status = 'active' AND a.currency = 'INR'
+            ORDER BY u.user_id
+            LIMIT %s
+        """, (limit * 20,))
+        rows = cursor.fetchall()
+        cursor.close()
+    finally:
+        conn.close()
+
+    users = {}
+    for row in rows:
+        users.setdefault(row['email'], row)
+    picked = list(users.values())
+    random.Random(seed).shuffle(picked)
+    return picked[:limit]
+
+
+class VirtualUser:
+    def __init__(self, base_url, profile, recipients, password, admin_credentials, rng):
+        self.base_url = base_url
+        self.profile = profile
+        self.recipients = recipients
+        self.password = password
+        self.rng = rng
+        self.user = ApiClient(base_url).login(profile['email'], password)
+        self.admin = ApiClient(base_url).login(*admin_credentials, admin=True)
+
+    def run(self, label):
+        account_id = self.profile['account_id']
+        if label == 'login':
+            return ApiClient(self.base_url).request(
+                'POST', '/api/login', {'email': self.profile['email'], 'password': self.password})
+        if label == 'user/accounts':
+            return self.user.request('GET', '/api/user/accounts')
+        if label == 'user/transactions':
+            return self.user.request('GET', f'/api/user/transactions/{account_id}')
+        if label == 'user/transfer':
+            return self.user.request('POST', '/api/user/transfer', {
+                'from_account': account_id,
+                'to_account_number': self.rng.choice(self.recipients),
+                'amount': round(self.rng.uniform(1, 50), 2),
+                'description': 'Load test transfer'
+            })
+        if label == 'user/deposit':
+            return self.user.request('POST', '/api/user/deposit', {
+                'account_id': account_id, 'amount': round(self.rng.uniform(10, 500), 2)})
+        if label == 'user/loans':
+            return self.user.request('GET', '/api/user/loans')
+        return self.admin.request('GET', '/api/' + label)
+
+
+def run(args):
+    profiles = load_bench_users(args.users, args.seed)
+    if not profiles:
+        raise SystemExit("No generated users found; run `python -m benchmarks.datagen` first")
+    recipients = [p['account_number'] for p in profiles]
+    labels = list(args.mix)
+    weights = [args.mix[label] for label in labels]
+
+    print(f"Logging in {args.concurrency} virtual users...")
+    vusers = [
+        VirtualUser(args.url, profiles[i % len(profiles)], recipients, args.password,
+                    (args.admin_email, args.admin_password), random.Random(args.seed + i))
+        for i in range(args.concurrency)
+    ]
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def worker(vuser):
+        while time.perf_counter() < deadline:
+            label = vuser.rng.choices(labels, weights)[0]
+            try:
+                status, data, elapsed = vuser.run(label)
+                ok = status == 200 and data is not None and data.get('success', False)
+            except OSError:
+                ok, elapsed = False, None
+            with lock:
+                if elapsed is not None:
+                    latencies[label].append(elapsed)
+                if not ok:
+                    errors[label] += 1
+
+    print(f"Running for {args.duration}s...")
+    threads = [threading.Thread(target=worker, args=(vuser,)) for vuser in vusers]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - started
+
+    return {
+        'meta': {
+            'url': args.url,
+            'concurrency': args.concurrency,
+            'duration_s': round(duration, 3),
+            'started_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'commit': git_commit(),
+            'mix': args.mix
+        },
+        'endpoints': {label: summarize(latencies[label], errors[label], duration)
+                      for label in labels if latencies[label] or errors[label]}
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(result):
+    print(f"{'endpoint':<24} {'requests':>9} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for label, row in result['endpoints'].items():
+        print(f"{label:<24} {row['requests']:>9} {row['throughput_rps']:>9} {row['p50_ms']:>9} "
+              f"{row['p95_ms']:>9} {row['p99_ms']:>9} {row['errors']:>7}")
+
+
+def compare(current, previous, threshold):
+    """Print per-endpoint deltas; return the list of regressions"""
+    regressions = []
+    print(f"\nCompared with run at {previous['meta'].get('started_at')} (commit {previous['meta'].get('commit')}):")
+    print(f"{'endpoint':<24} {'p95 ms':>19} {'change':>8} {'req/s':>19} {'change':>8}")
+    for label, now in current['endpoints'].items():
+        before = previous['endpoints'].get(label)
+        if not before:
+            continue
+        p95_change = pct_change(before['p95_ms'], now['p95_ms'])
+        rps_change = pct_change(before['throughput_rps'], now['throughput_rps'])
+        flag = ''
+        if p95_change > threshold or rps_change < -threshold:
+            regressions.append(label)
+            flag = '  REGRESSION'
+        print(f"{label:<24} {before['p95_ms']:>9} -> {now['p95_ms']:<6} {p95_change:>+7.1f}% "
+              f"{before['throughput_rps']:>9} -> {now['throughput_rps']:<6} {rps_change:>+7.1f}%{flag}")
+    return regressions
+
+
+def pct_change(before, after):
+    return (after - before) / before * 100 if before else 0.0
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        label, weight = part.split('=')
+        if label not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint {label}")
+        mix[label] = float(weight)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds')
+    parser.add_argument('--users', type=int, default=200, help='distinct generated customers to log in as')
+    parser.add_argument('--password', default='bench123', help='password used by benchmarks.datagen')
+    parser.add_argument('--admin-email', default='admin@bankvit.com')
+    parser.add_argument('--admin-password', default='admin123')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help='weights, e.g. user/accounts=5,admin/stats=1')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/loadtest-<time>.json)')
+    parser.add_argument('--compare', help='previous result file to compare against')
+    parser.add_argument('--threshold', type=float, default=10.0, help='regression threshold in percent')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    result = run(args)
+    print_report(result)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"loadtest-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        regressions = compare(result, previous, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} endpoint(s) regressed by more than {args.threshold}%")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+Compare the old and new ways of turning result rows into a JSON response.
+
+    python -m benchmarks.row_codec --rows 5000 --repeat 20
+
+Both paths start from the tuples the MySQL driver returns for one page of
+/api/admin/all-loans and of /api/user/transactions, and end with the
+response body:
+
+  before  a dict per row, as cursor(dictionary=True) builds it, then
+          format_dates() on the datetime columns, then Flask's standard
+          JSON encoder (Decimal through its `default` hook)
+  after   codec.RowCodec, compiled once from the cursor description, then
+          codec.JSONProvider (orjson)
+
+Rows/s is reported for each path, for the conversion alone and for the
+whole path including encoding, as the best of --repeat runs. Both paths
+must produce the same JSON document. No database is needed; the driver's
+own decoding of the rows is the same for both paths and is not included.
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from codec import FIELD_DATETIME, FIELD_NEWDECIMAL, FIELD_TIMESTAMP, JSONProvider, codec_for
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+FIELD_LONG = 3
+FIELD_VAR_STRING = 253
+
+# (column, MySQL type) as in cursor.description
+SHAPES = {
+    'all-loans': [
+        ('loan_id', FIELD_LONG), ('loan_type', FIELD_VAR_STRING), ('loan_amount', FIELD_NEWDECIMAL),
+        ('interest_rate', FIELD_NEWDECIMAL), ('tenure_months', FIELD_LONG), ('monthly_emi', FIELD_NEWDECIMAL),
+        ('status', FIELD_VAR_STRING), ('full_name', FIELD_VAR_STRING), ('email', FIELD_VAR_STRING),
+        ('account_number', FIELD_VAR_STRING), ('applied_at', FIELD_TIMESTAMP),
+    ],
+    'transactions': [
+        ('transaction_id', FIELD_LONG), ('transaction_type', FIELD_VAR_STRING), ('amount', FIELD_NEWDECIMAL),
+        ('fee', FIELD_NEWDECIMAL), ('description', FIELD_VAR_STRING), ('transaction_date', FIELD_DATETIME),
+        ('status', FIELD_VAR_STRING), ('type', FIELD_VAR_STRING), ('other_account', FIELD_VAR_STRING),
+    ],
+}
+DATETIME_COLUMNS = {'all-loans': ('applied_at',), 'transactions': ('transaction_date',)}
+
+
+def sample_value(rng, column, type_code, i):
+    if type_code == FIELD_NEWDECIMAL:
+        return Decimal(rng.randrange(0, 10_000_000)) / 100
+    if type_code in (FIELD_DATETIME, FIELD_TIMESTAMP):
+        return datetime(2024, 1, 1) + timedelta(seconds=rng.randrange(0, 86400 * 365))
+    if type_code == FIELD_LONG:
+        return i
+    if column == 'other_account' and i % 5 == 0:
+        return None
+    return f"{column}-{rng.randrange(0, 10**8):08d}"
+
+
+def format_dates(row, *fields):
+    """app.format_dates() as the routes called it"""
+    for field in fields:
+        if row.get(field):
+            row[field] = row[field].strftime(DATETIME_FORMAT)
+    return row
+
+
+def before(description, rows, date_columns, provider):
+    names = [d[0] for d in description]
+    converted = [dict(zip(names, row)) for row in rows]
+    for row in converted:
+        format_dates(row, *date_columns)
+    return converted, lambda: provider.dumps({'success': True, 'rows': converted}, separators=(',', ':'))
+
+
+def after(description, rows, date_columns, provider):
+    converted = codec_for(description).rows(rows)
+    return converted, lambda: provider.dumps({'success': True, 'rows': converted})
+
+
+def best_rate(run, count, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - started)
+    return count / best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5000, help='rows per response')
+    parser.add_argument('--repeat', type=int, default=20, help='runs per measurement; the best is reported')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    app = Flask(__name__)
+    providers = {'before': DefaultJSONProvider(app), 'after': JSONProvider(app)}
+    paths = {'before': before, 'after': after}
+    rng = random.Random(args.seed)
+
+    print(f"{'shape':<14} {'path':<8} {'convert rows/s':>15} {'total rows/s':>13}")
+    for shape, columns in SHAPES.items():
+        description = [(name, type_code, None, None, None, None, 1, 0) for name, type_code in columns]
+        rows = [tuple(sample_value(rng, name, type_code, i) for name, type_code in columns)
+                for i in range(args.rows)]
+        date_columns = DATETIME_COLUMNS[shape]
+
+        bodies = {}
+        totals = {}
+        for name, path in paths.items():
+            provider = providers[name]
+            convert = best_rate(lambda: path(description, rows, date_columns, provider), args.rows, args.repeat)
+
+            def whole():
+                _, encode = path(description, rows, date_columns, provider)
+                return encode()
+            totals[name] = best_rate(whole, args.rows, args.repeat)
+            bodies[name] = json.loads(whole())
+            print(f"{shape:<14} {name:<8} {convert:>15,.0f} {totals[name]:>13,.0f}")
+
+        if bodies['before'] != bodies['after']:
+            raise SystemExit(f"{shape}: the two paths produced different JSON")
+        print(f"{shape:<14} speed-up {totals['after'] / totals['before']:>29.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+Compare the old and new write paths, procedure by procedure.
+
+    python -m benchmarks.write_path --samples 500
+
+Each sample runs the write procedures behind the write endpoints in turn:
+register a user, open an account, approve it, deposit into it, apply for a
+loan, approve the loan, and transfer to a fixed recipient account. It does
+this once with the old path and once with the new path, alternating, so both
+see the same database state:
+
+  before  cursor.callproc(), a SELECT of the @_<proc>_<n> OUT variables and
+          a COMMIT; transfers first look the recipient up by account number
+  after   db.call_procedure(): CALL, SELECT and COMMIT in one multi-statement
+          query; transfers find the recipient in a RecipientCache
+
+p50/p95 latency is reported per endpoint. The time saved is roughly the
+number of round trips saved times the network round-trip time, so it is
+larger against a remote MySQL server than against a local one. Run it
+against a benchmark database only; the users, accounts, loans and
+transactions it creates are not removed.
+"""
+import argparse
+import time
+from datetime import date
+
+import mysql.connector
+
+from account_numbers import RecipientCache
+from benchmarks.common import percentile
+from benchmarks.datagen import pan_for
+from db import DB_CONFIG, call_procedure
+
+ENDPOINTS = ('register', 'create_account', 'approve_account', 'deposit', 'apply_loan', 'approve_loan', 'transfer')
+MODES = ('before', 'after')
+
+
+def legacy_call(conn, cursor, name, args, out_count):
+    """The previous write path: callproc, SELECT of the OUT variables, COMMIT"""
+    cursor.callproc(name, list(args) + [None] * out_count)
+    outs = [f"@_{name}_{len(args) + i}" for i in range(out_count)]
+    cursor.execute(f"SELECT {', '.join(outs)}")
+    row = cursor.fetchone()
+    conn.commit()
+    return row
+
+
+class WritePath:
+    """Runs one sample of every write procedure with the old or new path"""
+
+    def __init__(self, conn, mode, admin_id, recipient):
+        self.conn = conn
+        self.mode = mode
+        self.admin_id = admin_id
+        self.recipient = recipient
+        self.cursor = conn.cursor()
+        self.recipients = RecipientCache()
+        self.latencies = {endpoint: [] for endpoint in ENDPOINTS}
+        self.failures = []
+
+    def call(self, endpoint, name, args, out_count):
+        started = time.perf_counter()
+        if self.mode == 'before':
+            row = legacy_call(self.conn, self.cursor, name, args, out_count)
+        else:
+            row = call_procedure(self.cursor, name, args, out_count)
+        self.latencies[endpoint].append(time.perf_counter() - started)
+        return row
+
+    def lookup_recipient(self):
+        account = self.recipients.get(self.recipient) if self.mode == 'after' else None
+        if account is None:
+            self.cursor.execute(
+                "SELECT account_id, user_id, status, account_type, currency FROM accounts WHERE account_number = %s",
+                (self.recipient,)
+            )
+            account_id, user_id, status, account_type, currency = self.cursor.fetchone()
+            account = {'account_id': account_id, 'user_id': user_id, 'account_type': account_type,
+                       'currency': currency}
+            self.recipients.put(self.recipient, account)
+        return account
+
+    def check(self, endpoint, ok, message):
+        if not ok:
+            self.failures.append(f"{endpoint}: {message}")
+        return ok
+
+    def run(self, n):
+        user_id, message = self.call('register', 'register_user', [
+            f"writepath{n}@bench.vit", 'bench', 'Write Path Bench', f"9{n % 1_000_000_000:09d}",
+            'Bench address', date(1990, 1, 1), f"{200_000_000_000 + n:012d}", pan_for(2_000_000 + n)
+        ], 2)
+        if not self.check('register', user_id and user_id > 0, message):
+            return
+        account_id, _, message = self.call('create_account', 'create_account', [user_id, 'savings'], 3)
+        if not self.check('create_account', account_id and account_id > 0, message):
+            return
+        message, = self.call('approve_account', 'approve_account', [account_id, self.admin_id], 1)
+        self.check('approve_account', message == 'Account approved successfully', message)
+        message, = self.call('deposit', 'deposit_money', [account_id, 10_000], 1)
+        self.check('deposit', message == 'Deposit successful', message)
+        loan_id, message = self.call('apply_loan', 'apply_loan',
+                                     [user_id, account_id, 'personal', 50_000, 12, 'Bench'], 2)
+        if self.check('apply_loan', loan_id and loan_id > 0, message):
+            message, = self.call('approve_loan', 'approve_loan', [loan_id, self.admin_id, True], 1)
+            self.check('approve_loan', message == 'Loan approved and amount disbursed', message)
+
+        started = time.perf_counter()
+        to_account = self.lookup_recipient()
+        elapsed = time.perf_counter() - started
+        transaction_id, message = self.call('transfer', 'transfer_money',
+                                            [account_id, to_account['account_id'], 100, 'Bench', None, None], 2)
+        self.latencies['transfer'][-1] += elapsed
+        self.check('transfer', transaction_id and transaction_id > 0, message)
+
+
+def setup(conn):
+    """(admin_id, first id for generated users, account number of an active savings recipient)"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT admin_id FROM admin ORDER BY admin_id LIMIT 1")
+        row = cursor.fetchone()
+        if not row:
+            raise SystemExit("No admin found; load database/schema.sql first")
+        admin_id = row[0]
+        cursor.execute("SELECT COALESCE(MAX(user_id), 0) + 1 FROM users")
+        first = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT account_number FROM accounts WHERE status = 'active' AND account_type = 'savings' "
+            "ORDER BY account_id LIMIT 1"
+        )
+        row = cursor.fetchone()
+        if not row:
+            raise SystemExit("No active savings account found; run `python -m benchmarks.datagen` first")
+        return admin_id, first, row[0]
+    finally:
+        cursor.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--samples', type=int, default=500, help='samples per endpoint and path')
+    args = parser.parse_args(argv)
+
+    conns = {mode: mysql.connector.connect(**DB_CONFIG) for mode in MODES}
+    try:
+        admin_id, first, recipient = setup(conns['before'])
+        paths = {mode: WritePath(conns[mode], mode, admin_id, recipient) for mode in MODES}
+        for i in range(args.samples):
+            for offset, mode in enumerate(MODES):
+                paths[mode].run(first + 2 * i + offset)
+
+        print(f"{'endpoint':<16} {'before p50':>11} {'before p95':>11} {'after p50':>10} {'after p95':>10} "
+              f"{'p50 change':>11}")
+        for endpoint in ENDPOINTS:
+            before = sorted(paths['before'].latencies[endpoint])
+            after = sorted(paths['after'].latencies[endpoint])
+            before_p50, after_p50 = percentile(before, 50), percentile(after, 50)
+            change = (after_p50 - before_p50) / before_p50 * 100 if before_p50 else 0.0
+            print(f"{endpoint:<16} {before_p50 * 1000:>9.2f}ms {percentile(before, 95) * 1000:>9.2f}ms "
+                  f"{after_p50 * 1000:>8.2f}ms {percentile(after, 95) * 1000:>8.2f}ms {change:>+10.1f}%")
+        for mode in MODES:
+            for message in sorted(set(paths[mode].failures)):
+                print(f"    {mode} failure: {message}")
+    finally:
+        for conn in conns.values():
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
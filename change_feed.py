@@ -0,0 +1,216 @@
+"""
+Change feed for the admin approval queues.
+
+Triggers on accounts and loans append a row to pending_events whenever an
+item enters the pending queue ('created') or leaves it ('resolved'). One
+poller thread per process reads new events with a single primary-key range
+query. For created items it also fetches the row the dashboard shows, and
+then it wakes every connected admin. Each admin therefore costs nothing
+extra in the database; the full pending lists are fetched only when a
+client first connects or falls too far behind.
+
+Events are numbered in the order the poller saw them, and clients resume
+from that number (the SSE Last-Event-ID). pending_events ids come from
+AUTO_INCREMENT, so a transaction that commits late can add an id below ones
+already read. The poller therefore remembers the ids it has seen above the
+lowest missing one, and keeps re-reading from that point for up to
+FEED_GAP_TIMEOUT seconds.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from mysql.connector import Error
+
+from db import get_db_connection
+
+FEED_POLL_INTERVAL = float(os.environ.get('FEED_POLL_INTERVAL', 1))
+# Events kept in memory for clients that reconnect
+FEED_BUFFER_SIZE = int(os.environ.get('FEED_BUFFER_SIZE', 10_000))
+# Seconds to wait for a missing event id before assuming it was rolled back
+FEED_GAP_TIMEOUT = float(os.environ.get('FEED_GAP_TIMEOUT', 10))
+# Events older than this are deleted from pending_events
+FEED_RETENTION_HOURS = int(os.environ.get('FEED_RETENTION_HOURS', 24))
+# Seconds between keep-alive comments on an idle stream
+FEED_HEARTBEAT = float(os.environ.get('FEED_HEARTBEAT', 15))
+FEED_BATCH = 1000
+
+EVENTS_SQL = """
+    SELECT event_id, entity_type, entity_id, event
+    FROM pending_events
+    WHERE event_id > %s
+    ORDER BY event_id
+    LIMIT %s
+"""
+
+# Same columns as get_pending_accounts / get_pending_loans
+PENDING_ROWS_SQL = {
+    'account': """
+        SELECT a.account_id, a.account_number, a.account_type, u.full_name, u.email, u.phone, a.created_at
+        FROM accounts a
+        JOIN users u ON a.user_id = u.user_id
+        WHERE a.status = 'pending' AND a.account_id IN ({ids})
+    """,
+    'loan': """
+        SELECT l.loan_id, l.loan_type, l.loan_amount, l.interest_rate, l.tenure_months, l.monthly_emi,
+               l.purpose, u.full_name, u.email, a.account_number, l.applied_at
+        FROM loans l
+        JOIN users u ON l.user_id = u.user_id
+        JOIN accounts a ON l.account_id = a.account_id
+        WHERE l.status = 'pending' AND l.loan_id IN ({ids})
+    """
+}
+ROW_KEYS = {'account': 'account_id', 'loan': 'loan_id'}
+
+
+class ChangeFeed:
+    """
+    Polls pending_events and fans new events out to any number of waiters.
+
+    Cursors are "<epoch>-<seq>" strings. The epoch changes when the process
+    restarts, so a cursor from an earlier process is answered with a reset
+    rather than a wrong replay.
+    """
+
+    def __init__(self, connect=get_db_connection, poll_interval=FEED_POLL_INTERVAL,
+                 buffer_size=FEED_BUFFER_SIZE, gap_timeout=FEED_GAP_TIMEOUT):
+        self.connect = connect
+        self.poll_interval = poll_interval
+        self.gap_timeout = gap_timeout
+        self.epoch = format(int(time.time() * 1000), 'x')
+        self._events = deque(maxlen=buffer_size)
+        self._seq = 0
+        self._changed = threading.Condition()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        # Every event_id <= _low_water has been read (or given up on)
+        self._low_water = None
+        self._seen = set()
+        self._gap_since = None
+        self._polls = 0
+
+    def cursor(self):
+        """Cursor for "everything up to now"; used after a full reload"""
+        return f"{self.epoch}-{self._seq}"
+
+    def wait(self, cursor, timeout):
+        """
+        Block until there are events after `cursor` or `timeout` passes.
+        Returns (events, new_cursor), or (None, new_cursor) if the client
+        must reload the full lists.
+        """
+        self._ensure_started()
+        seq = self._parse(cursor)
+        with self._changed:
+            if seq is None or seq > self._seq or (self._events and seq < self._events[0]['seq'] - 1):
+                return None, self.cursor()
+            if seq == self._seq:
+                self._changed.wait(timeout)
+            events = [event for event in self._events if event['seq'] > seq]
+            return events, self.cursor()
+
+    def _parse(self, cursor):
+        try:
+            epoch, seq = (cursor or '').split('-')
+            return int(seq) if epoch == self.epoch else None
+        except ValueError:
+            return None
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='change-feed', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+            except Error:
+                pass  # Try again next interval; clients keep their cursors
+            time.sleep(self.poll_interval)
+
+    def poll(self):
+        conn = self.connect()
+        if not conn:
+            raise Error(msg='Database connection failed')
+        try:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                if self._low_water is None:
+                    # Start from now; new clients load the current lists themselves
+                    cursor.execute("SELECT COALESCE(MAX(event_id), 0) as event_id FROM pending_events")
+                    self._low_water = cursor.fetchone()['event_id']
+
+                cursor.execute(EVENTS_SQL, (self._low_water, FEED_BATCH))
+                rows = [row for row in cursor.fetchall() if row['event_id'] not in self._seen]
+                rows_by_id = self._fetch_rows(cursor, rows)
+
+                self._polls += 1
+                if self._polls % 3600 == 0:
+                    cursor.execute(
+                        "DELETE FROM pending_events WHERE created_at < NOW() - INTERVAL %s HOUR LIMIT 10000",
+                        (FEED_RETENTION_HOURS,)
+                    )
+                conn.commit()
+            finally:
+                cursor.close()
+        finally:
+            conn.close()
+
+        if rows:
+            self._publish(rows, rows_by_id)
+        self._advance()
+
+    def _fetch_rows(self, cursor, events):
+        """Dashboard rows of newly created items that are still pending"""
+        rows = {}
+        for entity_type, sql in PENDING_ROWS_SQL.items():
+            ids = sorted({e['entity_id'] for e in events if e['entity_type'] == entity_type and e['event'] == 'created'})
+            if not ids:
+                continue
+            cursor.execute(sql.format(ids=', '.join(['%s'] * len(ids))), ids)
+            for row in cursor.fetchall():
+                for field in ('created_at', 'applied_at'):
+                    if row.get(field):
+                        row[field] = row[field].strftime('%Y-%m-%d %H:%M:%S')
+                rows[(entity_type, row[ROW_KEYS[entity_type]])] = row
+        return rows
+
+    def _publish(self, events, rows_by_id):
+        with self._changed:
+            for event in events:
+                self._seen.add(event['event_id'])
+                self._seq += 1
+                self._events.append({
+                    'seq': self._seq,
+                    'entity_type': event['entity_type'],
+                    'event': event['event'],
+                    'id': event['entity_id'],
+                    'row': rows_by_id.get((event['entity_type'], event['entity_id']))
+                })
+            self._changed.notify_all()
+
+    def _advance(self):
+        """Move the low-water mark past contiguous ids, or past a gap that has timed out"""
+        while self._low_water + 1 in self._seen:
+            self._low_water += 1
+            self._seen.discard(self._low_water)
+        if not self._seen:
+            self._gap_since = None
+            return
+        now = time.monotonic()
+        if self._gap_since is None:
+            self._gap_since = now
+        elif now - self._gap_since >= self.gap_timeout:
+            # The missing id was rolled back or skipped by AUTO_INCREMENT
+            self._low_water = min(self._seen)
+            self._seen.discard(self._low_water)
+            self._gap_since = None
+            self._advance()
+
+
+change_feed = ChangeFeed()
@@ -0,0 +1,101 @@
+"""
+Typed row codec and JSON encoding for API responses.
+
+Read routes used dictionary cursors, which build a dict per row, then
+walked the rows again to format their datetime columns, and left Decimal
+values to Flask's generic JSON encoder. Instead, routes read plain tuple
+rows and convert them with a RowCodec. A codec is compiled once per result
+shape from the cursor's column metadata into one function that builds the
+response dict of a row, converting each column as its MySQL type needs,
+in a single pass. Codecs are cached by shape, so each query pays the
+compile cost once per process.
+
+The output is the same as before:
+
+  - DECIMAL columns become strings, as Flask's encoder wrote them
+  - DATETIME and TIMESTAMP columns become 'YYYY-MM-DD HH:MM:SS'
+    (app.DATETIME_FORMAT)
+  - other columns are left to the JSON encoder
+
+JSONProvider encodes responses with orjson, for both the Flask and the
+Quart app.
+"""
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+# MySQL protocol column types (mysql.connector FieldType, pymysql FIELD_TYPE)
+FIELD_DECIMAL = 0
+FIELD_TIMESTAMP = 7
+FIELD_DATETIME = 12
+FIELD_NEWDECIMAL = 246
+
+# Column type -> expression that converts the non-NULL value `v`
+CONVERTERS = {
+    FIELD_DECIMAL: "str({v})",
+    FIELD_NEWDECIMAL: "str({v})",
+    FIELD_TIMESTAMP: "{v}.isoformat(' ', 'seconds')",
+    FIELD_DATETIME: "{v}.isoformat(' ', 'seconds')",
+}
+
+# Dates go through DefaultJSONProvider.default, as with the standard encoder
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+_codecs = {}
+
+
+class RowCodec:
+    """Converts tuple rows of one result shape to response dicts"""
+
+    def __init__(self, columns, types, omit=()):
+        self.columns = tuple(columns)
+        self.index = {column: i for i, column in enumerate(self.columns)}
+        fields = []
+        for i, (column, type_code) in enumerate(zip(self.columns, types)):
+            if column in omit:
+                continue
+            value = f"r[{i}]"
+            converter = CONVERTERS.get(type_code)
+            if converter:
+                value = f"(None if {value} is None else {converter.format(v=value)})"
+            fields.append(f"{column!r}: {value}")
+        self.row = eval(f"lambda r: {{{', '.join(fields)}}}", {'__builtins__': {'str': str}})
+
+    def rows(self, rows):
+        """Response dicts for a list of tuple rows"""
+        return list(map(self.row, rows))
+
+    def raw(self, row):
+        """The unconverted values of a tuple row by column name, e.g. for a keyset cursor"""
+        return dict(zip(self.columns, row))
+
+    def to_tuple(self, row):
+        """A dict row (e.g. from the transaction archive) in this codec's column order"""
+        return tuple(row[column] for column in self.columns)
+
+
+def codec_for(description, omit=()):
+    """The RowCodec for a cursor's result, compiled on first use"""
+    key = (tuple((d[0], d[1]) for d in description), tuple(omit))
+    codec = _codecs.get(key)
+    if codec is None:
+        codec = _codecs[key] = RowCodec([d[0] for d in description], [d[1] for d in description], omit)
+    return codec
+
+
+def fetch_rows(cursor, omit=()):
+    """All rows of a plain (tuple) cursor's result as response dicts"""
+    if not cursor.description:
+        return []
+    return codec_for(cursor.description, omit).rows(cursor.fetchall())
+
+
+class JSONProvider(DefaultJSONProvider):
+    """DefaultJSONProvider that encodes with orjson"""
+
+    def dumps(self, obj, **kwargs):
+        option = ORJSON_OPTIONS
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option).decode()
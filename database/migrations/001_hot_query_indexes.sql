@@ -0,0 +1,29 @@
+-- Secondary indexes for the hot read paths.
+--
+-- Each composite index leads with the column the single-column FK index
+-- covered, so that index becomes redundant and is dropped.
+
+-- get_pending_loans: WHERE status = 'pending' ORDER BY applied_at DESC
+CREATE INDEX idx_loans_status_applied ON loans (status, applied_at);
+
+-- get_user_loans: WHERE user_id = ? ORDER BY applied_at DESC
+CREATE INDEX idx_loans_user_applied ON loans (user_id, applied_at);
+ALTER TABLE loans DROP INDEX user_id;
+
+-- get_pending_accounts: WHERE status = 'pending' ORDER BY created_at DESC
+CREATE INDEX idx_accounts_status_created ON accounts (status, created_at);
+
+-- /api/user/accounts: WHERE user_id = ? ORDER BY created_at DESC
+CREATE INDEX idx_accounts_user_created ON accounts (user_id, created_at);
+ALTER TABLE accounts DROP INDEX user_id;
+
+-- Transaction history, one index per direction
+CREATE INDEX idx_transactions_from_date ON transactions (from_account, transaction_date);
+ALTER TABLE transactions DROP INDEX from_account;
+CREATE INDEX idx_transactions_to_date ON transactions (to_account, transaction_date);
+ALTER TABLE transactions DROP INDEX to_account;
+
+-- get_transaction_stats and the dashboard totals: WHERE status = 'completed',
+-- grouped by date and type. Covering, so they never touch the table rows.
+CREATE INDEX idx_transactions_status_date
+    ON transactions (status, transaction_date, transaction_type, amount);
@@ -0,0 +1,110 @@
+-- Allocate account numbers from a sequence instead of probing random ones.
+--
+-- Numbers become 'VIT' + 12-digit sequence value + Luhn check digit. Numbers
+-- already issued are kept; create_account retries with the next value in
+-- the unlikely case that a sequence number matches one of them.
+
+CREATE TABLE IF NOT EXISTS account_number_sequence (
+    id TINYINT PRIMARY KEY,
+    next_value BIGINT NOT NULL
+);
+
+INSERT IGNORE INTO account_number_sequence (id, next_value) VALUES (1, 1);
+
+DROP FUNCTION IF EXISTS format_account_number;
+DROP PROCEDURE IF EXISTS allocate_account_numbers;
+DROP PROCEDURE IF EXISTS create_account;
+
+DELIMITER //
+
+CREATE FUNCTION format_account_number(p_seq BIGINT)
+RETURNS VARCHAR(16)
+DETERMINISTIC
+BEGIN
+    DECLARE digits CHAR(12);
+    DECLARE pos INT DEFAULT 12;
+    DECLARE d INT;
+    DECLARE total INT DEFAULT 0;
+    DECLARE double_it BOOLEAN DEFAULT TRUE;
+    
+    SET digits = LPAD(p_seq, 12, '0');
+    
+    -- Double every second digit, starting from the rightmost
+    WHILE pos >= 1 DO
+        SET d = CAST(SUBSTRING(digits, pos, 1) AS UNSIGNED);
+        IF double_it THEN
+            SET d = d * 2;
+            IF d > 9 THEN
+                SET d = d - 9;
+            END IF;
+        END IF;
+        SET total = total + d;
+        SET double_it = NOT double_it;
+        SET pos = pos - 1;
+    END WHILE;
+    
+    RETURN CONCAT('VIT', digits, (10 - total % 10) % 10);
+END//
+
+CREATE PROCEDURE allocate_account_numbers(
+    IN p_count INT,
+    OUT p_first BIGINT
+)
+BEGIN
+    UPDATE account_number_sequence
+    SET next_value = LAST_INSERT_ID(next_value + p_count)
+    WHERE id = 1;
+    
+    SET p_first = LAST_INSERT_ID() - p_count;
+END//
+
+CREATE PROCEDURE create_account(
+    IN p_user_id INT,
+    IN p_account_type VARCHAR(20),
+    OUT p_account_id INT,
+    OUT p_account_number VARCHAR(16),
+    OUT p_message VARCHAR(255)
+)
+BEGIN
+    DECLARE user_exists INT;
+    DECLARE acc_num VARCHAR(16);
+    DECLARE curr VARCHAR(3);
+    DECLARE seq BIGINT;
+    DECLARE duplicate_number BOOLEAN DEFAULT FALSE;
+    DECLARE CONTINUE HANDLER FOR 1062 SET duplicate_number = TRUE;
+    
+    -- Check if user exists
+    SELECT COUNT(*) INTO user_exists FROM users WHERE user_id = p_user_id AND is_active = TRUE;
+    
+    IF user_exists = 0 THEN
+        SET p_account_id = -1;
+        SET p_message = 'User not found or inactive';
+    ELSE
+        -- Set currency based on account type
+        IF p_account_type = 'international' THEN
+            SET curr = 'USD';
+        ELSE
+            SET curr = 'INR';
+        END IF;
+        
+        -- Sequence numbers never repeat; a duplicate can only be a number
+        -- issued randomly before the sequence existed, so take the next one
+        REPEAT
+            SET duplicate_number = FALSE;
+            CALL allocate_account_numbers(1, seq);
+            SET acc_num = format_account_number(seq);
+            
+            INSERT INTO accounts (user_id, account_number, account_type, currency, status)
+            VALUES (p_user_id, acc_num, p_account_type, curr, 'pending');
+        UNTIL NOT duplicate_number
+        END REPEAT;
+        
+        SET p_account_id = LAST_INSERT_ID();
+        SET p_account_number = acc_num;
+        SET p_message = 'Account created successfully. Awaiting admin approval.';
+    END IF;
+END//
+
+DELIMITER ;
+
+DROP FUNCTION IF EXISTS generate_account_number;
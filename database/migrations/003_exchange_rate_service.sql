@@ -0,0 +1,169 @@
+-- Exchange rates are resolved by the application (rates.py) and passed into
+-- transfer_money, which no longer reads exchange_rates under account locks.
+
+-- One row per currency pair, keeping the newest where there are duplicates
+DELETE older FROM exchange_rates older
+JOIN exchange_rates newer
+  ON newer.from_currency = older.from_currency
+ AND newer.to_currency = older.to_currency
+ AND newer.rate_id > older.rate_id;
+
+ALTER TABLE exchange_rates ADD UNIQUE KEY uq_exchange_rates_pair (from_currency, to_currency);
+
+ALTER TABLE exchange_rates
+    MODIFY updated_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+
+ALTER TABLE transactions ADD COLUMN exchange_rate DECIMAL(10, 4) NULL;
+ALTER TABLE transactions ADD COLUMN rate_version VARCHAR(40) NULL;
+
+DROP FUNCTION IF EXISTS convert_currency;
+DROP PROCEDURE IF EXISTS transfer_money;
+
+DELIMITER //
+
+CREATE FUNCTION convert_currency(
+    amount DECIMAL(15,2),
+    from_curr VARCHAR(3),
+    to_curr VARCHAR(3)
+)
+RETURNS DECIMAL(15,2)
+READS SQL DATA
+BEGIN
+    DECLARE converted_amount DECIMAL(15,2);
+    DECLARE exchange_rate DECIMAL(10,4);
+    
+    IF from_curr = to_curr THEN
+        RETURN amount;
+    END IF;
+    
+    SELECT rate INTO exchange_rate 
+    FROM exchange_rates 
+    WHERE from_currency = from_curr AND to_currency = to_curr
+    LIMIT 1;
+    
+    -- No configured rate: NULL rather than a made-up default
+    IF exchange_rate IS NULL THEN
+        RETURN NULL;
+    END IF;
+    
+    SET converted_amount = amount * exchange_rate;
+    
+    RETURN ROUND(converted_amount, 2);
+END//
+
+CREATE PROCEDURE transfer_money(
+    IN p_from_account INT,
+    IN p_to_account INT,
+    IN p_amount DECIMAL(15,2),
+    IN p_description TEXT,
+    IN p_rate DECIMAL(10,4),
+    IN p_rate_version VARCHAR(40),
+    OUT p_transaction_id INT,
+    OUT p_message VARCHAR(255)
+)
+BEGIN
+    DECLARE from_balance DECIMAL(15,2);
+    DECLARE from_currency VARCHAR(3);
+    DECLARE from_status VARCHAR(20);
+    DECLARE to_currency VARCHAR(3);
+    DECLARE to_status VARCHAR(20);
+    DECLARE to_type VARCHAR(20);
+    DECLARE converted_amount DECIMAL(15,2);
+    DECLARE transfer_fee DECIMAL(10,2) DEFAULT 0.00;
+    DECLARE trans_type VARCHAR(30);
+    DECLARE is_international BOOLEAN;
+    
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        SET p_transaction_id = -1;
+        SET p_message = 'Transaction failed due to an error';
+    END;
+    
+    -- Deadlock (1213) or lock wait timeout (1205): safe to retry
+    DECLARE EXIT HANDLER FOR 1213, 1205
+    BEGIN
+        ROLLBACK;
+        SET p_transaction_id = -1;
+        SET p_message = 'Transaction aborted due to lock contention, please retry';
+    END;
+    
+    START TRANSACTION;
+    
+    -- Get account details, locking rows in account_id order so that
+    -- concurrent opposite transfers (A to B, B to A) cannot deadlock
+    IF p_from_account <= p_to_account THEN
+        SELECT balance, currency, status INTO from_balance, from_currency, from_status
+        FROM accounts WHERE account_id = p_from_account FOR UPDATE;
+        
+        SELECT currency, status, account_type INTO to_currency, to_status, to_type
+        FROM accounts WHERE account_id = p_to_account FOR UPDATE;
+    ELSE
+        SELECT currency, status, account_type INTO to_currency, to_status, to_type
+        FROM accounts WHERE account_id = p_to_account FOR UPDATE;
+        
+        SELECT balance, currency, status INTO from_balance, from_currency, from_status
+        FROM accounts WHERE account_id = p_from_account FOR UPDATE;
+    END IF;
+    
+    -- Validate accounts
+    IF from_balance IS NULL OR to_currency IS NULL THEN
+        ROLLBACK;
+        SET p_transaction_id = -1;
+        SET p_message = 'Invalid account(s)';
+    ELSEIF from_status != 'active' OR to_status != 'active' THEN
+        ROLLBACK;
+        SET p_transaction_id = -1;
+        SET p_message = 'One or both accounts are not active';
+    ELSEIF p_amount <= 0 THEN
+        ROLLBACK;
+        SET p_transaction_id = -1;
+        SET p_message = 'Invalid amount';
+    ELSEIF to_type = 'international' AND from_currency = 'INR' AND p_rate IS NULL THEN
+        ROLLBACK;
+        SET p_transaction_id = -1;
+        SET p_message = 'Exchange rate not available';
+    ELSE
+        -- Check if international transfer; the rate was resolved by the
+        -- caller, so nothing else is read while the accounts are locked
+        SET is_international = (to_type = 'international' AND from_currency = 'INR');
+        IF is_international THEN
+            SET transfer_fee = calculate_intl_fee(p_amount);
+            SET converted_amount = ROUND(p_amount * p_rate, 2);
+            SET trans_type = 'international_transfer';
+        ELSE
+            SET converted_amount = p_amount;
+            SET trans_type = 'transfer';
+        END IF;
+        
+        -- Check sufficient balance
+        IF from_balance < (p_amount + transfer_fee) THEN
+            ROLLBACK;
+            SET p_transaction_id = -1;
+            SET p_message = 'Insufficient balance';
+        ELSE
+            -- Deduct from sender
+            UPDATE accounts 
+            SET balance = balance - p_amount - transfer_fee
+            WHERE account_id = p_from_account;
+            
+            -- Add to receiver
+            UPDATE accounts 
+            SET balance = balance + converted_amount
+            WHERE account_id = p_to_account;
+            
+            -- Record transaction
+            INSERT INTO transactions (from_account, to_account, transaction_type, amount, fee, currency, description,
+                                      exchange_rate, rate_version)
+            VALUES (p_from_account, p_to_account, trans_type, p_amount, transfer_fee, from_currency, p_description,
+                    IF(is_international, p_rate, NULL), IF(is_international, p_rate_version, NULL));
+            
+            SET p_transaction_id = LAST_INSERT_ID();
+            SET p_message = CONCAT('Transfer successful. Fee: ', transfer_fee);
+            
+            COMMIT;
+        END IF;
+    END IF;
+END//
+
+DELIMITER ;
@@ -0,0 +1,14 @@
+-- Installment columns for the month-end EMI posting job (scripts/post_emis.py).
+--
+-- Each posted installment is one loan_payments row, so (loan_id,
+-- installment_no) is unique: an installment can never be posted twice, and a
+-- job that stopped part-way can simply be run again. Payments recorded
+-- before this migration keep a NULL installment_no.
+
+ALTER TABLE loan_payments ADD COLUMN installment_no INT NULL AFTER loan_id;
+ALTER TABLE loan_payments ADD COLUMN principal_amount DECIMAL(15, 2) NULL AFTER payment_amount;
+ALTER TABLE loan_payments ADD COLUMN interest_amount DECIMAL(15, 2) NULL AFTER principal_amount;
+
+-- Leads with loan_id, so the single-column FK index becomes redundant
+ALTER TABLE loan_payments ADD UNIQUE KEY uq_loan_payments_installment (loan_id, installment_no);
+ALTER TABLE loan_payments DROP INDEX loan_id;
@@ -0,0 +1,17 @@
+-- Daily savings interest accruals (scripts/accrue_interest.py).
+--
+-- One row per account and business date, so a rerun of the job for the same
+-- date never credits an account twice.
+
+CREATE TABLE IF NOT EXISTS interest_accruals (
+    accrual_id BIGINT PRIMARY KEY AUTO_INCREMENT,
+    account_id INT NOT NULL,
+    business_date DATE NOT NULL,
+    balance DECIMAL(15, 2) NOT NULL,
+    rate DECIMAL(5, 2) NOT NULL,
+    amount DECIMAL(15, 2) NOT NULL,
+    accrued_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- An account is accrued at most once per business date
+    UNIQUE KEY uq_interest_accruals_account_date (account_id, business_date),
+    FOREIGN KEY (account_id) REFERENCES accounts(account_id) ON DELETE CASCADE
+);
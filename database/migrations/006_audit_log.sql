@@ -0,0 +1,79 @@
+-- Move account status changes out of the transactions ledger into an
+-- append-only audit_log.
+--
+-- The log_account_status_change trigger recorded each status change as a
+-- zero-amount deposit. Those rows are copied to audit_log and deleted, and
+-- the account_rollups counts are lowered to match (last_activity is left
+-- as is; `python -m scripts.rollups rebuild` recomputes it exactly). The
+-- data changes come after all DDL, so they commit together with the
+-- migration record.
+
+-- Append-only audit trail of status changes and admin actions (see audit.py)
+CREATE TABLE IF NOT EXISTS audit_log (
+    audit_id BIGINT PRIMARY KEY AUTO_INCREMENT,
+    entity_type VARCHAR(30) NOT NULL,
+    entity_id INT NULL,
+    action VARCHAR(50) NOT NULL,
+    actor_type ENUM('user', 'admin', 'system') NOT NULL DEFAULT 'system',
+    actor_id INT NULL,
+    details JSON NULL,
+    created_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    -- Events of one entity, or of one entity type, by time
+    INDEX idx_audit_entity_created (entity_type, entity_id, created_at),
+    INDEX idx_audit_type_created (entity_type, created_at)
+);
+
+DROP TRIGGER IF EXISTS log_account_status_change;
+DROP TRIGGER IF EXISTS audit_log_no_update;
+DROP TRIGGER IF EXISTS audit_log_no_delete;
+
+DELIMITER //
+
+CREATE TRIGGER audit_log_no_update
+BEFORE UPDATE ON audit_log
+FOR EACH ROW
+BEGIN
+    SIGNAL SQLSTATE '45000'
+    SET MESSAGE_TEXT = 'audit_log is append-only';
+END//
+
+CREATE TRIGGER audit_log_no_delete
+BEFORE DELETE ON audit_log
+FOR EACH ROW
+BEGIN
+    SIGNAL SQLSTATE '45000'
+    SET MESSAGE_TEXT = 'audit_log is append-only';
+END//
+
+DELIMITER ;
+
+UPDATE account_rollups r
+JOIN (
+    SELECT to_account, COUNT(*) as status_rows
+    FROM transactions
+    WHERE from_account IS NULL AND transaction_type = 'deposit' AND amount = 0
+      AND description LIKE 'Account status changed from % to %'
+    GROUP BY to_account
+) s ON s.to_account = r.account_id
+SET r.transaction_count = r.transaction_count - s.status_rows;
+
+INSERT INTO audit_log (entity_type, entity_id, action, actor_type, details, created_at)
+SELECT
+    'account',
+    to_account,
+    'status_change',
+    'system',
+    JSON_OBJECT(
+        'from', SUBSTRING_INDEX(SUBSTRING_INDEX(description, ' from ', -1), ' to ', 1),
+        'to', SUBSTRING_INDEX(description, ' to ', -1),
+        'transaction_id', transaction_id
+    ),
+    transaction_date
+FROM transactions
+WHERE from_account IS NULL AND transaction_type = 'deposit' AND amount = 0
+  AND description LIKE 'Account status changed from % to %'
+ORDER BY transaction_id;
+
+DELETE FROM transactions
+WHERE from_account IS NULL AND transaction_type = 'deposit' AND amount = 0
+  AND description LIKE 'Account status changed from % to %';
@@ -0,0 +1,60 @@
+-- Change feed for the admin approval queues (change_feed.py).
+--
+-- Triggers record every account or loan that enters or leaves the pending
+-- state, so the dashboard receives only what changed instead of re-reading
+-- the full pending lists.
+
+-- Entries to and exits from the admin approval queues, read by change_feed.py
+CREATE TABLE IF NOT EXISTS pending_events (
+    event_id BIGINT PRIMARY KEY AUTO_INCREMENT,
+    entity_type ENUM('account', 'loan') NOT NULL,
+    entity_id INT NOT NULL,
+    event ENUM('created', 'resolved') NOT NULL,
+    created_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    INDEX idx_pending_events_created (created_at)
+);
+
+DROP TRIGGER IF EXISTS pending_account_created;
+DROP TRIGGER IF EXISTS pending_account_resolved;
+DROP TRIGGER IF EXISTS pending_loan_created;
+DROP TRIGGER IF EXISTS pending_loan_resolved;
+
+DELIMITER //
+
+CREATE TRIGGER pending_account_created
+AFTER INSERT ON accounts
+FOR EACH ROW
+BEGIN
+    IF NEW.status = 'pending' THEN
+        INSERT INTO pending_events (entity_type, entity_id, event) VALUES ('account', NEW.account_id, 'created');
+    END IF;
+END//
+
+CREATE TRIGGER pending_account_resolved
+AFTER UPDATE ON accounts
+FOR EACH ROW
+BEGIN
+    IF OLD.status = 'pending' AND NEW.status != 'pending' THEN
+        INSERT INTO pending_events (entity_type, entity_id, event) VALUES ('account', NEW.account_id, 'resolved');
+    END IF;
+END//
+
+CREATE TRIGGER pending_loan_created
+AFTER INSERT ON loans
+FOR EACH ROW
+BEGIN
+    IF NEW.status = 'pending' THEN
+        INSERT INTO pending_events (entity_type, entity_id, event) VALUES ('loan', NEW.loan_id, 'created');
+    END IF;
+END//
+
+CREATE TRIGGER pending_loan_resolved
+AFTER UPDATE ON loans
+FOR EACH ROW
+BEGIN
+    IF OLD.status = 'pending' AND NEW.status != 'pending' THEN
+        INSERT INTO pending_events (entity_type, entity_id, event) VALUES ('loan', NEW.loan_id, 'resolved');
+    END IF;
+END//
+
+DELIMITER ;
@@ -0,0 +1,61 @@
+-- Monthly range partitions on transactions (scripts/archive.py).
+--
+-- Closed months are exported to Parquet files and their partitions dropped,
+-- so the table only holds recent history. MySQL requires the partitioning
+-- column in every unique key and does not support foreign keys on
+-- partitioned tables, so the primary key becomes (transaction_id,
+-- transaction_date) and the two account foreign keys are dropped; the
+-- procedures still check both accounts before inserting a transaction.
+--
+-- Partitions are created from the month of the oldest transaction up to
+-- three months ahead, plus pmax. scripts/archive.py keeps adding months.
+
+ALTER TABLE transactions DROP FOREIGN KEY transactions_ibfk_1;
+ALTER TABLE transactions DROP FOREIGN KEY transactions_ibfk_2;
+
+ALTER TABLE transactions
+    MODIFY transaction_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (transaction_id, transaction_date);
+
+DROP PROCEDURE IF EXISTS partition_transactions_by_month;
+
+DELIMITER //
+
+CREATE PROCEDURE partition_transactions_by_month()
+BEGIN
+    DECLARE v_month DATE;
+    DECLARE v_last DATE;
+    DECLARE v_partitions TEXT DEFAULT '';
+
+    -- Already partitioned by an earlier run
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'transactions' AND PARTITION_NAME IS NOT NULL
+    ) THEN
+        SELECT DATE_FORMAT(LEAST(COALESCE(MIN(transaction_date), CURRENT_DATE), CURRENT_DATE), '%Y-%m-01')
+        INTO v_month
+        FROM transactions;
+        SET v_last = DATE_FORMAT(CURRENT_DATE + INTERVAL 3 MONTH, '%Y-%m-01');
+
+        WHILE v_month <= v_last DO
+            SET v_partitions = CONCAT(v_partitions, 'PARTITION p', DATE_FORMAT(v_month, '%Y%m'),
+                                      ' VALUES LESS THAN (UNIX_TIMESTAMP(''', v_month + INTERVAL 1 MONTH, ''')), ');
+            SET v_month = v_month + INTERVAL 1 MONTH;
+        END WHILE;
+
+        SET @partition_sql = CONCAT(
+            'ALTER TABLE transactions PARTITION BY RANGE (UNIX_TIMESTAMP(transaction_date)) (',
+            v_partitions, 'PARTITION pmax VALUES LESS THAN MAXVALUE)'
+        );
+        PREPARE partition_stmt FROM @partition_sql;
+        EXECUTE partition_stmt;
+        DEALLOCATE PREPARE partition_stmt;
+    END IF;
+END//
+
+DELIMITER ;
+
+CALL partition_transactions_by_month();
+
+DROP PROCEDURE partition_transactions_by_month;
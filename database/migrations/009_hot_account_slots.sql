@@ -0,0 +1,318 @@
+-- Hot-account balance slots (hot_accounts.py, scripts/hot_accounts.py).
+--
+-- A transfer locks both account rows, so every credit to a busy merchant or
+-- collection account waits for the one before it. An account with
+-- balance_slots = N > 0 takes its credits in one of N rows of
+-- account_balance_slots instead, chosen at random per credit, and its row is
+-- only share-locked. Debits fold the slots into the balance under the row
+-- lock, and consolidate_balance_slots folds them in the background. The
+-- balance of an account is accounts.balance plus its slots.
+
+ALTER TABLE accounts ADD COLUMN balance_slots TINYINT UNSIGNED NOT NULL DEFAULT 0;
+
+-- Credits to hot accounts not yet folded into accounts.balance
+CREATE TABLE IF NOT EXISTS account_balance_slots (
+    account_id INT NOT NULL,
+    slot TINYINT UNSIGNED NOT NULL,
+    amount DECIMAL(15, 2) NOT NULL DEFAULT 0.00,
+    PRIMARY KEY (account_id, slot),
+    FOREIGN KEY (account_id) REFERENCES accounts(account_id) ON DELETE CASCADE
+);
+
+CREATE OR REPLACE VIEW account_summary AS
+SELECT 
+    a.account_id,
+    a.account_number,
+    a.account_type,
+    a.balance + (SELECT COALESCE(SUM(s.amount), 0) FROM account_balance_slots s
+                 WHERE s.account_id = a.account_id) as balance,
+    a.currency,
+    a.status,
+    u.full_name,
+    u.email,
+    u.phone,
+    COALESCE(r.transaction_count, 0) as transaction_count,
+    COALESCE(r.total_credits, 0) as total_credits,
+    COALESCE(r.total_debits, 0) as total_debits,
+    r.last_activity
+FROM accounts a
+JOIN users u ON a.user_id = u.user_id
+LEFT JOIN account_rollups r ON r.account_id = a.account_id;
+
+DROP TRIGGER IF EXISTS prevent_negative_balance_slot;
+DROP PROCEDURE IF EXISTS transfer_money;
+DROP PROCEDURE IF EXISTS deposit_money;
+DROP PROCEDURE IF EXISTS consolidate_balance_slots;
+DROP PROCEDURE IF EXISTS set_balance_slots;
+
+DELIMITER //
+
+-- Balance slots only ever hold credits
+CREATE TRIGGER prevent_negative_balance_slot
+BEFORE UPDATE ON account_balance_slots
+FOR EACH ROW
+BEGIN
+    IF NEW.amount < 0 THEN
+        SIGNAL SQLSTATE '45000'
+        SET MESSAGE_TEXT = 'Account balance cannot be negative';
+    END IF;
+END//
+
+-- Procedure for money transfer
+CREATE PROCEDURE transfer_money(
+    IN p_from_account INT,
+    IN p_to_account INT,
+    IN p_amount DECIMAL(15,2),
+    IN p_description TEXT,
+    IN p_rate DECIMAL(10,4),
+    IN p_rate_version VARCHAR(40),
+    OUT p_transaction_id INT,
+    OUT p_message VARCHAR(255)
+)
+BEGIN
+    DECLARE from_balance DECIMAL(15,2);
+    DECLARE from_currency VARCHAR(3);
+    DECLARE from_status VARCHAR(20);
+    DECLARE from_slots TINYINT UNSIGNED DEFAULT 0;
+    DECLARE slot_total DECIMAL(15,2) DEFAULT 0.00;
+    DECLARE to_currency VARCHAR(3);
+    DECLARE to_status VARCHAR(20);
+    DECLARE to_type VARCHAR(20);
+    DECLARE to_slots TINYINT UNSIGNED DEFAULT 0;
+    DECLARE converted_amount DECIMAL(15,2);
+    DECLARE transfer_fee DECIMAL(10,2) DEFAULT 0.00;
+    DECLARE trans_type VARCHAR(30);
+    DECLARE is_international BOOLEAN;
+    
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        SET p_transaction_id = -1;
+        SET p_message = 'Transaction failed due to an error';
+    END;
+    
+    -- Deadlock (1213) or lock wait timeout (1205): safe to retry
+    DECLARE EXIT HANDLER FOR 1213, 1205
+    BEGIN
+        ROLLBACK;
+        SET p_transaction_id = -1;
+        SET p_message = 'Transaction aborted due to lock contention, please retry';
+    END;
+    
+    -- A hot account (balance_slots > 0) is credited in one of its balance
+    -- slots, so a transfer to it only share-locks its row and concurrent
+    -- credits do not queue behind each other
+    SELECT balance_slots INTO to_slots FROM accounts WHERE account_id = p_to_account;
+    
+    START TRANSACTION;
+    
+    -- Get account details, locking rows in account_id order so that
+    -- concurrent opposite transfers (A to B, B to A) cannot deadlock
+    IF p_from_account <= p_to_account THEN
+        SELECT balance, currency, status, balance_slots INTO from_balance, from_currency, from_status, from_slots
+        FROM accounts WHERE account_id = p_from_account FOR UPDATE;
+        
+        IF to_slots > 0 THEN
+            SELECT currency, status, account_type, balance_slots INTO to_currency, to_status, to_type, to_slots
+            FROM accounts WHERE account_id = p_to_account FOR SHARE;
+        ELSE
+            SELECT currency, status, account_type, balance_slots INTO to_currency, to_status, to_type, to_slots
+            FROM accounts WHERE account_id = p_to_account FOR UPDATE;
+        END IF;
+    ELSE
+        IF to_slots > 0 THEN
+            SELECT currency, status, account_type, balance_slots INTO to_currency, to_status, to_type, to_slots
+            FROM accounts WHERE account_id = p_to_account FOR SHARE;
+        ELSE
+            SELECT currency, status, account_type, balance_slots INTO to_currency, to_status, to_type, to_slots
+            FROM accounts WHERE account_id = p_to_account FOR UPDATE;
+        END IF;
+        
+        SELECT balance, currency, status, balance_slots INTO from_balance, from_currency, from_status, from_slots
+        FROM accounts WHERE account_id = p_from_account FOR UPDATE;
+    END IF;
+    
+    -- A debit from a hot account can spend its slots; no credit can be
+    -- in progress while its row is locked for update
+    IF from_slots > 0 THEN
+        SELECT COALESCE(SUM(amount), 0) INTO slot_total
+        FROM account_balance_slots WHERE account_id = p_from_account FOR UPDATE;
+        SET from_balance = from_balance + slot_total;
+    END IF;
+    
+    -- Validate accounts
+    IF from_balance IS NULL OR to_currency IS NULL THEN
+        ROLLBACK;
+        SET p_transaction_id = -1;
+        SET p_message = 'Invalid account(s)';
+    ELSEIF from_status != 'active' OR to_status != 'active' THEN
+        ROLLBACK;
+        SET p_transaction_id = -1;
+        SET p_message = 'One or both accounts are not active';
+    ELSEIF p_amount <= 0 THEN
+        ROLLBACK;
+        SET p_transaction_id = -1;
+        SET p_message = 'Invalid amount';
+    ELSEIF to_type = 'international' AND from_currency = 'INR' AND p_rate IS NULL THEN
+        ROLLBACK;
+        SET p_transaction_id = -1;
+        SET p_message = 'Exchange rate not available';
+    ELSE
+        -- Check if international transfer; the rate was resolved by the
+        -- caller, so nothing else is read while the accounts are locked
+        SET is_international = (to_type = 'international' AND from_currency = 'INR');
+        IF is_international THEN
+            SET transfer_fee = calculate_intl_fee(p_amount);
+            SET converted_amount = ROUND(p_amount * p_rate, 2);
+            SET trans_type = 'international_transfer';
+        ELSE
+            SET converted_amount = p_amount;
+            SET trans_type = 'transfer';
+        END IF;
+        
+        -- Check sufficient balance
+        IF from_balance < (p_amount + transfer_fee) THEN
+            ROLLBACK;
+            SET p_transaction_id = -1;
+            SET p_message = 'Insufficient balance';
+        ELSE
+            -- Deduct from sender, folding in its slots if it is a hot account
+            UPDATE accounts 
+            SET balance = balance + slot_total - p_amount - transfer_fee
+            WHERE account_id = p_from_account;
+            IF slot_total > 0 THEN
+                UPDATE account_balance_slots SET amount = 0 WHERE account_id = p_from_account;
+            END IF;
+            
+            -- Add to receiver
+            IF to_slots > 0 THEN
+                INSERT INTO account_balance_slots (account_id, slot, amount)
+                VALUES (p_to_account, FLOOR(RAND() * to_slots), converted_amount)
+                ON DUPLICATE KEY UPDATE amount = amount + VALUES(amount);
+            ELSE
+                UPDATE accounts 
+                SET balance = balance + converted_amount
+                WHERE account_id = p_to_account;
+            END IF;
+            
+            -- Record transaction
+            INSERT INTO transactions (from_account, to_account, transaction_type, amount, fee, currency, description,
+                                      exchange_rate, rate_version)
+            VALUES (p_from_account, p_to_account, trans_type, p_amount, transfer_fee, from_currency, p_description,
+                    IF(is_international, p_rate, NULL), IF(is_international, p_rate_version, NULL));
+            
+            SET p_transaction_id = LAST_INSERT_ID();
+            SET p_message = CONCAT('Transfer successful. Fee: ', transfer_fee);
+            
+            COMMIT;
+        END IF;
+    END IF;
+END//
+
+-- Procedure to deposit money
+CREATE PROCEDURE deposit_money(
+    IN p_account_id INT,
+    IN p_amount DECIMAL(15,2),
+    OUT p_message VARCHAR(255)
+)
+BEGIN
+    DECLARE acc_status VARCHAR(20);
+    DECLARE acc_slots TINYINT UNSIGNED;
+    
+    SELECT status, balance_slots INTO acc_status, acc_slots FROM accounts WHERE account_id = p_account_id;
+    
+    IF acc_status IS NULL THEN
+        SET p_message = 'Account not found';
+    ELSEIF acc_status != 'active' THEN
+        SET p_message = 'Account is not active';
+    ELSEIF p_amount <= 0 THEN
+        SET p_message = 'Invalid amount';
+    ELSE
+        IF acc_slots > 0 THEN
+            INSERT INTO account_balance_slots (account_id, slot, amount)
+            VALUES (p_account_id, FLOOR(RAND() * acc_slots), p_amount)
+            ON DUPLICATE KEY UPDATE amount = amount + VALUES(amount);
+        ELSE
+            UPDATE accounts SET balance = balance + p_amount WHERE account_id = p_account_id;
+        END IF;
+        
+        INSERT INTO transactions (to_account, transaction_type, amount, description)
+        VALUES (p_account_id, 'deposit', p_amount, 'Cash deposit');
+        
+        SET p_message = 'Deposit successful';
+    END IF;
+END//
+
+-- Procedure to fold a hot account's balance slots into its balance
+CREATE PROCEDURE consolidate_balance_slots(
+    IN p_account_id INT,
+    OUT p_amount DECIMAL(15,2)
+)
+BEGIN
+    DECLARE acc_id INT;
+    
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        RESIGNAL;
+    END;
+    
+    START TRANSACTION;
+    
+    -- Waits for the credits in progress, and holds off new ones until COMMIT
+    SELECT account_id INTO acc_id FROM accounts WHERE account_id = p_account_id FOR UPDATE;
+    
+    SELECT COALESCE(SUM(amount), 0) INTO p_amount
+    FROM account_balance_slots WHERE account_id = p_account_id FOR UPDATE;
+    
+    IF p_amount > 0 THEN
+        UPDATE accounts SET balance = balance + p_amount WHERE account_id = p_account_id;
+        UPDATE account_balance_slots SET amount = 0 WHERE account_id = p_account_id;
+    END IF;
+    
+    COMMIT;
+END//
+
+-- Procedure to turn hot-account mode on (p_slots > 0) or off (0)
+CREATE PROCEDURE set_balance_slots(
+    IN p_account_id INT,
+    IN p_slots TINYINT UNSIGNED,
+    OUT p_message VARCHAR(255)
+)
+BEGIN
+    DECLARE acc_id INT;
+    DECLARE slot_total DECIMAL(15,2);
+    DECLARE next_slot TINYINT UNSIGNED DEFAULT 0;
+    
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        SET p_message = 'Could not change balance slots due to an error';
+    END;
+    
+    START TRANSACTION;
+    
+    SELECT account_id INTO acc_id FROM accounts WHERE account_id = p_account_id FOR UPDATE;
+    
+    IF acc_id IS NULL THEN
+        ROLLBACK;
+        SET p_message = 'Account not found';
+    ELSE
+        -- Everything credited so far moves to the balance
+        SELECT COALESCE(SUM(amount), 0) INTO slot_total
+        FROM account_balance_slots WHERE account_id = p_account_id FOR UPDATE;
+        UPDATE accounts SET balance = balance + slot_total, balance_slots = p_slots WHERE account_id = p_account_id;
+        DELETE FROM account_balance_slots WHERE account_id = p_account_id;
+        
+        WHILE next_slot < p_slots DO
+            INSERT INTO account_balance_slots (account_id, slot) VALUES (p_account_id, next_slot);
+            SET next_slot = next_slot + 1;
+        END WHILE;
+        
+        COMMIT;
+        SET p_message = IF(p_slots > 0, CONCAT('Hot-account mode on with ', p_slots, ' balance slots'),
+                           'Hot-account mode off');
+    END IF;
+END//
+
+DELIMITER ;
@@ -0,0 +1,18 @@
+-- Indexes for the paginated admin listings (admin_listings.py).
+--
+-- Each sortable column has an index, so a page is a short range scan from
+-- the cursor. InnoDB appends the primary key to every secondary index, which
+-- gives the (column, id) order the keyset cursors need.
+
+-- All accounts, sorted by balance
+CREATE INDEX idx_accounts_balance ON accounts (balance);
+
+-- All accounts and all loans: search and sort by customer name
+CREATE INDEX idx_users_full_name ON users (full_name);
+
+-- All loans, newest first (the default) and sorted by amount
+CREATE INDEX idx_loans_applied ON loans (applied_at);
+CREATE INDEX idx_loans_amount ON loans (loan_amount);
+
+-- All loans filtered by type, newest first
+CREATE INDEX idx_loans_type_applied ON loans (loan_type, applied_at);
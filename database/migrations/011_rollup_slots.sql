@@ -0,0 +1,74 @@
+-- Spread the rollups of hot accounts over slots, like their balances.
+--
+-- Every credit fires maintain_account_rollups, which upserted the
+-- recipient's single account_rollups row and held its lock until commit, so
+-- the credits to a hot account still ran one at a time. A credit to an
+-- account with balance_slots = N > 0 now adds to one of N rollup rows,
+-- picked at random; every other account keeps its one row (slot 0). An
+-- account's totals are the sum of its rollup rows (hot_accounts.ACCOUNT_ROLLUPS_JOIN).
+
+ALTER TABLE account_rollups
+    ADD COLUMN slot TINYINT UNSIGNED NOT NULL DEFAULT 0 AFTER account_id,
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (account_id, slot);
+
+CREATE OR REPLACE VIEW account_summary AS
+SELECT 
+    a.account_id,
+    a.account_number,
+    a.account_type,
+    a.balance + (SELECT COALESCE(SUM(s.amount), 0) FROM account_balance_slots s
+                 WHERE s.account_id = a.account_id) as balance,
+    a.currency,
+    a.status,
+    u.full_name,
+    u.email,
+    u.phone,
+    COALESCE(r.transaction_count, 0) as transaction_count,
+    COALESCE(r.total_credits, 0) as total_credits,
+    COALESCE(r.total_debits, 0) as total_debits,
+    r.last_activity
+FROM accounts a
+JOIN users u ON a.user_id = u.user_id
+LEFT JOIN LATERAL (
+    SELECT SUM(transaction_count) as transaction_count, SUM(total_credits) as total_credits,
+           SUM(total_debits) as total_debits, MAX(last_activity) as last_activity
+    FROM account_rollups
+    WHERE account_id = a.account_id
+) r ON TRUE;
+
+DROP TRIGGER IF EXISTS maintain_account_rollups;
+
+DELIMITER //
+
+CREATE TRIGGER maintain_account_rollups
+AFTER INSERT ON transactions
+FOR EACH ROW
+BEGIN
+    DECLARE to_slots TINYINT UNSIGNED DEFAULT 0;
+    
+    IF NEW.from_account IS NOT NULL THEN
+        INSERT INTO account_rollups (account_id, transaction_count, total_debits, last_activity)
+        VALUES (NEW.from_account, 1, NEW.amount, NEW.transaction_date)
+        ON DUPLICATE KEY UPDATE
+            transaction_count = transaction_count + 1,
+            total_debits = total_debits + NEW.amount,
+            last_activity = GREATEST(COALESCE(last_activity, NEW.transaction_date), NEW.transaction_date);
+    END IF;
+    
+    IF NEW.to_account IS NOT NULL THEN
+        -- Concurrent credits to a hot account land on different rollup rows
+        SELECT balance_slots INTO to_slots FROM accounts WHERE account_id = NEW.to_account;
+        
+        -- A self-transfer counts as one transaction, already counted above
+        INSERT INTO account_rollups (account_id, slot, transaction_count, total_credits, last_activity)
+        VALUES (NEW.to_account, IF(to_slots > 0, FLOOR(RAND() * to_slots), 0),
+                IF(NEW.from_account <=> NEW.to_account, 0, 1), NEW.amount, NEW.transaction_date)
+        ON DUPLICATE KEY UPDATE
+            transaction_count = transaction_count + IF(NEW.from_account <=> NEW.to_account, 0, 1),
+            total_credits = total_credits + NEW.amount,
+            last_activity = GREATEST(COALESCE(last_activity, NEW.transaction_date), NEW.transaction_date);
+    END IF;
+END//
+
+DELIMITER ;
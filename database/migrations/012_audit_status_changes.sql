@@ -0,0 +1,110 @@
+-- Audit account and loan approvals in the same transaction as the status change.
+--
+-- approve_account and approve_loan write their status_change event to
+-- audit_log themselves, so an approval is never committed without its audit
+-- event. Before this the app queued the event in the buffered audit writer
+-- after the commit.
+
+DROP PROCEDURE IF EXISTS approve_account;
+DROP PROCEDURE IF EXISTS approve_loan;
+
+DELIMITER //
+
+CREATE PROCEDURE approve_account(
+    IN p_account_id INT,
+    IN p_admin_id INT,
+    OUT p_message VARCHAR(255)
+)
+BEGIN
+    DECLARE acc_status VARCHAR(20);
+    
+    SELECT status INTO acc_status FROM accounts WHERE account_id = p_account_id;
+    
+    IF acc_status IS NULL THEN
+        SET p_message = 'Account not found';
+    ELSEIF acc_status != 'pending' THEN
+        SET p_message = 'Account is not in pending status';
+    ELSE
+        UPDATE accounts 
+        SET status = 'active', 
+            approved_by = p_admin_id, 
+            approved_at = CURRENT_TIMESTAMP
+        WHERE account_id = p_account_id;
+        
+        -- Audited in the same transaction as the status change
+        INSERT INTO audit_log (entity_type, entity_id, action, actor_type, actor_id, details)
+        VALUES ('account', p_account_id, 'status_change', 'admin', p_admin_id,
+                JSON_OBJECT('from', 'pending', 'to', 'active'));
+        
+        SET p_message = 'Account approved successfully';
+    END IF;
+END//
+
+CREATE PROCEDURE approve_loan(
+    IN p_loan_id INT,
+    IN p_admin_id INT,
+    IN p_approve BOOLEAN,
+    OUT p_message VARCHAR(255)
+)
+BEGIN
+    DECLARE loan_status VARCHAR(20);
+    DECLARE loan_amount DECIMAL(15,2);
+    DECLARE acc_id INT;
+    
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        SET p_message = 'Loan approval failed due to an error';
+    END;
+    
+    START TRANSACTION;
+    
+    SELECT status, loan_amount, account_id INTO loan_status, loan_amount, acc_id
+    FROM loans WHERE loan_id = p_loan_id;
+    
+    IF loan_status IS NULL THEN
+        ROLLBACK;
+        SET p_message = 'Loan not found';
+    ELSEIF loan_status != 'pending' THEN
+        ROLLBACK;
+        SET p_message = 'Loan is not in pending status';
+    ELSE
+        IF p_approve = TRUE THEN
+            -- Approve and disburse loan
+            UPDATE loans 
+            SET status = 'disbursed', 
+                approved_by = p_admin_id, 
+                approved_at = CURRENT_TIMESTAMP
+            WHERE loan_id = p_loan_id;
+            
+            -- Credit amount to account
+            UPDATE accounts 
+            SET balance = balance + loan_amount
+            WHERE account_id = acc_id;
+            
+            -- Record transaction
+            INSERT INTO transactions (to_account, transaction_type, amount, description)
+            VALUES (acc_id, 'deposit', loan_amount, CONCAT('Loan disbursement - Loan ID: ', p_loan_id));
+            
+            SET p_message = 'Loan approved and amount disbursed';
+        ELSE
+            -- Reject loan
+            UPDATE loans 
+            SET status = 'rejected', 
+                approved_by = p_admin_id, 
+                approved_at = CURRENT_TIMESTAMP
+            WHERE loan_id = p_loan_id;
+            
+            SET p_message = 'Loan rejected';
+        END IF;
+        
+        -- Audited in the same transaction as the status change
+        INSERT INTO audit_log (entity_type, entity_id, action, actor_type, actor_id, details)
+        VALUES ('loan', p_loan_id, 'status_change', 'admin', p_admin_id,
+                JSON_OBJECT('from', 'pending', 'to', IF(p_approve = TRUE, 'disbursed', 'rejected')));
+        
+        COMMIT;
+    END IF;
+END//
+
+DELIMITER ;
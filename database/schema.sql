@@ -30,7 +30,9 @@ CREATE TABLE users (
     aadhar_number VARCHAR(12) UNIQUE NOT NULL,
     pan_number VARCHAR(10) UNIQUE NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    is_active BOOLEAN DEFAULT TRUE
+    is_active BOOLEAN DEFAULT TRUE,
+    -- Admin listings: search by customer name
+    INDEX idx_users_full_name (full_name)
 );
 
 -- Accounts Table
@@ -42,16 +44,25 @@ CREATE TABLE accounts (
     balance DECIMAL(15, 2) DEFAULT 0.00,
     currency VARCHAR(3) DEFAULT 'INR',
     status ENUM('pending', 'active', 'suspended', 'closed') DEFAULT 'pending',
+    -- Hot-account mode: credits land in this many account_balance_slots rows
+    balance_slots TINYINT UNSIGNED NOT NULL DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     approved_by INT,
     approved_at TIMESTAMP NULL,
+    -- Customer account list and the pending-approval queue, newest first
+    INDEX idx_accounts_user_created (user_id, created_at),
+    INDEX idx_accounts_status_created (status, created_at),
+    -- Admin account listing sorted by balance
+    INDEX idx_accounts_balance (balance),
     FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
     FOREIGN KEY (approved_by) REFERENCES admin(admin_id)
 );
 
 -- Transactions Table
+-- Partitioned by month (see scripts/archive.py), so the primary key includes
+-- transaction_date and the account columns carry no foreign keys
 CREATE TABLE transactions (
-    transaction_id INT PRIMARY KEY AUTO_INCREMENT,
+    transaction_id INT AUTO_INCREMENT,
     from_account INT,
     to_account INT,
     transaction_type ENUM('deposit', 'withdrawal', 'transfer', 'international_transfer') NOT NULL,
@@ -59,10 +70,45 @@ CREATE TABLE transactions (
     fee DECIMAL(10, 2) DEFAULT 0.00,
     currency VARCHAR(3) DEFAULT 'INR',
     description TEXT,
-    transaction_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    transaction_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     status ENUM('completed', 'failed', 'pending') DEFAULT 'completed',
-    FOREIGN KEY (from_account) REFERENCES accounts(account_id),
-    FOREIGN KEY (to_account) REFERENCES accounts(account_id)
+    -- Rate applied to an international transfer and the rates version it came from
+    exchange_rate DECIMAL(10, 4) NULL,
+    rate_version VARCHAR(40) NULL,
+    -- History is read per account and direction, newest first
+    INDEX idx_transactions_from_date (from_account, transaction_date),
+    INDEX idx_transactions_to_date (to_account, transaction_date),
+    -- Covering index for the completed-transaction statistics
+    INDEX idx_transactions_status_date (status, transaction_date, transaction_type, amount),
+    PRIMARY KEY (transaction_id, transaction_date)
+)
+-- Monthly partitions are split out of pmax by `python -m scripts.archive`
+PARTITION BY RANGE (UNIX_TIMESTAMP(transaction_date)) (
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+
+-- Per-account ledger rollups, maintained by the maintain_account_rollups trigger.
+-- Hot accounts (balance_slots > 0) spread their credits over that many rows;
+-- an account's totals are the sum of its rows.
+CREATE TABLE account_rollups (
+    account_id INT NOT NULL,
+    slot TINYINT UNSIGNED NOT NULL DEFAULT 0,
+    transaction_count INT NOT NULL DEFAULT 0,
+    total_credits DECIMAL(18, 2) NOT NULL DEFAULT 0.00,
+    total_debits DECIMAL(18, 2) NOT NULL DEFAULT 0.00,
+    last_activity TIMESTAMP NULL,
+    PRIMARY KEY (account_id, slot),
+    FOREIGN KEY (account_id) REFERENCES accounts(account_id) ON DELETE CASCADE
+);
+
+-- Credits to hot accounts not yet folded into accounts.balance; the balance
+-- of an account is accounts.balance plus its slots (see hot_accounts.py)
+CREATE TABLE account_balance_slots (
+    account_id INT NOT NULL,
+    slot TINYINT UNSIGNED NOT NULL,
+    amount DECIMAL(15, 2) NOT NULL DEFAULT 0.00,
+    PRIMARY KEY (account_id, slot),
+    FOREIGN KEY (account_id) REFERENCES accounts(account_id) ON DELETE CASCADE
 );
 
 -- Loans Table
@@ -81,6 +127,13 @@ CREATE TABLE loans (
     applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     approved_by INT,
     approved_at TIMESTAMP NULL,
+    -- Customer loan list and the pending-approval queue, newest first
+    INDEX idx_loans_user_applied (user_id, applied_at),
+    INDEX idx_loans_status_applied (status, applied_at),
+    -- Admin loan listing: newest first, by amount, by type
+    INDEX idx_loans_applied (applied_at),
+    INDEX idx_loans_amount (loan_amount),
+    INDEX idx_loans_type_applied (loan_type, applied_at),
     FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
     FOREIGN KEY (account_id) REFERENCES accounts(account_id),
     FOREIGN KEY (approved_by) REFERENCES admin(admin_id)
@@ -90,18 +143,86 @@ CREATE TABLE loans (
 CREATE TABLE loan_payments (
     payment_id INT PRIMARY KEY AUTO_INCREMENT,
     loan_id INT NOT NULL,
+    installment_no INT NULL,
     payment_amount DECIMAL(15, 2) NOT NULL,
+    principal_amount DECIMAL(15, 2) NULL,
+    interest_amount DECIMAL(15, 2) NULL,
     payment_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     remaining_balance DECIMAL(15, 2),
+    -- One row per posted installment; makes EMI posting safe to re-run
+    UNIQUE KEY uq_loan_payments_installment (loan_id, installment_no),
     FOREIGN KEY (loan_id) REFERENCES loans(loan_id) ON DELETE CASCADE
 );
 
+-- Daily savings interest, one row per account and business date (see scripts/accrue_interest.py)
+CREATE TABLE interest_accruals (
+    accrual_id BIGINT PRIMARY KEY AUTO_INCREMENT,
+    account_id INT NOT NULL,
+    business_date DATE NOT NULL,
+    balance DECIMAL(15, 2) NOT NULL,
+    rate DECIMAL(5, 2) NOT NULL,
+    amount DECIMAL(15, 2) NOT NULL,
+    accrued_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- An account is accrued at most once per business date
+    UNIQUE KEY uq_interest_accruals_account_date (account_id, business_date),
+    FOREIGN KEY (account_id) REFERENCES accounts(account_id) ON DELETE CASCADE
+);
+
+-- Append-only audit trail of status changes and admin actions (see audit.py)
+CREATE TABLE audit_log (
+    audit_id BIGINT PRIMARY KEY AUTO_INCREMENT,
+    entity_type VARCHAR(30) NOT NULL,
+    entity_id INT NULL,
+    action VARCHAR(50) NOT NULL,
+    actor_type ENUM('user', 'admin', 'system') NOT NULL DEFAULT 'system',
+    actor_id INT NULL,
+    details JSON NULL,
+    created_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    -- Events of one entity, or of one entity type, by time
+    INDEX idx_audit_entity_created (entity_type, entity_id, created_at),
+    INDEX idx_audit_type_created (entity_type, created_at)
+);
+
+-- Entries to and exits from the admin approval queues, read by change_feed.py
+CREATE TABLE pending_events (
+    event_id BIGINT PRIMARY KEY AUTO_INCREMENT,
+    entity_type ENUM('account', 'loan') NOT NULL,
+    entity_id INT NOT NULL,
+    event ENUM('created', 'resolved') NOT NULL,
+    created_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    INDEX idx_pending_events_created (created_at)
+);
+
 -- Exchange Rates Table
 CREATE TABLE exchange_rates (
     rate_id INT PRIMARY KEY AUTO_INCREMENT,
     from_currency VARCHAR(3) NOT NULL,
     to_currency VARCHAR(3) NOT NULL,
     rate DECIMAL(10, 4) NOT NULL,
+    -- Microsecond precision so every change moves the rates version (see rates.py)
+    updated_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+    UNIQUE KEY uq_exchange_rates_pair (from_currency, to_currency)
+);
+
+-- Next account number sequence value (single row, see allocate_account_numbers)
+CREATE TABLE account_number_sequence (
+    id TINYINT PRIMARY KEY,
+    next_value BIGINT NOT NULL
+);
+
+-- Migrations from database/migrations already applied (see scripts/migrate.py)
+CREATE TABLE schema_migrations (
+    version VARCHAR(100) PRIMARY KEY,
+    checksum CHAR(64) NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Progress of scripts.bulk_import runs, committed together with each batch
+CREATE TABLE import_checkpoints (
+    source VARCHAR(255) PRIMARY KEY,
+    rows_done BIGINT NOT NULL DEFAULT 0,
+    rows_loaded BIGINT NOT NULL DEFAULT 0,
+    rows_rejected BIGINT NOT NULL DEFAULT 0,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
 
@@ -109,22 +230,35 @@ CREATE TABLE exchange_rates (
 -- FUNCTIONS
 -- ============================================
 
--- Function to generate account number
+-- Function to format an account number: 'VIT', 12-digit sequence value, Luhn check digit
 DELIMITER //
-CREATE FUNCTION generate_account_number() 
+CREATE FUNCTION format_account_number(p_seq BIGINT)
 RETURNS VARCHAR(16)
 DETERMINISTIC
 BEGIN
-    DECLARE acc_num VARCHAR(16);
-    DECLARE num_exists INT;
+    DECLARE digits CHAR(12);
+    DECLARE pos INT DEFAULT 12;
+    DECLARE d INT;
+    DECLARE total INT DEFAULT 0;
+    DECLARE double_it BOOLEAN DEFAULT TRUE;
     
-    REPEAT
-        SET acc_num = CONCAT('VIT', LPAD(FLOOR(RAND() * 10000000000000), 13, '0'));
-        SELECT COUNT(*) INTO num_exists FROM accounts WHERE account_number = acc_num;
-    UNTIL num_exists = 0
-    END REPEAT;
+    SET digits = LPAD(p_seq, 12, '0');
+    
+    -- Double every second digit, starting from the rightmost
+    WHILE pos >= 1 DO
+        SET d = CAST(SUBSTRING(digits, pos, 1) AS UNSIGNED);
+        IF double_it THEN
+            SET d = d * 2;
+            IF d > 9 THEN
+                SET d = d - 9;
+            END IF;
+        END IF;
+        SET total = total + d;
+        SET double_it = NOT double_it;
+        SET pos = pos - 1;
+    END WHILE;
     
-    RETURN acc_num;
+    RETURN CONCAT('VIT', digits, (10 - total % 10) % 10);
 END//
 
 -- Function to calculate EMI
@@ -190,8 +324,9 @@ BEGIN
     WHERE from_currency = from_curr AND to_currency = to_curr
     LIMIT 1;
     
+    -- No configured rate: NULL rather than a made-up default
     IF exchange_rate IS NULL THEN
-        SET exchange_rate = 83.0; -- Default INR to USD rate
+        RETURN NULL;
     END IF;
     
     SET converted_amount = amount * exchange_rate;
@@ -257,6 +392,20 @@ BEGIN
     END IF;
 END//
 
+-- Procedure to reserve p_count consecutive account number sequence values.
+-- LAST_INSERT_ID(expr) makes the new value visible to this session only.
+CREATE PROCEDURE allocate_account_numbers(
+    IN p_count INT,
+    OUT p_first BIGINT
+)
+BEGIN
+    UPDATE account_number_sequence
+    SET next_value = LAST_INSERT_ID(next_value + p_count)
+    WHERE id = 1;
+    
+    SET p_first = LAST_INSERT_ID() - p_count;
+END//
+
 -- Procedure to create account
 CREATE PROCEDURE create_account(
     IN p_user_id INT,
@@ -269,6 +418,9 @@ BEGIN
     DECLARE user_exists INT;
     DECLARE acc_num VARCHAR(16);
     DECLARE curr VARCHAR(3);
+    DECLARE seq BIGINT;
+    DECLARE duplicate_number BOOLEAN DEFAULT FALSE;
+    DECLARE CONTINUE HANDLER FOR 1062 SET duplicate_number = TRUE;
     
     -- Check if user exists
     SELECT COUNT(*) INTO user_exists FROM users WHERE user_id = p_user_id AND is_active = TRUE;
@@ -277,9 +429,6 @@ BEGIN
         SET p_account_id = -1;
         SET p_message = 'User not found or inactive';
     ELSE
-        -- Generate account number
-        SET acc_num = generate_account_number();
-        
         -- Set currency based on account type
         IF p_account_type = 'international' THEN
             SET curr = 'USD';
@@ -287,8 +436,17 @@ BEGIN
             SET curr = 'INR';
         END IF;
         
-        INSERT INTO accounts (user_id, account_number, account_type, currency, status)
-        VALUES (p_user_id, acc_num, p_account_type, curr, 'pending');
+        -- Sequence numbers never repeat; a duplicate can only be a number
+        -- issued randomly before the sequence existed, so take the next one
+        REPEAT
+            SET duplicate_number = FALSE;
+            CALL allocate_account_numbers(1, seq);
+            SET acc_num = format_account_number(seq);
+            
+            INSERT INTO accounts (user_id, account_number, account_type, currency, status)
+            VALUES (p_user_id, acc_num, p_account_type, curr, 'pending');
+        UNTIL NOT duplicate_number
+        END REPEAT;
         
         SET p_account_id = LAST_INSERT_ID();
         SET p_account_number = acc_num;
@@ -318,6 +476,11 @@ BEGIN
             approved_at = CURRENT_TIMESTAMP
         WHERE account_id = p_account_id;
         
+        -- Audited in the same transaction as the status change
+        INSERT INTO audit_log (entity_type, entity_id, action, actor_type, actor_id, details)
+        VALUES ('account', p_account_id, 'status_change', 'admin', p_admin_id,
+                JSON_OBJECT('from', 'pending', 'to', 'active'));
+        
         SET p_message = 'Account approved successfully';
     END IF;
 END//
@@ -328,6 +491,8 @@ CREATE PROCEDURE transfer_money(
     IN p_to_account INT,
     IN p_amount DECIMAL(15,2),
     IN p_description TEXT,
+    IN p_rate DECIMAL(10,4),
+    IN p_rate_version VARCHAR(40),
     OUT p_transaction_id INT,
     OUT p_message VARCHAR(255)
 )
@@ -335,12 +500,16 @@ BEGIN
     DECLARE from_balance DECIMAL(15,2);
     DECLARE from_currency VARCHAR(3);
     DECLARE from_status VARCHAR(20);
+    DECLARE from_slots TINYINT UNSIGNED DEFAULT 0;
+    DECLARE slot_total DECIMAL(15,2) DEFAULT 0.00;
     DECLARE to_currency VARCHAR(3);
     DECLARE to_status VARCHAR(20);
     DECLARE to_type VARCHAR(20);
+    DECLARE to_slots TINYINT UNSIGNED DEFAULT 0;
     DECLARE converted_amount DECIMAL(15,2);
     DECLARE transfer_fee DECIMAL(10,2) DEFAULT 0.00;
     DECLARE trans_type VARCHAR(30);
+    DECLARE is_international BOOLEAN;
     
     DECLARE EXIT HANDLER FOR SQLEXCEPTION
     BEGIN
@@ -349,14 +518,54 @@ BEGIN
         SET p_message = 'Transaction failed due to an error';
     END;
     
+    -- Deadlock (1213) or lock wait timeout (1205): safe to retry
+    DECLARE EXIT HANDLER FOR 1213, 1205
+    BEGIN
+        ROLLBACK;
+        SET p_transaction_id = -1;
+        SET p_message = 'Transaction aborted due to lock contention, please retry';
+    END;
+    
+    -- A hot account (balance_slots > 0) is credited in one of its balance
+    -- slots, so a transfer to it only share-locks its row and concurrent
+    -- credits do not queue behind each other
+    SELECT balance_slots INTO to_slots FROM accounts WHERE account_id = p_to_account;
+    
     START TRANSACTION;
     
-    -- Get account details
-    SELECT balance, currency, status INTO from_balance, from_currency, from_status
-    FROM accounts WHERE account_id = p_from_account FOR UPDATE;
+    -- Get account details, locking rows in account_id order so that
+    -- concurrent opposite transfers (A to B, B to A) cannot deadlock
+    IF p_from_account <= p_to_account THEN
+        SELECT balance, currency, status, balance_slots INTO from_balance, from_currency, from_status, from_slots
+        FROM accounts WHERE account_id = p_from_account FOR UPDATE;
+        
+        IF to_slots > 0 THEN
+            SELECT currency, status, account_type, balance_slots INTO to_currency, to_status, to_type, to_slots
+            FROM accounts WHERE account_id = p_to_account FOR SHARE;
+        ELSE
+            SELECT currency, status, account_type, balance_slots INTO to_currency, to_status, to_type, to_slots
+            FROM accounts WHERE account_id = p_to_account FOR UPDATE;
+        END IF;
+    ELSE
+        IF to_slots > 0 THEN
+            SELECT currency, status, account_type, balance_slots INTO to_currency, to_status, to_type, to_slots
+            FROM accounts WHERE account_id = p_to_account FOR SHARE;
+        ELSE
+            SELECT currency, status, account_type, balance_slots INTO to_currency, to_status, to_type, to_slots
+            FROM accounts WHERE account_id = p_to_account FOR UPDATE;
+        END IF;
+        
+        SELECT balance, currency, status, balance_slots INTO from_balance, from_currency, from_status, from_slots
+        FROM accounts WHERE account_id = p_from_account FOR UPDATE;
+    END IF;
     
-    SELECT currency, status, account_type INTO to_currency, to_status, to_type
-    FROM accounts WHERE account_id = p_to_account FOR UPDATE;
+    -- A debit from a hot account can spend its slots; no credit can be
+    -- in progress while its row is locked for update
+    IF from_slots > 0 THEN
+        SELECT COALESCE(SUM(amount), 0) INTO slot_total
+        FROM account_balance_slots WHERE account_id = p_from_account FOR UPDATE;
+        SET from_balance = from_balance + slot_total;
+    END IF;
     
     -- Validate accounts
     IF from_balance IS NULL OR to_currency IS NULL THEN
@@ -371,11 +580,17 @@ BEGIN
         ROLLBACK;
         SET p_transaction_id = -1;
         SET p_message = 'Invalid amount';
+    ELSEIF to_type = 'international' AND from_currency = 'INR' AND p_rate IS NULL THEN
+        ROLLBACK;
+        SET p_transaction_id = -1;
+        SET p_message = 'Exchange rate not available';
     ELSE
-        -- Check if international transfer
-        IF to_type = 'international' AND from_currency = 'INR' THEN
+        -- Check if international transfer; the rate was resolved by the
+        -- caller, so nothing else is read while the accounts are locked
+        SET is_international = (to_type = 'international' AND from_currency = 'INR');
+        IF is_international THEN
             SET transfer_fee = calculate_intl_fee(p_amount);
-            SET converted_amount = convert_currency(p_amount, from_currency, to_currency);
+            SET converted_amount = ROUND(p_amount * p_rate, 2);
             SET trans_type = 'international_transfer';
         ELSE
             SET converted_amount = p_amount;
@@ -388,19 +603,30 @@ BEGIN
             SET p_transaction_id = -1;
             SET p_message = 'Insufficient balance';
         ELSE
-            -- Deduct from sender
+            -- Deduct from sender, folding in its slots if it is a hot account
             UPDATE accounts 
-            SET balance = balance - p_amount - transfer_fee
+            SET balance = balance + slot_total - p_amount - transfer_fee
             WHERE account_id = p_from_account;
+            IF slot_total > 0 THEN
+                UPDATE account_balance_slots SET amount = 0 WHERE account_id = p_from_account;
+            END IF;
             
             -- Add to receiver
-            UPDATE accounts 
-            SET balance = balance + converted_amount
-            WHERE account_id = p_to_account;
+            IF to_slots > 0 THEN
+                INSERT INTO account_balance_slots (account_id, slot, amount)
+                VALUES (p_to_account, FLOOR(RAND() * to_slots), converted_amount)
+                ON DUPLICATE KEY UPDATE amount = amount + VALUES(amount);
+            ELSE
+                UPDATE accounts 
+                SET balance = balance + converted_amount
+                WHERE account_id = p_to_account;
+            END IF;
             
             -- Record transaction
-            INSERT INTO transactions (from_account, to_account, transaction_type, amount, fee, currency, description)
-            VALUES (p_from_account, p_to_account, trans_type, p_amount, transfer_fee, from_currency, p_description);
+            INSERT INTO transactions (from_account, to_account, transaction_type, amount, fee, currency, description,
+                                      exchange_rate, rate_version)
+            VALUES (p_from_account, p_to_account, trans_type, p_amount, transfer_fee, from_currency, p_description,
+                    IF(is_international, p_rate, NULL), IF(is_international, p_rate_version, NULL));
             
             SET p_transaction_id = LAST_INSERT_ID();
             SET p_message = CONCAT('Transfer successful. Fee: ', transfer_fee);
@@ -518,6 +744,11 @@ BEGIN
             SET p_message = 'Loan rejected';
         END IF;
         
+        -- Audited in the same transaction as the status change
+        INSERT INTO audit_log (entity_type, entity_id, action, actor_type, actor_id, details)
+        VALUES ('loan', p_loan_id, 'status_change', 'admin', p_admin_id,
+                JSON_OBJECT('from', 'pending', 'to', IF(p_approve = TRUE, 'disbursed', 'rejected')));
+        
         COMMIT;
     END IF;
 END//
@@ -530,8 +761,9 @@ CREATE PROCEDURE deposit_money(
 )
 BEGIN
     DECLARE acc_status VARCHAR(20);
+    DECLARE acc_slots TINYINT UNSIGNED;
     
-    SELECT status INTO acc_status FROM accounts WHERE account_id = p_account_id;
+    SELECT status, balance_slots INTO acc_status, acc_slots FROM accounts WHERE account_id = p_account_id;
     
     IF acc_status IS NULL THEN
         SET p_message = 'Account not found';
@@ -540,7 +772,13 @@ BEGIN
     ELSEIF p_amount <= 0 THEN
         SET p_message = 'Invalid amount';
     ELSE
-        UPDATE accounts SET balance = balance + p_amount WHERE account_id = p_account_id;
+        IF acc_slots > 0 THEN
+            INSERT INTO account_balance_slots (account_id, slot, amount)
+            VALUES (p_account_id, FLOOR(RAND() * acc_slots), p_amount)
+            ON DUPLICATE KEY UPDATE amount = amount + VALUES(amount);
+        ELSE
+            UPDATE accounts SET balance = balance + p_amount WHERE account_id = p_account_id;
+        END IF;
         
         INSERT INTO transactions (to_account, transaction_type, amount, description)
         VALUES (p_account_id, 'deposit', p_amount, 'Cash deposit');
@@ -549,6 +787,78 @@ BEGIN
     END IF;
 END//
 
+-- Procedure to fold a hot account's balance slots into its balance
+CREATE PROCEDURE consolidate_balance_slots(
+    IN p_account_id INT,
+    OUT p_amount DECIMAL(15,2)
+)
+BEGIN
+    DECLARE acc_id INT;
+    
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        RESIGNAL;
+    END;
+    
+    START TRANSACTION;
+    
+    -- Waits for the credits in progress, and holds off new ones until COMMIT
+    SELECT account_id INTO acc_id FROM accounts WHERE account_id = p_account_id FOR UPDATE;
+    
+    SELECT COALESCE(SUM(amount), 0) INTO p_amount
+    FROM account_balance_slots WHERE account_id = p_account_id FOR UPDATE;
+    
+    IF p_amount > 0 THEN
+        UPDATE accounts SET balance = balance + p_amount WHERE account_id = p_account_id;
+        UPDATE account_balance_slots SET amount = 0 WHERE account_id = p_account_id;
+    END IF;
+    
+    COMMIT;
+END//
+
+-- Procedure to turn hot-account mode on (p_slots > 0) or off (0)
+CREATE PROCEDURE set_balance_slots(
+    IN p_account_id INT,
+    IN p_slots TINYINT UNSIGNED,
+    OUT p_message VARCHAR(255)
+)
+BEGIN
+    DECLARE acc_id INT;
+    DECLARE slot_total DECIMAL(15,2);
+    DECLARE next_slot TINYINT UNSIGNED DEFAULT 0;
+    
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        SET p_message = 'Could not change balance slots due to an error';
+    END;
+    
+    START TRANSACTION;
+    
+    SELECT account_id INTO acc_id FROM accounts WHERE account_id = p_account_id FOR UPDATE;
+    
+    IF acc_id IS NULL THEN
+        ROLLBACK;
+        SET p_message = 'Account not found';
+    ELSE
+        -- Everything credited so far moves to the balance
+        SELECT COALESCE(SUM(amount), 0) INTO slot_total
+        FROM account_balance_slots WHERE account_id = p_account_id FOR UPDATE;
+        UPDATE accounts SET balance = balance + slot_total, balance_slots = p_slots WHERE account_id = p_account_id;
+        DELETE FROM account_balance_slots WHERE account_id = p_account_id;
+        
+        WHILE next_slot < p_slots DO
+            INSERT INTO account_balance_slots (account_id, slot) VALUES (p_account_id, next_slot);
+            SET next_slot = next_slot + 1;
+        END WHILE;
+        
+        COMMIT;
+        SET p_message = IF(p_slots > 0, CONCAT('Hot-account mode on with ', p_slots, ' balance slots'),
+                           'Hot-account mode off');
+    END IF;
+END//
+
 DELIMITER ;
 
 -- ============================================
@@ -601,15 +911,99 @@ BEGIN
     END IF;
 END//
 
--- Trigger to log account status changes
-CREATE TRIGGER log_account_status_change
+-- Balance slots only ever hold credits
+CREATE TRIGGER prevent_negative_balance_slot
+BEFORE UPDATE ON account_balance_slots
+FOR EACH ROW
+BEGIN
+    IF NEW.amount < 0 THEN
+        SIGNAL SQLSTATE '45000'
+        SET MESSAGE_TEXT = 'Account balance cannot be negative';
+    END IF;
+END//
+
+-- The audit log is append-only
+CREATE TRIGGER audit_log_no_update
+BEFORE UPDATE ON audit_log
+FOR EACH ROW
+BEGIN
+    SIGNAL SQLSTATE '45000'
+    SET MESSAGE_TEXT = 'audit_log is append-only';
+END//
+
+CREATE TRIGGER audit_log_no_delete
+BEFORE DELETE ON audit_log
+FOR EACH ROW
+BEGIN
+    SIGNAL SQLSTATE '45000'
+    SET MESSAGE_TEXT = 'audit_log is append-only';
+END//
+
+-- Feed the pending queues' change feed
+CREATE TRIGGER pending_account_created
+AFTER INSERT ON accounts
+FOR EACH ROW
+BEGIN
+    IF NEW.status = 'pending' THEN
+        INSERT INTO pending_events (entity_type, entity_id, event) VALUES ('account', NEW.account_id, 'created');
+    END IF;
+END//
+
+CREATE TRIGGER pending_account_resolved
 AFTER UPDATE ON accounts
 FOR EACH ROW
 BEGIN
-    IF OLD.status != NEW.status THEN
-        INSERT INTO transactions (to_account, transaction_type, amount, description)
-        VALUES (NEW.account_id, 'deposit', 0, 
-                CONCAT('Account status changed from ', OLD.status, ' to ', NEW.status));
+    IF OLD.status = 'pending' AND NEW.status != 'pending' THEN
+        INSERT INTO pending_events (entity_type, entity_id, event) VALUES ('account', NEW.account_id, 'resolved');
+    END IF;
+END//
+
+CREATE TRIGGER pending_loan_created
+AFTER INSERT ON loans
+FOR EACH ROW
+BEGIN
+    IF NEW.status = 'pending' THEN
+        INSERT INTO pending_events (entity_type, entity_id, event) VALUES ('loan', NEW.loan_id, 'created');
+    END IF;
+END//
+
+CREATE TRIGGER pending_loan_resolved
+AFTER UPDATE ON loans
+FOR EACH ROW
+BEGIN
+    IF OLD.status = 'pending' AND NEW.status != 'pending' THEN
+        INSERT INTO pending_events (entity_type, entity_id, event) VALUES ('loan', NEW.loan_id, 'resolved');
+    END IF;
+END//
+
+-- Trigger to keep account_rollups in step with the ledger
+CREATE TRIGGER maintain_account_rollups
+AFTER INSERT ON transactions
+FOR EACH ROW
+BEGIN
+    DECLARE to_slots TINYINT UNSIGNED DEFAULT 0;
+    
+    IF NEW.from_account IS NOT NULL THEN
+        INSERT INTO account_rollups (account_id, transaction_count, total_debits, last_activity)
+        VALUES (NEW.from_account, 1, NEW.amount, NEW.transaction_date)
+        ON DUPLICATE KEY UPDATE
+            transaction_count = transaction_count + 1,
+            total_debits = total_debits + NEW.amount,
+            last_activity = GREATEST(COALESCE(last_activity, NEW.transaction_date), NEW.transaction_date);
+    END IF;
+    
+    IF NEW.to_account IS NOT NULL THEN
+        -- Concurrent credits to a hot account land on different rollup rows
+        SELECT balance_slots INTO to_slots FROM accounts WHERE account_id = NEW.to_account;
+        
+        -- A self-transfer counts as one transaction, already counted above
+        INSERT INTO account_rollups (account_id, slot, transaction_count, total_credits, last_activity)
+        VALUES (NEW.to_account, IF(to_slots > 0, FLOOR(RAND() * to_slots), 0),
+                IF(NEW.from_account <=> NEW.to_account, 0, 1), NEW.amount, NEW.transaction_date)
+        ON DUPLICATE KEY UPDATE
+            transaction_count = transaction_count + IF(NEW.from_account <=> NEW.to_account, 0, 1),
+            total_credits = total_credits + NEW.amount,
+            last_activity = GREATEST(COALESCE(last_activity, NEW.transaction_date), NEW.transaction_date);
     END IF;
 END//
 
@@ -623,6 +1017,24 @@ DELIMITER ;
 INSERT INTO admin (email, password, full_name) 
 VALUES ('admin@bankvit.com', 'admin123', 'Bank Administrator');
 
+-- This schema already includes every migration up to and including these
+INSERT INTO schema_migrations (version, checksum) VALUES
+('000_pre_runner_schema', ''),
+('001_hot_query_indexes', ''),
+('002_account_number_sequence', ''),
+('003_exchange_rate_service', ''),
+('004_emi_posting', ''),
+('005_interest_accruals', ''),
+('006_audit_log', ''),
+('007_pending_events', ''),
+('008_partition_transactions', ''),
+('009_hot_account_slots', ''),
+('010_admin_listing_indexes', ''),
+('011_rollup_slots', ''),
+('012_audit_status_changes', '');
+
+INSERT INTO account_number_sequence (id, next_value) VALUES (1, 1);
+
 -- Insert exchange rates
 INSERT INTO exchange_rates (from_currency, to_currency, rate) VALUES
 ('INR', 'USD', 0.012),
@@ -634,26 +1046,31 @@ INSERT INTO exchange_rates (from_currency, to_currency, rate) VALUES
 -- SAMPLE VIEWS FOR REPORTING
 -- ============================================
 
--- View for account summary
+-- View for account summary (ledger totals come from account_rollups)
 CREATE VIEW account_summary AS
 SELECT 
     a.account_id,
     a.account_number,
     a.account_type,
-    a.balance,
+    a.balance + (SELECT COALESCE(SUM(s.amount), 0) FROM account_balance_slots s
+                 WHERE s.account_id = a.account_id) as balance,
     a.currency,
     a.status,
     u.full_name,
     u.email,
     u.phone,
-    COUNT(DISTINCT t.transaction_id) as transaction_count,
-    COALESCE(SUM(CASE WHEN t.to_account = a.account_id THEN t.amount ELSE 0 END), 0) as total_credits,
-    COALESCE(SUM(CASE WHEN t.from_account = a.account_id THEN t.amount ELSE 0 END), 0) as total_debits
+    COALESCE(r.transaction_count, 0) as transaction_count,
+    COALESCE(r.total_credits, 0) as total_credits,
+    COALESCE(r.total_debits, 0) as total_debits,
+    r.last_activity
 FROM accounts a
 JOIN users u ON a.user_id = u.user_id
-LEFT JOIN transactions t ON a.account_id = t.from_account OR a.account_id = t.to_account
-GROUP BY a.account_id, a.account_number, a.account_type, a.balance, a.currency, 
-         a.status, u.full_name, u.email, u.phone;
+LEFT JOIN LATERAL (
+    SELECT SUM(transaction_count) as transaction_count, SUM(total_credits) as total_credits,
+           SUM(total_debits) as total_debits, MAX(last_activity) as last_activity
+    FROM account_rollups
+    WHERE account_id = a.account_id
+) r ON TRUE;
 
 -- View for loan summary with aggregate functions
 CREATE VIEW loan_summary AS
@@ -788,7 +1205,24 @@ END//
 
 CREATE PROCEDURE get_user_transactions(IN p_account_id INT)
 BEGIN
-    SELECT 
+    -- Debits and credits are read through their own indexes and merged
+    (SELECT 
+        t.transaction_id,
+        t.transaction_type,
+        t.amount,
+        t.fee,
+        t.description,
+        t.transaction_date,
+        t.status,
+        'Debit' as type,
+        a.account_number as other_account
+    FROM transactions t
+    LEFT JOIN accounts a ON t.to_account = a.account_id
+    WHERE t.from_account = p_account_id
+    ORDER BY t.transaction_date DESC, t.transaction_id DESC
+    LIMIT 50)
+    UNION ALL
+    (SELECT 
         t.transaction_id,
         t.transaction_type,
         t.amount,
@@ -796,19 +1230,15 @@ BEGIN
         t.description,
         t.transaction_date,
         t.status,
-        CASE 
-            WHEN t.from_account = p_account_id THEN 'Debit'
-            WHEN t.to_account = p_account_id THEN 'Credit'
-        END as type,
-        CASE 
-            WHEN t.from_account = p_account_id THEN a2.account_number
-            WHEN t.to_account = p_account_id THEN a1.account_number
-        END as other_account
+        'Credit' as type,
+        a.account_number as other_account
     FROM transactions t
-    LEFT JOIN accounts a1 ON t.from_account = a1.account_id
-    LEFT JOIN accounts a2 ON t.to_account = a2.account_id
-    WHERE t.from_account = p_account_id OR t.to_account = p_account_id
-    ORDER BY t.transaction_date DESC
+    LEFT JOIN accounts a ON t.from_account = a.account_id
+    WHERE t.to_account = p_account_id
+      AND (t.from_account IS NULL OR t.from_account <> p_account_id)
+    ORDER BY t.transaction_date DESC, t.transaction_id DESC
+    LIMIT 50)
+    ORDER BY transaction_date DESC, transaction_id DESC
     LIMIT 50;
 END//
 
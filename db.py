@@ -0,0 +1,417 @@
+import os
+import threading
+import time
+
+import mysql.connector
+from mysql.connector import Error, errorcode
+from mysql.connector.errors import PoolError
+
+import metrics
+
+# Database configuration
+DB_CONFIG = {
+    'host': '127.0.0.1',
+    'port': '3306',
+    'user': 'root',
+    'password': 'password',  # Update with your MySQL password
+    'database': 'bank_of_vit'
+}
+
+# Connection pool configuration (override with environment variables)
+POOL_CONFIG = {
+    'size': int(os.environ.get('DB_POOL_SIZE', 10)),
+    # Seconds a request waits for a free connection before giving up
+    'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+    # Seconds after which a connection is retired and replaced
+    'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+    # Connections idle longer than this are pinged before being handed out
+    'health_check_after': float(os.environ.get('DB_POOL_HEALTH_CHECK_AFTER', 30)),
+    # Clear user variables, temporary tables and session settings on return
+    'reset_session': os.environ.get('DB_POOL_RESET_SESSION', '1') == '1'
+}
+
+# Read replicas as comma-separated host[:port], with DB_CONFIG's credentials and database
+DB_REPLICAS = [address.strip() for address in os.environ.get('DB_REPLICAS', '').split(',') if address.strip()]
+# A replica further behind the primary than this many seconds gets no reads
+DB_REPLICA_MAX_LAG = float(os.environ.get('DB_REPLICA_MAX_LAG', 2))
+# Seconds between replica health checks
+DB_REPLICA_CHECK_INTERVAL = float(os.environ.get('DB_REPLICA_CHECK_INTERVAL', 1))
+# Seconds a read waits for a busy replica's pool before it goes to the primary instead
+DB_REPLICA_ACQUIRE_TIMEOUT = float(os.environ.get('DB_REPLICA_ACQUIRE_TIMEOUT', 0))
+# Seconds a session's reads stay on the primary after it writes
+DB_STICKY_SECONDS = float(os.environ.get('DB_STICKY_SECONDS', 5))
+
+
+class PooledConnection:
+    """A borrowed MySQL connection; close() returns it to its pool"""
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.checked_out = False
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def raw(self):
+        return self._connection
+
+    def cursor(self, *args, **kwargs):
+        return metrics.instrument_cursor(self._connection.cursor(*args, **kwargs))
+
+    def close(self):
+        if self.checked_out:
+            self._pool.release(self)
+
+
+class ConnectionPool:
+    """Bounded pool of MySQL connections shared by all request threads"""
+
+    def __init__(self, config, size=10, timeout=5.0, max_lifetime=1800.0,
+                 health_check_after=30.0, reset_session=True):
+        self.config = config
+        self.size = size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+        self.reset_session = reset_session
+
+        self._idle = []
+        self._open = 0
+        self._waiters = 0
+        self._cond = threading.Condition(threading.Lock())
+
+        self._acquired_total = 0
+        self._waits_total = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+
+    def acquire(self, timeout=None):
+        """Borrow a healthy connection, waiting up to `timeout` seconds (default: the pool's)"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+
+        while True:
+            pooled = None
+            create = False
+            with self._cond:
+                while not self._idle and self._open >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolError(
+                            f"No database connection available within {timeout}s "
+                            f"(pool size {self.size})"
+                        )
+                    waited = True
+                    self._waiters += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiters -= 1
+
+                if self._idle:
+                    pooled = self._idle.pop()
+                else:
+                    self._open += 1
+                    create = True
+
+            if create:
+                pooled = self._create()
+            elif not self._is_usable(pooled):
+                self._discard(pooled)
+                continue
+
+            pooled.checked_out = True
+            self._record_checkout(started, waited)
+            return pooled
+
+    def release(self, pooled):
+        """Return a connection, resetting its session state first"""
+        pooled.checked_out = False
+        pooled.last_used = time.monotonic()
+
+        try:
+            connection = pooled.raw
+            if connection.unread_result:
+                connection.consume_results()
+            if connection.in_transaction:
+                connection.rollback()
+            if self.reset_session:
+                connection.reset_session()
+        except Error:
+            self._discard(pooled)
+            return
+
+        if self._expired(pooled):
+            self._discard(pooled)
+            return
+
+        with self._cond:
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    def stats(self):
+        """Snapshot of pool usage for sizing"""
+        with self._cond:
+            idle = len(self._idle)
+            acquired = self._acquired_total
+            return {
+                'size': self.size,
+                'open': self._open,
+                'idle': idle,
+                'in_use': self._open - idle,
+                'waiters': self._waiters,
+                'acquired_total': acquired,
+                'waits_total': self._waits_total,
+                'wait_time_total_ms': round(self._wait_time_total * 1000, 3),
+                'wait_time_avg_ms': round(self._wait_time_total * 1000 / acquired, 3) if acquired else 0.0,
+                'wait_time_max_ms': round(self._wait_time_max * 1000, 3),
+                'timeouts': self._timeouts,
+                'created': self._created,
+                'discarded': self._discarded
+            }
+
+    def close_all(self):
+        """Close every idle connection (borrowed ones close on return)"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            self._discard(pooled)
+
+    def _create(self):
+        try:
+            connection = mysql.connector.connect(**self.config)
+        except Error:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._created += 1
+        return PooledConnection(self, connection)
+
+    def _discard(self, pooled):
+        try:
+            pooled.raw.close()
+        except Error:
+            pass
+        with self._cond:
+            self._open -= 1
+            self._discarded += 1
+            self._cond.notify()
+
+    def _expired(self, pooled):
+        return time.monotonic() - pooled.created_at >= self.max_lifetime
+
+    def _is_usable(self, pooled):
+        if self._expired(pooled):
+            return False
+        if time.monotonic() - pooled.last_used < self.health_check_after:
+            return True
+        try:
+            pooled.raw.ping(reconnect=False)
+            return True
+        except Error:
+            return False
+
+    def _record_checkout(self, started, waited):
+        elapsed = time.monotonic() - started
+        with self._cond:
+            self._acquired_total += 1
+            if waited:
+                self._waits_total += 1
+                self._wait_time_total += elapsed
+                self._wait_time_max = max(self._wait_time_max, elapsed)
+
+
+def replica_config(address):
+    host, _, port = address.partition(':')
+    return {**DB_CONFIG, 'host': host, 'port': port or DB_CONFIG['port']}
+
+
+class Replica:
+    def __init__(self, address):
+        self.address = address
+        self.config = replica_config(address)
+        self.pool = ConnectionPool(self.config, **POOL_CONFIG)
+        # No reads until the first health check passes
+        self.healthy = False
+        self.lag = None
+        self.error = None
+
+
+class ReplicaSet:
+    """
+    Read replicas with a background health check.
+
+    A replica serves reads only while its SQL and I/O threads run and it is
+    at most `max_lag` seconds behind the primary. Healthy replicas are used
+    in turn. get_db_connection() falls back to the primary when none is
+    healthy or a replica cannot be reached.
+    """
+
+    def __init__(self, addresses, max_lag=DB_REPLICA_MAX_LAG, check_interval=DB_REPLICA_CHECK_INTERVAL):
+        self.replicas = [Replica(address) for address in addresses]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._next = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def pick(self):
+        """Next healthy replica, or None"""
+        if not self.replicas:
+            return None
+        self._ensure_started()
+        with self._lock:
+            healthy = [replica for replica in self.replicas if replica.healthy]
+            if not healthy:
+                return None
+            self._next += 1
+            return healthy[self._next % len(healthy)]
+
+    def mark_down(self, replica, error):
+        """Stop reading from a replica until its next successful check"""
+        replica.healthy = False
+        replica.error = str(error)
+
+    def check(self, replica):
+        try:
+            conn = replica.pool.acquire()
+        except Error as e:
+            self.mark_down(replica, e)
+            return
+        try:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                try:
+                    cursor.execute("SHOW REPLICA STATUS")
+                except Error as e:
+                    if e.errno != errorcode.ER_PARSE_ERROR:
+                        raise
+                    # MySQL before 8.0.22
+                    cursor.execute("SHOW SLAVE STATUS")
+                status = cursor.fetchone()
+            finally:
+                cursor.close()
+        except Error as e:
+            self.mark_down(replica, e)
+            return
+        finally:
+            conn.close()
+
+        if not status:
+            self.mark_down(replica, 'not replicating')
+            return
+        io_running = status.get('Replica_IO_Running', status.get('Slave_IO_Running'))
+        sql_running = status.get('Replica_SQL_Running', status.get('Slave_SQL_Running'))
+        running = io_running == 'Yes' and sql_running == 'Yes'
+        lag = status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+        replica.lag = lag
+        if not running or lag is None:
+            self.mark_down(replica, 'replication stopped')
+        elif lag > self.max_lag:
+            self.mark_down(replica, f'{lag}s behind')
+        else:
+            replica.healthy = True
+            replica.error = None
+
+    def stats(self):
+        return [
+            {'address': replica.address, 'healthy': replica.healthy, 'lag_seconds': replica.lag,
+             'error': replica.error, 'pool': replica.pool.stats()}
+            for replica in self.replicas
+        ]
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='replica-health', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            for replica in self.replicas:
+                self.check(replica)
+            time.sleep(self.check_interval)
+
+
+db_pool = ConnectionPool(DB_CONFIG, **POOL_CONFIG)
+replica_set = ReplicaSet(DB_REPLICAS)
+
+
+def get_db_connection(readonly=False):
+    """
+    Borrow a pooled database connection (close() returns it). With
+    `readonly`, a healthy replica is used when there is one.
+    """
+    started = time.perf_counter()
+    try:
+        replica = replica_set.pick() if readonly else None
+        if replica:
+            try:
+                return replica.pool.acquire(timeout=DB_REPLICA_ACQUIRE_TIMEOUT)
+            except PoolError:
+                pass  # Replica pool busy; this request reads from the primary at once
+            except Error as e:
+                replica_set.mark_down(replica, e)
+        return db_pool.acquire()
+    except Error as e:
+        print(f"Error connecting to MySQL: {e}")
+        return None
+    finally:
+        if metrics.METRICS_ENABLED:
+            metrics.DB_ACQUIRE_SECONDS.observe(time.perf_counter() - started, metrics.current_endpoint.get())
+
+
+def procedure_call_sql(name, arg_count, out_count):
+    """
+    "CALL name(%s, ..., @_name_out0, ...); SELECT @_name_out0, ..."
+
+    The SELECT returns the OUT parameters in the same round trip as the CALL.
+    """
+    outs = [f"@_{name}_out{i}" for i in range(out_count)]
+    return f"CALL {name}({', '.join(['%s'] * arg_count + outs)}); SELECT {', '.join(outs)}"
+
+
+def call_procedure(cursor, name, args, out_count, commit=True):
+    """
+    Call a write procedure and return its OUT parameters as a tuple, in one
+    round trip.
+
+    cursor.callproc() sends the IN values, the CALL and a SELECT of the
+    results as three statements, and the OUT values then took one more
+    SELECT and the commit another. Here the CALL, the SELECT of its OUT
+    variables and the COMMIT go to the server as one multi-statement query.
+    If the CALL fails, the server runs nothing after it and the error is
+    raised as usual. The session variables are cleared when the connection
+    returns to the pool.
+    """
+    sql = procedure_call_sql(name, len(args), out_count)
+    if commit:
+        sql += "; COMMIT"
+    row = None
+    for result in cursor.execute(sql, args, multi=True):
+        if result.with_rows:
+            rows = result.fetchall()
+            row = rows[0] if rows else row
+    if isinstance(row, dict):
+        row = tuple(row.values())
+    return row
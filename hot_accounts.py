@@ -0,0 +1,145 @@
+"""
+Hot-account balance slots.
+
+Every transfer locks both account rows, so the credits to one busy
+recipient (a merchant or collection account) run one at a time. With
+hot-account mode on (accounts.balance_slots = N > 0), transfer_money and
+deposit_money add each credit to one of the account's N account_balance_slots
+rows, picked at random. They only share-lock the account row, so up to N
+credits commit in parallel. The account's balance is accounts.balance plus
+its slots:
+
+  - reads add the slots (ACCOUNT_BALANCE_SQL, the account_summary view)
+  - a debit locks the account row for update, which waits for the credits in
+    progress and holds off new ones. It then folds the slots into the balance
+    before checking it, so prevent_negative_balance still guards every debit
+  - SlotConsolidator folds the slots into the balance in the background, so
+    they never hold more than a few seconds of credits
+
+The maintain_account_rollups trigger spreads the account's ledger rollups
+over the same number of account_rollups rows, so the rollup upsert of each
+credit doesn't queue the credits up again. Readers sum them
+(ACCOUNT_ROLLUPS_JOIN).
+
+Hot-account mode is switched on and off with `python -m scripts.hot_accounts`.
+"""
+import os
+import threading
+import time
+
+from mysql.connector import Error
+
+from db import get_db_connection
+
+# Seconds between background folds of the balance slots
+HOT_ACCOUNT_CONSOLIDATE_INTERVAL = float(os.environ.get('HOT_ACCOUNT_CONSOLIDATE_INTERVAL', 2))
+
+# Balance of accounts row `a`, including credits still in its slots
+ACCOUNT_BALANCE_SQL = (
+    "a.balance + (SELECT COALESCE(SUM(s.amount), 0) FROM account_balance_slots s WHERE s.account_id = a.account_id)"
+)
+
+# Ledger rollups `r` of accounts row `a`, summed over its rollup slots
+ACCOUNT_ROLLUPS_JOIN = """LEFT JOIN LATERAL (
+            SELECT SUM(transaction_count) as transaction_count, SUM(total_credits) as total_credits,
+                   SUM(total_debits) as total_debits, MAX(last_activity) as last_activity
+            FROM account_rollups
+            WHERE account_id = a.account_id
+        ) r ON TRUE"""
+
+PENDING_SLOTS_SQL = "SELECT DISTINCT account_id FROM account_balance_slots WHERE amount <> 0"
+
+
+def fold_slots(cursor, account_ids):
+    """
+    Move the slots of the given accounts into accounts.balance; returns
+    {account_id: amount folded}.
+
+    The caller must hold the accounts rows FOR UPDATE in its transaction and
+    add the folded amounts to any balance it has already read. `cursor` is a
+    dictionary cursor.
+    """
+    account_ids = sorted(set(account_ids))
+    if not account_ids:
+        return {}
+    cursor.execute(
+        f"SELECT account_id, SUM(amount) as amount FROM account_balance_slots "
+        f"WHERE account_id IN ({', '.join(['%s'] * len(account_ids))}) GROUP BY account_id FOR UPDATE",
+        account_ids
+    )
+    folded = {row['account_id']: row['amount'] for row in cursor.fetchall() if row['amount']}
+    if folded:
+        ids = sorted(folded)
+        cursor.execute(
+            f"UPDATE accounts SET balance = balance + CASE account_id "
+            f"{' '.join(['WHEN %s THEN %s'] * len(ids))} END "
+            f"WHERE account_id IN ({', '.join(['%s'] * len(ids))})",
+            [value for account_id in ids for value in (account_id, folded[account_id])] + ids
+        )
+        cursor.execute(
+            f"UPDATE account_balance_slots SET amount = 0 WHERE account_id IN ({', '.join(['%s'] * len(ids))})",
+            ids
+        )
+    return folded
+
+
+class SlotConsolidator:
+    """
+    Folds the balance slots of every hot account into its balance, one
+    short transaction per account, every `interval` seconds.
+
+    Each fold locks the account row for update, so the credits to that
+    account pause for the duration of one small transaction per interval.
+    Any number of processes can run a consolidator; folds are idempotent.
+    """
+
+    def __init__(self, connect=get_db_connection, interval=HOT_ACCOUNT_CONSOLIDATE_INTERVAL):
+        self.connect = connect
+        self.interval = interval
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self.folds = 0
+        self.errors = 0
+
+    def ensure_running(self):
+        """Start the background thread if it is not running yet"""
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='slot-consolidator', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.consolidate()
+            except Error:
+                self.errors += 1  # Slots keep their credits until the next interval
+
+    def consolidate(self):
+        """Fold every account that has credits in its slots; returns the number folded"""
+        conn = self.connect()
+        if not conn:
+            raise Error(msg='Database connection failed')
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(PENDING_SLOTS_SQL)
+                account_ids = [row[0] for row in cursor.fetchall()]
+                conn.commit()
+                for account_id in account_ids:
+                    cursor.callproc('consolidate_balance_slots', [account_id, None])
+                self.folds += len(account_ids)
+                return len(account_ids)
+            finally:
+                cursor.close()
+        finally:
+            conn.close()
+
+    def stats(self):
+        return {'running': self._thread is not None, 'folds': self.folds, 'errors': self.errors}
+
+
+slot_consolidator = SlotConsolidator()
@@ -0,0 +1,242 @@
+import bisect
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+
+# Set METRICS_ENABLED=0 to turn instrumentation off; cursors are then not
+# wrapped at all and the request hooks return immediately
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+# Statements slower than this (milliseconds) are written to the slow-query log
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 200))
+SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG')
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Endpoint of the request being served, used to label database timings
+current_endpoint = contextvars.ContextVar('current_endpoint', default='-')
+
+slow_query_log = logging.getLogger('bank.slow_query')
+if SLOW_QUERY_LOG:
+    _handler = logging.FileHandler(SLOW_QUERY_LOG)
+    _handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+    slow_query_log.addHandler(_handler)
+    slow_query_log.setLevel(logging.WARNING)
+    slow_query_log.propagate = False
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with labels"""
+
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in sorted(items):
+            base = ','.join(f'{name}="{escape(value)}"' for name, value in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                bucket_labels = join_labels(base, 'le="%s"' % bound)
+                lines.append(f'{self.name}_bucket{{{bucket_labels}}} {cumulative}')
+            bucket_labels = join_labels(base, 'le="+Inf"')
+            lines.append(f'{self.name}_bucket{{{bucket_labels}}} {count}')
+            lines.append(f'{self.name}_sum{{{base}}} {total}')
+            lines.append(f'{self.name}_count{{{base}}} {count}')
+        return lines
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def join_labels(base, extra):
+    return f"{base},{extra}" if base else extra
+
+
+REQUEST_SECONDS = Histogram(
+    'bank_http_request_seconds', 'Time to serve an HTTP request', ('endpoint', 'method', 'status'))
+JSON_ENCODE_SECONDS = Histogram(
+    'bank_json_encode_seconds', 'Time spent encoding JSON responses', ('endpoint',))
+DB_ACQUIRE_SECONDS = Histogram(
+    'bank_db_acquire_seconds', 'Time to obtain a database connection', ('endpoint',))
+DB_QUERY_SECONDS = Histogram(
+    'bank_db_query_seconds', 'Database statement latency', ('endpoint', 'statement', 'phase'))
+
+HISTOGRAMS = (REQUEST_SECONDS, JSON_ENCODE_SECONDS, DB_ACQUIRE_SECONDS, DB_QUERY_SECONDS)
+
+_WHITESPACE = re.compile(r'\s+')
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_OUT_PARAMS = re.compile(r'^SELECT @_(\w+?)_\d+', re.IGNORECASE)
+_CALL = re.compile(r'^CALL (\w+)\(', re.IGNORECASE)
+_label_cache = {}
+
+
+def statement_label(sql):
+    """Short, low-cardinality label for a SQL statement"""
+    label = _label_cache.get(sql)
+    if label is None:
+        text = sql.decode() if isinstance(sql, bytes) else sql
+        text = _WHITESPACE.sub(' ', text).strip()
+        out_params = _OUT_PARAMS.match(text)
+        call = _CALL.match(text)
+        if out_params:
+            label = f"OUT {out_params.group(1)}"
+        elif call:
+            label = f"CALL {call.group(1)}"
+        else:
+            label = _PLACEHOLDER_LIST.sub('(...)', text)[:120]
+        if len(_label_cache) < 2000:
+            _label_cache[sql] = label
+    return label
+
+
+def describe_params(params):
+    """
+    Bind parameters as their count and types only. The values include
+    passwords and identity numbers, so they are never logged.
+    """
+    if params is None:
+        return 'none'
+    if isinstance(params, dict):
+        params = list(params.values())
+    elif not isinstance(params, (list, tuple)):
+        params = [params]
+    return f"{len(params)} ({', '.join(type(value).__name__ for value in params)})"
+
+
+def observe_query(label, phase, elapsed, params=None):
+    DB_QUERY_SECONDS.observe(elapsed, current_endpoint.get(), label, phase)
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        slow_query_log.warning(
+            "slow query %.1fms endpoint=%s phase=%s statement=%s params=%s",
+            elapsed * 1000, current_endpoint.get(), phase, label, describe_params(params)
+        )
+
+
+class InstrumentedResult:
+    """Times fetches from a procedure result set"""
+
+    def __init__(self, result, label):
+        self._result = result
+        self._label = label
+
+    def __getattr__(self, name):
+        return getattr(self._result, name)
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._result.fetchall()
+        observe_query(self._label, 'fetch', time.perf_counter() - started)
+        return rows
+
+
+class InstrumentedCursor:
+    """Cursor proxy recording execute, callproc and fetch latency"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._label = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._cursor.close()
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        self._label = statement_label(operation)
+        if kwargs.get('multi'):
+            return self._execute_multi(operation, params, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            observe_query(self._label, 'execute', time.perf_counter() - started, params)
+
+    def _execute_multi(self, operation, params, *args, **kwargs):
+        """Results of multi=True arrive as they are iterated, so time the whole iteration"""
+        started = time.perf_counter()
+        try:
+            yield from self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            observe_query(self._label, 'execute', time.perf_counter() - started, params)
+
+    def executemany(self, operation, seq_params):
+        self._label = statement_label(operation)
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params)
+        finally:
+            observe_query(self._label, 'execute', time.perf_counter() - started)
+
+    def callproc(self, procname, args=()):
+        self._label = f"CALL {procname}"
+        started = time.perf_counter()
+        try:
+            return self._cursor.callproc(procname, args)
+        finally:
+            observe_query(self._label, 'execute', time.perf_counter() - started, args)
+
+    def stored_results(self):
+        label = f"RESULTS {self._label[5:]}" if self._label and self._label.startswith('CALL ') else 'RESULTS'
+        for result in self._cursor.stored_results():
+            yield InstrumentedResult(result, label)
+
+    def fetchone(self):
+        return self._timed_fetch(self._cursor.fetchone)
+
+    def fetchmany(self, *args, **kwargs):
+        return self._timed_fetch(self._cursor.fetchmany, *args, **kwargs)
+
+    def fetchall(self):
+        return self._timed_fetch(self._cursor.fetchall)
+
+    def _timed_fetch(self, fetch, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fetch(*args, **kwargs)
+        finally:
+            observe_query(self._label or '-', 'fetch', time.perf_counter() - started)
+
+
+def instrument_cursor(cursor):
+    return InstrumentedCursor(cursor) if METRICS_ENABLED else cursor
+
+
+def render(gauges=None):
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    for name, (help_text, value) in (gauges or {}).items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+from decimal import Decimal, InvalidOperation
+
+from mysql.connector import Error
+
+from db import get_db_connection
+
+# Seconds between checks of exchange_rates for changes
+RATES_CHECK_INTERVAL = float(os.environ.get('RATES_CHECK_INTERVAL', 5))
+
+RATES_VERSION_SQL = "SELECT MAX(updated_at), COUNT(*) FROM exchange_rates"
+RATES_SQL = "SELECT from_currency, to_currency, rate, updated_at FROM exchange_rates"
+
+
+class RateUnavailable(LookupError):
+    """No exchange rate is configured for a currency pair"""
+
+
+def rates_version(max_updated_at, count):
+    """Version string for a set of rates; changes whenever a row is added, removed or updated"""
+    if max_updated_at is None:
+        return f"empty-{count}"
+    return f"{max_updated_at:%Y%m%d%H%M%S%f}-{count}"
+
+
+class RateService:
+    """
+    Keeps every exchange rate in memory.
+
+    At most once per `check_interval`, one cheap MAX(updated_at)/COUNT(*)
+    query checks whether exchange_rates changed, and only then are the rates
+    reloaded. Readers always see a complete (rates, version) pair, and the
+    version is recorded on each international transaction. The database is
+    never read while account rows are locked.
+    """
+
+    def __init__(self, check_interval=RATES_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._state = ({}, None)
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def refresh(self, force=False, conn=None):
+        """
+        Reload the rates if the table changed since the last check. A caller
+        that already holds a connection passes it as `conn` rather than
+        borrowing a second one; it must have no uncommitted writes, since the
+        check commits.
+        """
+        now = time.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        # Only one thread checks; the rest keep using the current rates
+        if not self._lock.acquire(blocking=force or self._checked_at is None):
+            return
+        try:
+            self._reload_if_changed(conn)
+            self._checked_at = now
+        except Error:
+            if self._checked_at is None:
+                raise
+            # Keep serving the last known rates; try again next interval
+            self._checked_at = now
+        finally:
+            self._lock.release()
+
+    def _reload_if_changed(self, conn=None):
+        own_conn = conn is None
+        if own_conn:
+            conn = get_db_connection()
+            if not conn:
+                raise Error(msg='Database connection failed')
+        try:
+            cursor = conn.cursor()
+            cursor.execute(RATES_VERSION_SQL)
+            max_updated_at, count = cursor.fetchone()
+            if rates_version(max_updated_at, count) != self._state[1]:
+                cursor.execute(RATES_SQL)
+                rows = cursor.fetchall()
+                rates = {(from_curr, to_curr): rate for from_curr, to_curr, rate, _ in rows}
+                latest = max((updated_at for *_, updated_at in rows), default=None)
+                self._state = (rates, rates_version(latest, len(rows)))
+            conn.commit()
+            cursor.close()
+        finally:
+            if own_conn:
+                conn.close()
+
+    def snapshot(self, conn=None):
+        """({(from, to): rate}, version); `conn` is as in refresh()"""
+        self.refresh(conn=conn)
+        return self._state
+
+    def get(self, from_currency, to_currency, conn=None):
+        """(rate, version) for one pair; raises RateUnavailable if none is configured"""
+        rates, version = self.snapshot(conn)
+        return lookup_rate(rates, from_currency, to_currency), version
+
+    def bulk_update(self, conn, updates):
+        """
+        Insert or replace many rates in one statement and one short transaction.
+
+        Transfers never read exchange_rates while holding account locks, so
+        they are not blocked by this write. The new rates are picked up
+        straight away in this process and within `check_interval` in others.
+        """
+        rows = []
+        for update in updates:
+            from_currency = str(update.get('from_currency') or '').upper()
+            to_currency = str(update.get('to_currency') or '').upper()
+            try:
+                rate = Decimal(str(update.get('rate')))
+            except (InvalidOperation, ValueError):
+                raise ValueError(f"Invalid rate for {from_currency} to {to_currency}")
+            if len(from_currency) != 3 or len(to_currency) != 3 or from_currency == to_currency:
+                raise ValueError(f"Invalid currency pair {from_currency} to {to_currency}")
+            if not rate.is_finite() or rate <= 0:
+                raise ValueError(f"Invalid rate for {from_currency} to {to_currency}")
+            rows.append((from_currency, to_currency, rate))
+        if not rows:
+            return 0
+
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(
+                "INSERT INTO exchange_rates (from_currency, to_currency, rate) VALUES (%s, %s, %s) "
+                "ON DUPLICATE KEY UPDATE rate = VALUES(rate)",
+                rows
+            )
+            conn.commit()
+        except Error:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+        self.refresh(force=True, conn=conn)
+        return len(rows)
+
+
+def lookup_rate(rates, from_currency, to_currency):
+    if from_currency == to_currency:
+        return Decimal('1')
+    try:
+        return rates[(from_currency, to_currency)]
+    except KeyError:
+        raise RateUnavailable(f"No exchange rate from {from_currency} to {to_currency}")
+
+
+rate_service = RateService()
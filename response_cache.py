@@ -0,0 +1,128 @@
+"""
+Per-user cache of the customer dashboard reads.
+
+Each user has a version that is bumped by any write in this process that
+touches one of their accounts or loans. Serialized responses are kept in an
+LRU keyed by (user, request) and served while the user's version is
+unchanged, for at most RESPONSE_CACHE_TTL seconds. The TTL bounds how long
+a write made outside this process (batch jobs, other app processes) can go
+unseen. A repeat read served from the cache runs no query and encodes no
+JSON.
+
+Every response carries an ETag computed from its body, so a browser that
+already has the current body gets 304 Not Modified, even after the entry
+was rebuilt.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# Serialized responses kept across all users
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 10_000))
+# Seconds a cached response is served without a write being seen
+RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', 30))
+
+CachedResponse = namedtuple('CachedResponse', ['version', 'read_at', 'etag', 'body'])
+
+
+class ResponseCache:
+    """
+    LRU of serialized responses, invalidated per user by version.
+
+    A response is stored with the version and time read before its queries
+    ran, so a write that commits while a response is being built makes that
+    response stale rather than letting it be served after the write.
+    """
+
+    def __init__(self, max_size=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        # user_id -> (version, bumped_at); dropped once older than the TTL,
+        # when every entry stored before the bump has expired anyway
+        self._versions = {}
+        self._counter = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def snapshot(self, user_id):
+        """(version, time) to pass to put() for a response about to be built"""
+        with self._lock:
+            return self._versions.get(user_id, (0, 0.0))[0], time.monotonic()
+
+    def get(self, user_id, key):
+        """The cached response, or None if missing, stale or expired"""
+        with self._lock:
+            entry = self._entries.get((user_id, key))
+            if entry is not None:
+                current = self._versions.get(user_id, (0, 0.0))[0]
+                if entry.version == current and time.monotonic() - entry.read_at < self.ttl:
+                    self._entries.move_to_end((user_id, key))
+                    self._hits += 1
+                    return entry
+                del self._entries[(user_id, key)]
+            self._misses += 1
+            return None
+
+    def put(self, user_id, key, snapshot, body):
+        """Cache `body` (bytes) unless the user's version moved since `snapshot`"""
+        version, read_at = snapshot
+        entry = CachedResponse(version, read_at, hashlib.blake2b(body, digest_size=12).hexdigest(), body)
+        with self._lock:
+            if self._versions.get(user_id, (0, 0.0))[0] == version:
+                self._entries[(user_id, key)] = entry
+                self._entries.move_to_end((user_id, key))
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def bump(self, user_ids):
+        """Mark every cached response of these users stale"""
+        now = time.monotonic()
+        with self._lock:
+            self._counter += 1
+            for user_id in user_ids:
+                if user_id is not None:
+                    self._versions[user_id] = (self._counter, now)
+            if self._counter % 1000 == 0:
+                self._versions = {
+                    user_id: (version, bumped_at) for user_id, (version, bumped_at) in self._versions.items()
+                    if now - bumped_at < self.ttl
+                }
+
+    def changed_within(self, user_id, seconds):
+        """True if the user's data was changed by a write in the last `seconds`"""
+        with self._lock:
+            bumped_at = self._versions.get(user_id, (0, None))[1]
+        return bumped_at is not None and time.monotonic() - bumped_at < seconds
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'users_versioned': len(self._versions),
+                'hits': self._hits,
+                'misses': self._misses
+            }
+
+
+def owners(conn, table, column, values):
+    """user_ids owning the accounts or loans whose `column` is in `values`"""
+    values = sorted(set(values))
+    if not values:
+        return set()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            f"SELECT DISTINCT user_id FROM {table} WHERE {column} IN ({', '.join(['%s'] * len(values))})",
+            values
+        )
+        return {row[0] for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+
+response_cache = ResponseCache()
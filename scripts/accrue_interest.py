@@ -0,0 +1,242 @@
+"""
+End-of-day interest accrual for savings accounts.
+
+    python -m scripts.accrue_interest                          # today, 4 workers
+    python -m scripts.accrue_interest --date 2024-03-31 --workers 8 --rate 3.5
+
+The account_id range is split into one shard per worker process. Each worker
+walks its shard in chunks of --chunk accounts, and each chunk is one
+transaction:
+
+  - the chunk's active savings accounts are locked
+  - interest on each closing balance is computed: balance * rate / 365 / 100,
+    rounded half-up to paise
+  - all credits are applied with one UPDATE
+  - the interest deposits and the interest_accruals rows are inserted with
+    multi-row INSERTs
+
+interest_accruals is unique on (account_id, business_date), and accounts
+already accrued for the date are skipped. A rerun for the same date, after
+a crash or by mistake, therefore never credits an account twice. Run the job
+once the day's activity has finished: the balance at the time the chunk is
+processed is taken as the closing balance.
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from datetime import date, datetime
+from decimal import ROUND_HALF_UP, Decimal
+
+import mysql.connector
+from mysql.connector import errorcode
+
+from db import DB_CONFIG
+from hot_accounts import fold_slots
+
+# Annual savings interest rate, in percent
+SAVINGS_INTEREST_RATE = Decimal(os.environ.get('SAVINGS_INTEREST_RATE', '3.5'))
+DAYS_PER_YEAR = 365
+CENTS = Decimal('0.01')
+
+# Deadlocks, lock waits, and a duplicate accrual written by a concurrent run
+RETRYABLE_ERRORS = (errorcode.ER_LOCK_DEADLOCK, errorcode.ER_LOCK_WAIT_TIMEOUT, errorcode.ER_DUP_ENTRY)
+
+ACCOUNTS_SQL = """
+    SELECT account_id, balance, currency, balance_slots
+    FROM accounts
+    WHERE account_id > %s AND account_id <= %s AND account_type = 'savings' AND status = 'active'
+    ORDER BY account_id
+    LIMIT %s
+    FOR UPDATE
+"""
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM-DD, got {value!r}")
+
+
+def daily_interest(balance, rate):
+    return (balance * rate / (DAYS_PER_YEAR * 100)).quantize(CENTS, rounding=ROUND_HALF_UP)
+
+
+def shard_ranges(conn, shards):
+    """Split [MIN(account_id), MAX(account_id)] into `shards` half-open (low, high] ranges"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT MIN(account_id), MAX(account_id) FROM accounts")
+    low, high = cursor.fetchone()
+    cursor.close()
+    if low is None:
+        return []
+    low -= 1
+    size = -(-(high - low) // shards)
+    return [(start, min(start + size, high)) for start in range(low, high, size)]
+
+
+def accrue_chunk(conn, business_date, rate, after, upto, chunk_size):
+    """Accrue one chunk; returns (last account_id seen, accounts read, accounts credited, total credited)"""
+    cursor = conn.cursor(dictionary=True)
+    try:
+        conn.start_transaction()
+        cursor.execute(ACCOUNTS_SQL, (after, upto, chunk_size))
+        accounts = cursor.fetchall()
+        if not accounts:
+            conn.commit()
+            return upto, 0, 0, Decimal('0')
+        ids = [row['account_id'] for row in accounts]
+
+        # Checked after the locks are held, so a concurrent run's commits are seen
+        cursor.execute(
+            f"SELECT account_id FROM interest_accruals "
+            f"WHERE business_date = %s AND account_id IN ({', '.join(['%s'] * len(ids))})",
+            [business_date] + ids
+        )
+        accrued = {row['account_id'] for row in cursor.fetchall()}
+
+        # Hot accounts: the closing balance includes the credits still in their slots
+        folded = fold_slots(cursor, [row['account_id'] for row in accounts if row['balance_slots']])
+        for row in accounts:
+            row['balance'] += folded.get(row['account_id'], 0)
+
+        accruals = []
+        credits = {}
+        deposits = []
+        for row in accounts:
+            if row['account_id'] in accrued:
+                continue
+            amount = daily_interest(row['balance'], rate)
+            # Zero accruals are recorded too, so the account counts as done for the date
+            accruals.append((row['account_id'], business_date, row['balance'], rate, amount))
+            if amount > 0:
+                credits[row['account_id']] = amount
+                deposits.append((row['account_id'], amount, row['currency'], f"Interest for {business_date}"))
+
+        if credits:
+            cursor.execute(
+                f"UPDATE accounts SET balance = balance + CASE account_id "
+                f"{' '.join(['WHEN %s THEN %s'] * len(credits))} END "
+                f"WHERE account_id IN ({', '.join(['%s'] * len(credits))})",
+                [value for item in credits.items() for value in item] + list(credits)
+            )
+            cursor.executemany(
+                "INSERT INTO transactions (to_account, transaction_type, amount, currency, description) "
+                "VALUES (%s, 'deposit', %s, %s, %s)",
+                deposits
+            )
+        if accruals:
+            cursor.executemany(
+                "INSERT INTO interest_accruals (account_id, business_date, balance, rate, amount) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                accruals
+            )
+        conn.commit()
+        last = ids[-1] if len(ids) == chunk_size else upto
+        return last, len(ids), len(credits), sum(credits.values(), Decimal('0'))
+    except mysql.connector.Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def run_shard(shard, low, high, business_date, rate, chunk_size, progress):
+    """Worker process: accrue every chunk in (low, high] and report to `progress`"""
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        after = low
+        while after < high:
+            for attempt in range(3):
+                try:
+                    result = accrue_chunk(conn, business_date, rate, after, high, chunk_size)
+                    break
+                except mysql.connector.Error as e:
+                    if e.errno not in RETRYABLE_ERRORS or attempt == 2:
+                        progress.put((shard, 'error', str(e)))
+                        return
+            after, read, credited, total = result
+            progress.put((shard, 'chunk', (after, read, credited, total)))
+        progress.put((shard, 'done', None))
+    finally:
+        conn.close()
+
+
+def accrue(business_date, rate, workers, chunk_size):
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        ranges = shard_ranges(conn, workers)
+    finally:
+        conn.close()
+
+    progress = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=run_shard,
+                                args=(shard, low, high, business_date, rate, chunk_size, progress))
+        for shard, (low, high) in enumerate(ranges)
+    ]
+    for process in processes:
+        process.start()
+
+    started = time.perf_counter()
+    totals = {shard: [0, 0, Decimal('0')] for shard in range(len(ranges))}
+    failed = {}
+    running = set(totals)
+    while running:
+        try:
+            shard, kind, payload = progress.get(timeout=1)
+        except queue.Empty:
+            # A worker that died without reporting (e.g. killed) is not waited for
+            for shard, process in enumerate(processes):
+                if shard in running and not process.is_alive() and progress.empty():
+                    running.discard(shard)
+                    failed[shard] = f"worker exited with code {process.exitcode}"
+            continue
+        low, high = ranges[shard]
+        if kind == 'chunk':
+            after, read, credited, total = payload
+            totals[shard][0] += read
+            totals[shard][1] += credited
+            totals[shard][2] += total
+            elapsed = time.perf_counter() - started
+            done = (after - low) / (high - low) * 100
+            print(f"  shard {shard} ({low + 1}-{high}): {done:5.1f}%  {totals[shard][0]:,} accounts, "
+                  f"{totals[shard][1]:,} credited ({totals[shard][0] / elapsed:,.0f} accounts/s)")
+        else:
+            running.discard(shard)
+            if kind == 'error':
+                failed[shard] = payload
+                print(f"  shard {shard} ({low + 1}-{high}) failed: {payload}")
+
+    for process in processes:
+        process.join()
+    return totals, failed, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--date', type=parse_date, default=date.today(),
+                        help='business date as YYYY-MM-DD (default: today)')
+    parser.add_argument('--rate', type=Decimal, default=SAVINGS_INTEREST_RATE,
+                        help='annual savings interest rate in percent')
+    parser.add_argument('--workers', type=int, default=4, help='worker processes (one shard each)')
+    parser.add_argument('--chunk', type=int, default=5000, help='accounts per transaction')
+    args = parser.parse_args(argv)
+
+    totals, failed, elapsed = accrue(args.date, args.rate, args.workers, args.chunk)
+    accounts = sum(read for read, _, _ in totals.values())
+    credited = sum(count for _, count, _ in totals.values())
+    interest = sum((total for _, _, total in totals.values()), Decimal('0'))
+    print(f"Interest for {args.date}: {accounts:,} savings accounts, {credited:,} credited, "
+          f"₹{interest:,} in total, in {elapsed:.1f}s ({accounts / elapsed if elapsed else 0:,.0f} accounts/s)")
+    if failed:
+        print(f"{len(failed)} shard(s) failed; run the same command again to finish them")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
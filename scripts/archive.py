@@ -0,0 +1,317 @@
+"""
+Maintain the monthly partitions of transactions and archive closed months.
+
+    python -m scripts.archive                       # archive months older than 12 months
+    python -m scripts.archive --keep-months 6 --dry-run
+    python -m scripts.archive --partitions-only     # only add the coming months' partitions
+
+transactions is range-partitioned by month (pYYYYMM, plus a catch-all
+pmax). Run this job monthly, for example from cron. Each run does two things:
+
+  1. It makes sure partitions exist for the next --ahead months, by
+     splitting pmax, so new rows never land in pmax. If the lowest partition
+     holds rows from earlier months (a new install, or imported history),
+     those rows are split out into monthly partitions first.
+
+  2. It archives each month older than --keep-months that still has a
+     partition, oldest first. The month is exported to
+     ARCHIVE_DIR/YYYY-MM.parquet (zstd-compressed, see transaction_archive.py
+     for the layout). The file is read back and its row count and amounts
+     are checked against MySQL. The month is then added to manifest.json,
+     and from that moment the app serves it from the file. Only after that is
+     the partition dropped, which is instant and writes no undo log.
+
+If the job stops part-way, run it again. A month already in the manifest is
+not exported again; its partition is dropped only if it still holds exactly
+the rows that were archived. Rows inserted into an archived month later
+(scripts.bulk_import refuses them, but a manual INSERT does not) are never
+dropped. The app does not show them either, and the job reports them.
+
+DROP PARTITION fires no triggers, so account_rollups keeps the totals of
+archived months and balances are unaffected.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+import mysql.connector
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from db import DB_CONFIG
+from transaction_archive import ARCHIVE_SCHEMA, month_key, next_month, transaction_archive
+
+EXPORT_BATCH = 50_000
+# Rows per Parquet row group; one account's history is read a row group at a time
+ROW_GROUP_SIZE = 64 * 1024
+
+PARTITIONS_SQL = """
+    SELECT PARTITION_NAME
+    FROM information_schema.PARTITIONS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'transactions'
+    ORDER BY PARTITION_ORDINAL_POSITION
+"""
+
+# One row per account and side, sorted for the archive layout
+EXPORT_SQL = """
+    SELECT account_id, type, other_account_id, other_account, transaction_id, transaction_type, amount, fee,
+           currency, description, transaction_date, status, exchange_rate, rate_version
+    FROM (
+        SELECT t.from_account as account_id, 'Debit' as type, t.to_account as other_account_id,
+               a.account_number as other_account, t.transaction_id, t.transaction_type, t.amount, t.fee,
+               t.currency, t.description, t.transaction_date, t.status, t.exchange_rate, t.rate_version
+        FROM transactions PARTITION ({partition}) t
+        LEFT JOIN accounts a ON a.account_id = t.to_account
+        WHERE t.from_account IS NOT NULL
+        UNION ALL
+        SELECT t.to_account, 'Credit', t.from_account, a.account_number, t.transaction_id, t.transaction_type,
+               t.amount, t.fee, t.currency, t.description, t.transaction_date, t.status, t.exchange_rate,
+               t.rate_version
+        FROM transactions PARTITION ({partition}) t
+        LEFT JOIN accounts a ON a.account_id = t.from_account
+        WHERE t.to_account IS NOT NULL
+    ) sides
+    ORDER BY account_id, transaction_date, transaction_id, type DESC
+"""
+
+# What the file must match, and what the manifest records for the month
+PARTITION_TOTALS_SQL = """
+    SELECT
+        COUNT(*) as transactions,
+        COALESCE(SUM(from_account IS NOT NULL) + SUM(to_account IS NOT NULL), 0) as file_rows,
+        COALESCE(SUM(amount * ((from_account IS NOT NULL) + (to_account IS NOT NULL))), 0) as file_amount,
+        COALESCE(SUM(status = 'completed'), 0) as completed_count,
+        COALESCE(SUM(CASE WHEN status = 'completed' THEN amount ELSE 0 END), 0) as completed_amount,
+        MIN(transaction_id) as min_transaction_id,
+        MAX(transaction_id) as max_transaction_id,
+        MIN(transaction_date) as first_date,
+        MAX(transaction_date) as last_date
+    FROM transactions PARTITION ({partition})
+"""
+
+
+def partition_name(month):
+    return f"p{month:%Y%m}"
+
+
+def partition_month(name):
+    return datetime(int(name[1:5]), int(name[5:7]), 1)
+
+
+def add_months(month, count):
+    """The first day of the month `count` months after (or before) `month`"""
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def monthly_partitions(first, last):
+    """Partition definitions for every month from `first` to `last` inclusive"""
+    definitions = []
+    month = first
+    while month <= last:
+        definitions.append(f"PARTITION {partition_name(month)} VALUES LESS THAN "
+                           f"(UNIX_TIMESTAMP('{next_month(month):%Y-%m-%d}'))")
+        month = next_month(month)
+    return definitions
+
+
+def list_partitions(cursor):
+    cursor.execute(PARTITIONS_SQL)
+    names = [row[0] for row in cursor.fetchall()]
+    if not names or names[0] is None:
+        raise SystemExit("transactions is not partitioned; run `python -m scripts.migrate` first")
+    return names
+
+
+def ensure_partitions(conn, ahead, dry_run=False):
+    """Split pmax (and a lowest partition spanning several months) into monthly partitions"""
+    cursor = conn.cursor()
+    try:
+        names = list_partitions(cursor)
+        months = [partition_month(name) for name in names if name != 'pmax']
+        cursor.execute(f"SELECT MIN(transaction_date) FROM transactions PARTITION ({names[0]})")
+        earliest = cursor.fetchone()[0]
+        earliest = earliest.replace(day=1, hour=0, minute=0, second=0, microsecond=0) if earliest else None
+        this_month = datetime.combine(date.today().replace(day=1), datetime.min.time())
+        last = add_months(this_month, ahead)
+
+        statements = []
+        if not months:
+            first = min(earliest, this_month) if earliest else this_month
+            definitions = monthly_partitions(first, last) + ["PARTITION pmax VALUES LESS THAN MAXVALUE"]
+            statements.append(f"ALTER TABLE transactions REORGANIZE PARTITION pmax INTO ({', '.join(definitions)})")
+        else:
+            if earliest and earliest < months[0]:
+                statements.append(
+                    f"ALTER TABLE transactions REORGANIZE PARTITION {names[0]} "
+                    f"INTO ({', '.join(monthly_partitions(earliest, months[0]))})"
+                )
+            if months[-1] < last:
+                definitions = (monthly_partitions(next_month(months[-1]), last)
+                               + ["PARTITION pmax VALUES LESS THAN MAXVALUE"])
+                statements.append(
+                    f"ALTER TABLE transactions REORGANIZE PARTITION pmax INTO ({', '.join(definitions)})"
+                )
+
+        for statement in statements:
+            print(statement)
+            if not dry_run:
+                cursor.execute(statement)
+        return len(statements)
+    finally:
+        cursor.close()
+
+
+def partition_totals(conn, partition):
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(PARTITION_TOTALS_SQL.format(partition=partition))
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+
+
+def export_month(conn, month, directory):
+    """
+    Write one month to its Parquet file from a consistent snapshot.
+    Returns the manifest entry; raises if the file does not match MySQL.
+    """
+    partition = partition_name(month)
+    filename = f"{month_key(month)}.parquet"
+    path = os.path.join(directory, filename)
+    temp_path = path + '.tmp'
+    os.makedirs(directory, exist_ok=True)
+
+    conn.start_transaction(consistent_snapshot=True, readonly=True)
+    try:
+        totals = partition_totals(conn, partition)
+        if totals['first_date'] and (totals['first_date'] < month or totals['last_date'] >= next_month(month)):
+            raise SystemExit(f"{partition} holds rows outside {month_key(month)}; "
+                             f"run `python -m scripts.archive --partitions-only` first")
+
+        cursor = conn.cursor()
+        writer = pq.ParquetWriter(temp_path, ARCHIVE_SCHEMA, compression='zstd')
+        try:
+            cursor.execute(EXPORT_SQL.format(partition=partition))
+            while True:
+                rows = cursor.fetchmany(EXPORT_BATCH)
+                if not rows:
+                    break
+                columns = list(zip(*rows))
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(values, type=field.type) for values, field in zip(columns, ARCHIVE_SCHEMA)],
+                    schema=ARCHIVE_SCHEMA
+                ), row_group_size=ROW_GROUP_SIZE)
+        finally:
+            writer.close()
+            cursor.close()
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    # Read the file back before anything depends on it
+    table = pq.read_table(temp_path, columns=['amount'])
+    file_amount = pc.sum(table['amount']).as_py() or Decimal('0')
+    if table.num_rows != totals['file_rows'] or file_amount != totals['file_amount']:
+        os.remove(temp_path)
+        raise SystemExit(f"{filename} does not match {partition}: {table.num_rows} rows / {file_amount} written, "
+                         f"{totals['file_rows']} rows / {totals['file_amount']} expected")
+    os.replace(temp_path, path)
+
+    return {
+        'file': filename,
+        'rows': table.num_rows,
+        'transactions': totals['transactions'],
+        'completed_count': int(totals['completed_count']),
+        'completed_amount': str(totals['completed_amount']),
+        'min_transaction_id': totals['min_transaction_id'],
+        'max_transaction_id': totals['max_transaction_id'],
+        'archived_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def drop_archived_partition(conn, month, entry, dry_run=False):
+    """Drop a month's partition if it still holds exactly the archived rows"""
+    partition = partition_name(month)
+    totals = partition_totals(conn, partition)
+    if (totals['transactions'], totals['min_transaction_id'], totals['max_transaction_id']) != (
+            entry['transactions'], entry['min_transaction_id'], entry['max_transaction_id']):
+        print(f"  {partition} changed after {month_key(month)} was archived "
+              f"({totals['transactions']} rows now, {entry['transactions']} archived); not dropped")
+        return False
+    statement = f"ALTER TABLE transactions DROP PARTITION {partition}"
+    if dry_run:
+        print(statement)
+        return False
+    cursor = conn.cursor()
+    try:
+        cursor.execute(statement)
+    finally:
+        cursor.close()
+    return True
+
+
+def archive(conn, keep_months, dry_run=False):
+    """Archive and drop every month older than `keep_months`, oldest first"""
+    cursor = conn.cursor()
+    try:
+        names = list_partitions(cursor)
+    finally:
+        cursor.close()
+
+    this_month = datetime.combine(date.today().replace(day=1), datetime.min.time())
+    cutoff = add_months(this_month, -keep_months)
+    months = transaction_archive.read_manifest()
+    archived = 0
+
+    for name in names:
+        if name == 'pmax' or partition_month(name) >= cutoff:
+            break
+        month = partition_month(name)
+        key = month_key(month)
+        if key not in months:
+            if dry_run:
+                print(f"would export {key} to {os.path.join(transaction_archive.directory, key + '.parquet')}")
+                continue
+            started = time.perf_counter()
+            months[key] = export_month(conn, month, transaction_archive.directory)
+            transaction_archive.write_manifest(months)
+            print(f"  {key}: {months[key]['transactions']:,} transactions exported "
+                  f"in {time.perf_counter() - started:.1f}s")
+        if drop_archived_partition(conn, month, months[key], dry_run):
+            archived += 1
+            print(f"  {key}: partition {name} dropped")
+    return archived
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--keep-months', type=int, default=12,
+                        help='closed months kept in MySQL, besides the current one')
+    parser.add_argument('--ahead', type=int, default=3, help='future months to create partitions for')
+    parser.add_argument('--partitions-only', action='store_true', help='only create partitions')
+    parser.add_argument('--dry-run', action='store_true', help='print what would be done')
+    args = parser.parse_args(argv)
+
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        split = ensure_partitions(conn, args.ahead, args.dry_run)
+        print(f"{split} partition change(s)")
+        if args.partitions_only:
+            return 0
+        dropped = archive(conn, args.keep_months, args.dry_run)
+        print(f"{dropped} month(s) archived and dropped")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,517 @@
+"""
+Bulk-load users, accounts and historical transactions from CSV files.
+
+    python -m scripts.bulk_import users legacy/users.csv
+    python -m scripts.bulk_import accounts legacy/accounts.csv --method load-data
+    python -m scripts.bulk_import transactions legacy/transactions.csv --batch 20000
+
+Expected CSV columns (header row required, extra columns are ignored):
+
+    users         email, password, full_name, phone, address, date_of_birth,
+                  aadhar_number, pan_number [, created_at]
+    accounts      email, account_type [, account_number, balance, status, created_at]
+    transactions  from_account_number, to_account_number, transaction_type, amount
+                  [, fee, currency, description, transaction_date, status]
+
+Rows are validated and normalised in Python with the same rules as
+register_user, create_account and the BEFORE INSERT triggers, then loaded in
+large batches with multi-row INSERTs (or LOAD DATA LOCAL INFILE with
+--method load-data). Accounts are matched to users by email and transactions
+to accounts by account number, so the files can be loaded one after another.
+Imported transactions are history only: account balances come from the
+accounts file.
+
+Invalid rows are written, with the reason, to <file>.rejects.csv. Progress is
+committed to the import_checkpoints table in the same transaction as each
+batch, so an interrupted import resumes where it stopped when run again
+(--restart starts over).
+"""
+import argparse
+import csv
+import os
+import re
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+import mysql.connector
+
+from account_numbers import reserve_account_numbers
+from db import DB_CONFIG
+from transaction_archive import transaction_archive
+
+CHECKPOINT_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS import_checkpoints (
+        source VARCHAR(255) PRIMARY KEY,
+        rows_done BIGINT NOT NULL DEFAULT 0,
+        rows_loaded BIGINT NOT NULL DEFAULT 0,
+        rows_rejected BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+"""
+
+PHONE_RE = re.compile(r'^[0-9]{10,15}$')
+AADHAR_RE = re.compile(r'^[0-9]{12}$')
+PAN_RE = re.compile(r'^[A-Z]{5}[0-9]{4}[A-Z]$')
+ACCOUNT_NUMBER_RE = re.compile(r'^VIT[0-9]{13}$')
+SEPARATORS = re.compile(r'[\s-]')
+
+ACCOUNT_TYPES = ('savings', 'current', 'international')
+ACCOUNT_STATUSES = ('pending', 'active', 'suspended', 'closed')
+TRANSACTION_TYPES = ('deposit', 'withdrawal', 'transfer', 'international_transfer')
+TRANSACTION_STATUSES = ('completed', 'failed', 'pending')
+CENTS = Decimal('0.01')
+MAX_AMOUNT = Decimal('9999999999999.99')  # DECIMAL(15, 2)
+MAX_FEE = Decimal('99999999.99')          # DECIMAL(10, 2)
+
+
+class RowError(ValueError):
+    """A row that cannot be loaded; the message goes to the rejects file"""
+
+
+def required(row, column, max_length=None):
+    value = (row.get(column) or '').strip()
+    if not value:
+        raise RowError(f"{column} is required")
+    if max_length and len(value) > max_length:
+        raise RowError(f"{column} is longer than {max_length} characters")
+    return value
+
+
+def parse_date(value, column):
+    try:
+        return datetime.strptime(value.strip(), '%Y-%m-%d').date()
+    except ValueError:
+        raise RowError(f"{column} must be YYYY-MM-DD")
+
+
+def parse_timestamp(value, column):
+    """Optional timestamp column; blank means now, like the column default"""
+    value = (value or '').strip()
+    if not value:
+        return datetime.now().replace(microsecond=0)
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    raise RowError(f"{column} must be YYYY-MM-DD[ HH:MM:SS]")
+
+
+def parse_money(value, column, default=None, maximum=MAX_AMOUNT):
+    value = (value or '').strip()
+    if not value:
+        if default is None:
+            raise RowError(f"{column} is required")
+        return default
+    try:
+        amount = Decimal(value).quantize(CENTS, rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        raise RowError(f"{column} is not a number")
+    if amount < 0 or amount > maximum:
+        raise RowError(f"{column} is out of range")
+    return amount
+
+
+def age_on(dob, today):
+    """Whole years, as TIMESTAMPDIFF(YEAR, dob, CURDATE()) counts them"""
+    return today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
+
+
+class Importer:
+    """Shared batch loop: read, validate, load, checkpoint"""
+
+    kind = None
+    table = None
+    columns = ()
+
+    def __init__(self, conn, args):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.args = args
+        self.source = f"{self.kind}:{os.path.abspath(args.file)}"
+
+    # Subclasses turn a batch of (line, row) pairs into value tuples
+    def prepare(self, batch):
+        raise NotImplementedError
+
+    def run(self):
+        self.cursor.execute(CHECKPOINT_TABLE_SQL)
+        if self.args.restart:
+            self.cursor.execute("DELETE FROM import_checkpoints WHERE source = %s", (self.source,))
+        self.conn.commit()
+        done, loaded, rejected = self.load_checkpoint()
+        if done:
+            print(f"Resuming after row {done:,} ({loaded:,} loaded, {rejected:,} rejected so far)")
+
+        rejects_path = self.args.rejects or self.args.file + '.rejects.csv'
+        started = time.perf_counter()
+        session_rows = 0
+
+        with open(self.args.file, newline='', encoding='utf-8-sig') as source, \
+                open(rejects_path, 'a' if done else 'w', newline='', encoding='utf-8') as rejects_file:
+            reader = csv.DictReader(source)
+            rejects = csv.writer(rejects_file)
+            if not done:
+                rejects.writerow(['line'] + list(reader.fieldnames or []) + ['error'])
+
+            batch = []
+            for index, row in enumerate(reader, start=1):
+                if index <= done:
+                    continue
+                batch.append((reader.line_num, row))
+                if len(batch) >= self.args.batch:
+                    done, loaded, rejected = self.flush(batch, done, loaded, rejected, rejects, reader.fieldnames)
+                    session_rows += len(batch)
+                    batch = []
+                    self.progress(done, loaded, rejected, session_rows, started)
+            if batch:
+                done, loaded, rejected = self.flush(batch, done, loaded, rejected, rejects, reader.fieldnames)
+                session_rows += len(batch)
+            self.progress(done, loaded, rejected, session_rows, started)
+        print()
+        if rejected:
+            print(f"{rejected:,} row(s) rejected; see {rejects_path}")
+        return loaded, rejected
+
+    def flush(self, batch, done, loaded, rejected, rejects, fieldnames):
+        """Validate and load one batch, committing the checkpoint with it"""
+        try:
+            values, errors = self.prepare(batch)
+            if values:
+                self.load(values)
+            done += len(batch)
+            loaded += len(values)
+            rejected += len(errors)
+            self.cursor.execute(
+                "INSERT INTO import_checkpoints (source, rows_done, rows_loaded, rows_rejected) "
+                "VALUES (%s, %s, %s, %s) ON DUPLICATE KEY UPDATE rows_done = VALUES(rows_done), "
+                "rows_loaded = VALUES(rows_loaded), rows_rejected = VALUES(rows_rejected)",
+                (self.source, done, loaded, rejected)
+            )
+            self.conn.commit()
+        except mysql.connector.Error:
+            self.conn.rollback()
+            raise
+
+        for line, row, message in errors:
+            rejects.writerow([line] + [row.get(name, '') for name in fieldnames] + [message])
+        return done, loaded, rejected
+
+    def load(self, values):
+        if self.args.method == 'load-data':
+            self.load_data(values)
+            return
+        placeholders = ', '.join(['%s'] * len(self.columns))
+        self.cursor.executemany(
+            f"INSERT INTO {self.table} ({', '.join(self.columns)}) VALUES ({placeholders})",
+            values
+        )
+
+    def load_data(self, values):
+        """Write the batch to a temporary file and LOAD DATA it in one statement"""
+        with tempfile.NamedTemporaryFile('w', suffix='.tsv', delete=False, encoding='utf-8') as f:
+            for row in values:
+                f.write('\t'.join(load_data_value(value) for value in row))
+                f.write('\n')
+            path = f.name
+        try:
+            self.cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE {self.table} CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({', '.join(self.columns)})",
+                (path,)
+            )
+            if self.cursor.rowcount != len(values):
+                raise mysql.connector.Error(
+                    msg=f"LOAD DATA loaded {self.cursor.rowcount} of {len(values)} rows")
+        finally:
+            os.unlink(path)
+
+    def load_checkpoint(self):
+        self.cursor.execute(
+            "SELECT rows_done, rows_loaded, rows_rejected FROM import_checkpoints WHERE source = %s",
+            (self.source,)
+        )
+        row = self.cursor.fetchone()
+        return tuple(row) if row else (0, 0, 0)
+
+    def lookup(self, sql, keys):
+        """Run `sql` with an IN list of `keys` (chunked) and return all rows"""
+        keys = list(keys)
+        rows = []
+        for start in range(0, len(keys), 1000):
+            chunk = keys[start:start + 1000]
+            self.cursor.execute(sql.format(in_list=', '.join(['%s'] * len(chunk))), chunk)
+            rows.extend(self.cursor.fetchall())
+        return rows
+
+    def progress(self, done, loaded, rejected, session_rows, started):
+        elapsed = time.perf_counter() - started
+        rate = session_rows / elapsed if elapsed else 0
+        sys.stdout.write(f"\r  {self.kind}: {done:,} rows read, {loaded:,} loaded, "
+                         f"{rejected:,} rejected ({rate:,.0f} rows/s)")
+        sys.stdout.flush()
+
+
+class UserImporter(Importer):
+    """Mirrors register_user and the phone/Aadhar/PAN triggers"""
+
+    kind = 'users'
+    table = 'users'
+    columns = ('email', 'password', 'full_name', 'phone', 'address', 'date_of_birth',
+               'aadhar_number', 'pan_number', 'created_at')
+
+    def __init__(self, conn, args):
+        super().__init__(conn, args)
+        # Keys seen earlier in this file; MySQL compares them case-insensitively
+        self.seen = set()
+        self.today = date.today()
+
+    def normalise(self, row):
+        email = required(row, 'email', 100)
+        password = required(row, 'password', 255)
+        full_name = required(row, 'full_name', 100)
+        address = required(row, 'address')
+        phone = SEPARATORS.sub('', row.get('phone') or '')
+        aadhar = SEPARATORS.sub('', row.get('aadhar_number') or '')
+        pan = (row.get('pan_number') or '').strip().upper()
+        dob = parse_date(required(row, 'date_of_birth'), 'date_of_birth')
+
+        if age_on(dob, self.today) < 18:
+            raise RowError('User must be at least 18 years old')
+        if not PHONE_RE.match(phone):
+            raise RowError('Invalid phone number format')
+        if not AADHAR_RE.match(aadhar):
+            raise RowError('Aadhar number must be exactly 12 digits')
+        if not PAN_RE.match(pan):
+            raise RowError('Invalid PAN format (Must be: ABCDE1234F)')
+        return (email, password, full_name, phone, address, dob, aadhar, pan,
+                parse_timestamp(row.get('created_at'), 'created_at'))
+
+    def prepare(self, batch):
+        candidates, errors = [], []
+        for line, row in batch:
+            try:
+                candidates.append((line, row, self.normalise(row)))
+            except RowError as e:
+                errors.append((line, row, str(e)))
+
+        existing = set()
+        if candidates:
+            emails = {values[0] for _, _, values in candidates}
+            aadhars = {values[6] for _, _, values in candidates}
+            pans = {values[7] for _, _, values in candidates}
+            for column, keys in (('email', emails), ('aadhar_number', aadhars), ('pan_number', pans)):
+                rows = self.lookup(f"SELECT {column} FROM users WHERE {column} IN ({{in_list}})", keys)
+                existing.update((column, value.casefold()) for (value,) in rows)
+
+        values = []
+        for line, row, user in candidates:
+            keys = {('email', user[0].casefold()), ('aadhar_number', user[6]), ('pan_number', user[7].casefold())}
+            if keys & existing or keys & self.seen:
+                errors.append((line, row, 'User with this email, Aadhar, or PAN already exists'))
+                continue
+            self.seen.update(keys)
+            values.append(user)
+        return values, errors
+
+
+class AccountImporter(Importer):
+    """Mirrors create_account; legacy account numbers are kept when well-formed"""
+
+    kind = 'accounts'
+    table = 'accounts'
+    columns = ('user_id', 'account_number', 'account_type', 'balance', 'currency',
+               'status', 'created_at', 'approved_at')
+
+    def __init__(self, conn, args):
+        super().__init__(conn, args)
+        self.seen_numbers = set()
+
+    def normalise(self, row):
+        email = required(row, 'email', 100)
+        account_type = required(row, 'account_type').lower()
+        if account_type not in ACCOUNT_TYPES:
+            raise RowError(f"account_type must be one of {', '.join(ACCOUNT_TYPES)}")
+        number = (row.get('account_number') or '').strip().upper() or None
+        if number and not ACCOUNT_NUMBER_RE.match(number):
+            raise RowError('account_number must be VIT followed by 13 digits')
+        status = (row.get('status') or 'pending').strip().lower()
+        if status not in ACCOUNT_STATUSES:
+            raise RowError(f"status must be one of {', '.join(ACCOUNT_STATUSES)}")
+        return {
+            'email': email,
+            'account_type': account_type,
+            'account_number': number,
+            'balance': parse_money(row.get('balance'), 'balance', default=Decimal('0.00')),
+            'currency': 'USD' if account_type == 'international' else 'INR',
+            'status': status,
+            'created_at': parse_timestamp(row.get('created_at'), 'created_at')
+        }
+
+    def prepare(self, batch):
+        candidates, errors = [], []
+        for line, row in batch:
+            try:
+                candidates.append((line, row, self.normalise(row)))
+            except RowError as e:
+                errors.append((line, row, str(e)))
+        if not candidates:
+            return [], errors
+
+        users = {}
+        for user_id, email, is_active in self.lookup(
+                "SELECT user_id, email, is_active FROM users WHERE email IN ({in_list})",
+                {account['email'] for _, _, account in candidates}):
+            users[email.casefold()] = (user_id, is_active)
+        taken = {number for (number,) in self.lookup(
+            "SELECT account_number FROM accounts WHERE account_number IN ({in_list})",
+            {account['account_number'] for _, _, account in candidates if account['account_number']})}
+
+        values, needs_number = [], []
+        for line, row, account in candidates:
+            user = users.get(account['email'].casefold())
+            if not user or not user[1]:
+                errors.append((line, row, 'User not found or inactive'))
+                continue
+            number = account['account_number']
+            if number and (number in taken or number in self.seen_numbers):
+                errors.append((line, row, 'account_number already exists'))
+                continue
+            if number:
+                self.seen_numbers.add(number)
+            else:
+                needs_number.append(len(values))
+            approved_at = account['created_at'] if account['status'] == 'active' else None
+            values.append([user[0], number, account['account_type'], account['balance'], account['currency'],
+                           account['status'], account['created_at'], approved_at])
+
+        for index, number in zip(needs_number, self.new_numbers(len(needs_number))):
+            values[index][1] = number
+        return [tuple(value) for value in values], errors
+
+    def new_numbers(self, count):
+        """
+        A block of numbers from the account number sequence. Sequence numbers
+        never repeat, but one may match a legacy number, so those are skipped.
+        """
+        numbers = []
+        while len(numbers) < count:
+            block = [n for n in reserve_account_numbers(self.conn, count - len(numbers))
+                     if n not in self.seen_numbers]
+            taken = {number for (number,) in self.lookup(
+                "SELECT account_number FROM accounts WHERE account_number IN ({in_list})", block)}
+            numbers.extend(n for n in block if n not in taken)
+        self.seen_numbers.update(numbers)
+        return numbers
+
+
+class TransactionImporter(Importer):
+    """Historical ledger rows; the rollup trigger still runs for each one"""
+
+    kind = 'transactions'
+    table = 'transactions'
+    columns = ('from_account', 'to_account', 'transaction_type', 'amount', 'fee', 'currency',
+               'description', 'transaction_date', 'status')
+
+    def normalise(self, row):
+        from_number = (row.get('from_account_number') or '').strip().upper() or None
+        to_number = (row.get('to_account_number') or '').strip().upper() or None
+        trans_type = required(row, 'transaction_type').lower()
+        if trans_type not in TRANSACTION_TYPES:
+            raise RowError(f"transaction_type must be one of {', '.join(TRANSACTION_TYPES)}")
+        if trans_type == 'deposit' and not to_number:
+            raise RowError('A deposit needs to_account_number')
+        if trans_type == 'withdrawal' and not from_number:
+            raise RowError('A withdrawal needs from_account_number')
+        if trans_type in ('transfer', 'international_transfer') and not (from_number and to_number):
+            raise RowError('A transfer needs both account numbers')
+        amount = parse_money(row.get('amount'), 'amount')
+        if amount == 0:
+            raise RowError('Invalid amount')
+        status = (row.get('status') or 'completed').strip().lower()
+        if status not in TRANSACTION_STATUSES:
+            raise RowError(f"status must be one of {', '.join(TRANSACTION_STATUSES)}")
+        currency = (row.get('currency') or 'INR').strip().upper()
+        if len(currency) != 3:
+            raise RowError('currency must be a 3-letter code')
+        transaction_date = parse_timestamp(row.get('transaction_date'), 'transaction_date')
+        live_since = transaction_archive.current().live_since
+        if live_since and transaction_date < live_since:
+            # Its partition is gone and the month is served from the archive file
+            raise RowError(f"transaction_date is in an archived month (before {live_since:%Y-%m-%d})")
+        return {
+            'from_number': from_number,
+            'to_number': to_number,
+            'values': [None, None, trans_type, amount,
+                       parse_money(row.get('fee'), 'fee', default=Decimal('0.00'), maximum=MAX_FEE),
+                       currency, (row.get('description') or '').strip() or None,
+                       transaction_date, status]
+        }
+
+    def prepare(self, batch):
+        candidates, errors = [], []
+        for line, row in batch:
+            try:
+                candidates.append((line, row, self.normalise(row)))
+            except RowError as e:
+                errors.append((line, row, str(e)))
+        if not candidates:
+            return [], errors
+
+        numbers = {n for _, _, t in candidates for n in (t['from_number'], t['to_number']) if n}
+        accounts = dict((number, account_id) for account_id, number in self.lookup(
+            "SELECT account_id, account_number FROM accounts WHERE account_number IN ({in_list})", numbers))
+
+        values = []
+        for line, row, trans in candidates:
+            missing = [n for n in (trans['from_number'], trans['to_number']) if n and n not in accounts]
+            if missing:
+                errors.append((line, row, f"Account {missing[0]} not found"))
+                continue
+            trans['values'][0] = accounts.get(trans['from_number'])
+            trans['values'][1] = accounts.get(trans['to_number'])
+            values.append(tuple(trans['values']))
+        return values, errors
+
+
+IMPORTERS = {importer.kind: importer for importer in (UserImporter, AccountImporter, TransactionImporter)}
+
+
+def load_data_value(value):
+    """Field text for LOAD DATA's default escaping (NULL is \\N)"""
+    if value is None:
+        return '\\N'
+    text = str(value)
+    return text.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('kind', choices=list(IMPORTERS))
+    parser.add_argument('file', help='CSV file with a header row')
+    parser.add_argument('--batch', type=int, default=5000, help='rows per batch (and per commit)')
+    parser.add_argument('--method', choices=['insert', 'load-data'], default='insert',
+                        help='multi-row INSERT or LOAD DATA LOCAL INFILE')
+    parser.add_argument('--rejects', help='rejects file (default: <file>.rejects.csv)')
+    parser.add_argument('--restart', action='store_true', help='ignore any saved checkpoint')
+    args = parser.parse_args(argv)
+
+    config = dict(DB_CONFIG)
+    if args.method == 'load-data':
+        config['allow_local_infile'] = True
+    conn = mysql.connector.connect(**config)
+    try:
+        started = time.perf_counter()
+        loaded, rejected = IMPORTERS[args.kind](conn, args).run()
+        elapsed = time.perf_counter() - started
+        print(f"Loaded {loaded:,} {args.kind} in {elapsed:.1f}s")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
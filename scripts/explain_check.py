@@ -0,0 +1,225 @@
+"""
+Check the query plans of every query and procedure the app runs.
+
+    python -m benchmarks.datagen --scale medium     # seed a realistic volume first
+    python -m scripts.migrate
+    python -m scripts.explain_check [--verbose] [--min-rows 1000]
+
+Each query is EXPLAINed with parameters taken from the seeded data. The
+command exits with status 1 if any of them reads a table with a full table
+scan (type ALL) or a full index scan (type index) over at least --min-rows
+estimated rows. Queries that must read whole tables (the dashboard totals)
+are listed in the output but not counted.
+
+Procedures cannot be EXPLAINed directly, so the SELECTs inside them are
+repeated here. Keep them in step with database/schema.sql.
+"""
+import argparse
+import sys
+
+import mysql.connector
+
+from admin_listings import (ACCOUNT_SORTS, LOAN_SORTS, build_accounts_query, build_loans_query, parse_account_filters,
+                            parse_loan_filters)
+from app import build_history_query, parse_history_filters
+from audit import build_audit_query
+from db import DB_CONFIG
+from hot_accounts import ACCOUNT_BALANCE_SQL, PENDING_SLOTS_SQL
+from rates import RATES_VERSION_SQL
+from stats import ADMIN_STATS_SQL
+from transaction_archive import BEGINNING
+
+FULL_SCAN_TYPES = ('ALL', 'index')
+
+
+def sample(cursor):
+    """Representative ids: the busiest account and its owner"""
+    cursor.execute("""
+        SELECT a.account_id, a.user_id, a.account_number, a.balance, u.email, u.password, u.full_name
+        FROM account_rollups r
+        JOIN accounts a ON a.account_id = r.account_id
+        JOIN users u ON u.user_id = a.user_id
+        ORDER BY r.transaction_count DESC
+        LIMIT 1
+    """)
+    row = cursor.fetchone()
+    if not row:
+        raise SystemExit("No transactions found; seed data with `python -m benchmarks.datagen` first")
+    cursor.execute("SELECT account_number FROM accounts WHERE account_id <> %s LIMIT 20", (row['account_id'],))
+    row['other_numbers'] = [r['account_number'] for r in cursor.fetchall()]
+    cursor.execute("SELECT COALESCE(MAX(loan_id), 0) as loan_id FROM loans")
+    row['loan_id'] = cursor.fetchone()['loan_id']
+    cursor.execute("SELECT email FROM admin LIMIT 1")
+    row['admin_email'] = cursor.fetchone()['email']
+    cursor.execute("SELECT aadhar_number, pan_number FROM users WHERE user_id = %s", (row['user_id'],))
+    row.update(cursor.fetchone())
+    return row
+
+
+def checked_queries(s):
+    """(name, sql, params, reason a full scan is acceptable or None)"""
+    account_id, user_id = s['account_id'], s['user_id']
+    recipients = s['other_numbers'] or [s['account_number']]
+    lock_ids = [account_id] + list(range(account_id + 1, account_id + 10))
+
+    history_sql, history_params = build_history_query(account_id, {}, limit=51)
+    filtered_sql, filtered_params = build_history_query(
+        account_id, parse_history_filters({'from_date': '2020-01-01', 'type': 'transfer,deposit'}), limit=51)
+    statement_sql, statement_params = build_history_query(account_id, {}, descending=False)
+    audit_sql, audit_params = build_audit_query('account', account_id, limit=101)
+    audit_type_sql, audit_type_params = build_audit_query('account', since='2020-01-01', limit=101)
+
+    # Admin listings: the first page of every sort, a later page, and each kind of search
+    listings = [
+        (f'admin accounts by {sort}', *build_accounts_query({}, sort, limit=51)) for sort in ACCOUNT_SORTS
+    ] + [
+        (f'admin loans by {sort}', *build_loans_query({}, sort, limit=51)) for sort in LOAN_SORTS
+    ]
+    listings += [
+        ('admin accounts (later page)',
+         *build_accounts_query({}, 'balance', after=(s['balance'], account_id), limit=51)),
+        ('admin accounts (pending)', *build_accounts_query(parse_account_filters({'status': 'pending'}), limit=51)),
+        ('admin loans (by type)', *build_loans_query(parse_loan_filters({'loan_type': 'home'}), limit=51)),
+    ]
+    for prefix in (s['account_number'][:8], s['email'].split('@')[0] + '@', s['full_name'][:4]):
+        search = {'q': prefix}
+        listings += [
+            (f'admin accounts search {prefix!r}', *build_accounts_query(parse_account_filters(search), limit=51)),
+            (f'admin loans search {prefix!r}', *build_loans_query(parse_loan_filters(search), limit=51)),
+        ]
+
+    return [
+        ('login', "SELECT user_id, email, full_name, is_active FROM users WHERE email = %s AND password = %s",
+         (s['email'], s['password']), None),
+        ('admin login', "SELECT admin_id, email, full_name FROM admin WHERE email = %s AND password = %s",
+         (s['admin_email'], 'x'), None),
+        ('user accounts', f"""
+            SELECT a.account_id, a.account_number, a.account_type, {ACCOUNT_BALANCE_SQL} as balance,
+                   a.currency, a.status, a.created_at
+            FROM accounts a WHERE a.user_id = %s ORDER BY a.created_at DESC
+         """, (user_id,), None),
+        ('transaction history', history_sql, history_params, None),
+        ('transaction history (filtered)', filtered_sql, filtered_params, None),
+        ('statement ownership', "SELECT account_number FROM accounts WHERE account_id = %s AND user_id = %s",
+         (account_id, user_id), None),
+        ('statement export', statement_sql, statement_params, None),
+        ('transfer recipient',
+         "SELECT account_id, status, account_type, currency FROM accounts WHERE account_number = %s",
+         (recipients[0],), None),
+        ('batch recipients',
+         f"SELECT account_id, account_number FROM accounts "
+         f"WHERE account_number IN ({', '.join(['%s'] * len(recipients))})", recipients, None),
+        ('batch account locks',
+         f"SELECT account_id, user_id, balance, currency, status, account_type FROM accounts "
+         f"WHERE account_id IN ({', '.join(['%s'] * len(lock_ids))}) ORDER BY account_id", lock_ids, None),
+        ('batch transaction ids',
+         "SELECT transaction_id FROM transactions WHERE from_account = %s AND transaction_id >= %s "
+         "ORDER BY transaction_id LIMIT %s", (account_id, 1, 100), None),
+        ('exchange rates version', RATES_VERSION_SQL, (), None),
+        ('bulk approval filter (accounts)',
+         "SELECT account_id FROM accounts WHERE status = 'pending' AND account_type = %s AND created_at < %s "
+         "ORDER BY created_at LIMIT %s", ('savings', '2030-01-01', 10000), None),
+        ('bulk approval filter (loans)',
+         "SELECT loan_id FROM loans WHERE status = 'pending' AND applied_at < %s ORDER BY applied_at LIMIT %s",
+         ('2030-01-01', 10000), None),
+        ('audit log by entity', audit_sql, audit_params, None),
+        ('audit log by type and time', audit_type_sql, audit_type_params, None),
+        ('hot account slots to fold', PENDING_SLOTS_SQL, (), 'only hot accounts have slots'),
+        ('admin stats', ADMIN_STATS_SQL, {'live_since': BEGINNING}, 'whole-table totals, cached by stats.py'),
+
+        # Procedure bodies
+        ('register_user duplicate check',
+         "SELECT COUNT(*) FROM users WHERE email = %s OR aadhar_number = %s OR pan_number = %s",
+         (s['email'], s['aadhar_number'], s['pan_number']), None),
+        ('create_account user check', "SELECT COUNT(*) FROM users WHERE user_id = %s AND is_active = TRUE",
+         (user_id,), None),
+        ('transfer_money/deposit_money account', "SELECT balance, currency, status FROM accounts WHERE account_id = %s",
+         (account_id,), None),
+        ('apply_loan account', "SELECT status FROM accounts WHERE account_id = %s AND user_id = %s",
+         (account_id, user_id), None),
+        ('approve_loan', "SELECT status, loan_amount, account_id FROM loans WHERE loan_id = %s",
+         (s['loan_id'],), None),
+        ('get_user_loans', """
+            SELECT l.loan_id, l.loan_type, l.loan_amount, l.status, a.account_number, l.applied_at
+            FROM loans l
+            JOIN accounts a ON l.account_id = a.account_id
+            WHERE l.user_id = %s
+            ORDER BY l.applied_at DESC
+         """, (user_id,), None),
+        ('get_pending_accounts', """
+            SELECT a.account_id, a.account_number, a.account_type, u.full_name, u.email, u.phone, a.created_at
+            FROM accounts a
+            JOIN users u ON a.user_id = u.user_id
+            WHERE a.status = 'pending'
+            ORDER BY a.created_at DESC
+         """, (), None),
+        ('get_pending_loans', """
+            SELECT l.loan_id, l.loan_type, l.loan_amount, u.full_name, a.account_number, l.applied_at
+            FROM loans l
+            JOIN users u ON l.user_id = u.user_id
+            JOIN accounts a ON l.account_id = a.account_id
+            WHERE l.status = 'pending'
+            ORDER BY l.applied_at DESC
+         """, (), None),
+        ('get_transaction_stats', """
+            SELECT DATE(transaction_date) as date, transaction_type, COUNT(*) as transaction_count,
+                   SUM(amount) as total_amount, AVG(amount) as avg_amount
+            FROM transactions
+            WHERE status = 'completed'
+            GROUP BY DATE(transaction_date), transaction_type
+            HAVING transaction_count > 0
+            ORDER BY date DESC, transaction_count DESC
+         """, (), None),
+    ] + [(name, sql, params, None) for name, sql, params in listings]
+
+
+def full_scans(plan, min_rows):
+    """Plan rows that read a whole table or index"""
+    return [
+        row for row in plan
+        if row['type'] in FULL_SCAN_TYPES
+        and row['table'] and not row['table'].startswith('<')  # derived/union temporary tables
+        and (row['rows'] or 0) >= min_rows
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--min-rows', type=int, default=1000,
+                        help='ignore full scans of tables estimated smaller than this')
+    parser.add_argument('--verbose', action='store_true', help='print every plan')
+    args = parser.parse_args(argv)
+
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        cursor = conn.cursor(dictionary=True)
+        s = sample(cursor)
+        failures = 0
+        for name, sql, params, allowed in checked_queries(s):
+            cursor.execute("EXPLAIN " + sql, params)
+            plan = cursor.fetchall()
+            scans = full_scans(plan, args.min_rows)
+            if scans and not allowed:
+                failures += 1
+                status = 'FULL SCAN'
+            elif scans:
+                status = f"full scan allowed ({allowed})"
+            else:
+                status = 'ok'
+            print(f"{name:<40} {status}")
+            for row in plan if args.verbose else scans:
+                print(f"    {row['table'] or '-':<14} type={row['type'] or '-':<12} key={row['key'] or '-':<32} "
+                      f"rows={row['rows'] or 0:<10} {row['Extra'] or ''}")
+        cursor.close()
+    finally:
+        conn.close()
+
+    if failures:
+        print(f"\n{failures} query plan(s) fall back to a full scan")
+        return 1
+    print("\nAll query plans use indexes")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+Switch hot-account mode on or off, and inspect hot accounts.
+
+    python -m scripts.hot_accounts enable 1234567890123456 --slots 16
+    python -m scripts.hot_accounts disable 1234567890123456
+    python -m scripts.hot_accounts list
+    python -m scripts.hot_accounts consolidate     # fold every slot into its balance now
+
+A hot account takes its credits in --slots balance slots instead of on its
+own row (see hot_accounts.py). Use it for accounts that receive many
+transfers at once, such as merchant or collection accounts. More slots let
+more credits commit in parallel; 8 to 32 suits most accounts. Enabling,
+disabling or changing the slot count first folds the existing slots into
+the balance.
+"""
+import argparse
+import sys
+
+import mysql.connector
+
+from db import DB_CONFIG
+from hot_accounts import ACCOUNT_BALANCE_SQL, SlotConsolidator
+
+MAX_SLOTS = 64
+
+
+def account_id_for(cursor, account_number):
+    cursor.execute("SELECT account_id FROM accounts WHERE account_number = %s", (account_number,))
+    row = cursor.fetchone()
+    if not row:
+        raise SystemExit(f"No account with number {account_number}")
+    return row[0]
+
+
+def set_slots(conn, account_number, slots):
+    cursor = conn.cursor()
+    try:
+        account_id = account_id_for(cursor, account_number)
+        conn.commit()
+        result = cursor.callproc('set_balance_slots', [account_id, slots, None])
+        return result[2]
+    finally:
+        cursor.close()
+
+
+def list_hot(conn):
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(f"""
+            SELECT a.account_number, a.balance_slots, a.balance, {ACCOUNT_BALANCE_SQL} as total_balance
+            FROM accounts a
+            WHERE a.balance_slots > 0
+            ORDER BY a.account_id
+        """)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['enable', 'disable', 'list', 'consolidate'])
+    parser.add_argument('account_number', nargs='?', help='account to enable or disable')
+    parser.add_argument('--slots', type=int, default=16, help=f'balance slots, 1 to {MAX_SLOTS} (default 16)')
+    args = parser.parse_args(argv)
+
+    if args.command in ('enable', 'disable') and not args.account_number:
+        parser.error(f"{args.command} needs an account number")
+    if args.command == 'enable' and not 1 <= args.slots <= MAX_SLOTS:
+        parser.error(f"--slots must be between 1 and {MAX_SLOTS}")
+
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        if args.command in ('enable', 'disable'):
+            print(set_slots(conn, args.account_number, args.slots if args.command == 'enable' else 0))
+        elif args.command == 'consolidate':
+            folded = SlotConsolidator(connect=lambda: mysql.connector.connect(**DB_CONFIG)).consolidate()
+            print(f"Folded the slots of {folded} account(s)")
+        else:
+            rows = list_hot(conn)
+            for row in rows:
+                print(f"{row['account_number']}  {row['balance_slots']:>3} slots  "
+                      f"balance {row['total_balance']:>15,}  ({row['total_balance'] - row['balance']:,} in slots)")
+            if not rows:
+                print("No hot accounts")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+Apply numbered schema migrations from database/migrations to a live database.
+
+Usage:
+    python -m scripts.migrate               # apply every pending migration
+    python -m scripts.migrate status        # list applied and pending migrations
+    python -m scripts.migrate --dry-run     # print the statements without running them
+
+Migrations are files named NNN_description.sql and run in order. Applied
+versions are recorded in schema_migrations. Statements are split on `;`, and
+DELIMITER lines are honoured, so procedures and triggers can be (re)created
+the same way as in schema.sql.
+
+Migrations must be safe to re-run. MySQL has no IF NOT EXISTS for indexes,
+so "already exists" and "does not exist" errors from CREATE/ALTER/DROP are
+treated as already applied. A migration that fails part-way can therefore
+simply be run again after the cause is fixed.
+"""
+import argparse
+import hashlib
+import os
+import re
+import sys
+
+import mysql.connector
+
+from db import DB_CONFIG
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'migrations')
+MIGRATION_FILE = re.compile(r'^(\d+)_[\w-]+\.sql$')
+
+MIGRATIONS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version VARCHAR(100) PRIMARY KEY,
+        checksum CHAR(64) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# Errors meaning the change is already in place
+ALREADY_APPLIED = {
+    1050,  # table already exists
+    1060,  # duplicate column name
+    1061,  # duplicate key name
+    1091,  # can't drop a column or key that does not exist
+    1359,  # trigger already exists
+    1826,  # duplicate foreign key constraint name
+}
+
+
+def discover(directory=MIGRATIONS_DIR):
+    """(version, path) for every migration file, in order"""
+    found = []
+    for name in os.listdir(directory):
+        match = MIGRATION_FILE.match(name)
+        if match:
+            found.append((int(match.group(1)), name[:-len('.sql')], os.path.join(directory, name)))
+    found.sort()
+    numbers = [number for number, _, _ in found]
+    if len(numbers) != len(set(numbers)):
+        raise SystemExit(f"Duplicate migration numbers in {directory}")
+    return [(version, path) for _, version, path in found]
+
+
+def split_statements(sql):
+    """Split a script into statements, honouring DELIMITER and skipping comments"""
+    statements = []
+    delimiter = ';'
+    current = []
+    for line in sql.splitlines():
+        stripped = line.strip()
+        if stripped.upper().startswith('DELIMITER '):
+            delimiter = stripped.split(None, 1)[1]
+            continue
+        if not current and (not stripped or stripped.startswith('--')):
+            continue
+        current.append(line)
+        if stripped.endswith(delimiter):
+            statement = '\n'.join(current).strip()
+            statements.append(statement[:-len(delimiter)].strip())
+            current = []
+    if '\n'.join(current).strip():
+        statements.append('\n'.join(current).strip())
+    return statements
+
+
+def checksum(sql):
+    return hashlib.sha256(sql.encode('utf-8')).hexdigest()
+
+
+def applied_versions(cursor):
+    """{version: (checksum, applied_at)} from schema_migrations"""
+    cursor.execute(MIGRATIONS_TABLE_SQL)
+    cursor.execute("SELECT version, checksum, applied_at FROM schema_migrations")
+    return {version: (digest, applied_at) for version, digest, applied_at in cursor.fetchall()}
+
+
+def apply(conn, version, sql, dry_run=False):
+    """Run one migration; DDL auto-commits, so it is recorded at the end"""
+    cursor = conn.cursor()
+    try:
+        for statement in split_statements(sql):
+            if dry_run:
+                print(statement + ';\n')
+                continue
+            try:
+                cursor.execute(statement)
+            except mysql.connector.Error as e:
+                if e.errno not in ALREADY_APPLIED:
+                    raise
+                print(f"  skipped (already applied): {e.msg}")
+        if not dry_run:
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, checksum) VALUES (%s, %s) "
+                "ON DUPLICATE KEY UPDATE checksum = VALUES(checksum), applied_at = CURRENT_TIMESTAMP",
+                (version, checksum(sql))
+            )
+            conn.commit()
+    finally:
+        cursor.close()
+
+
+def migrate(conn, dry_run=False):
+    cursor = conn.cursor()
+    applied = applied_versions(cursor)
+    cursor.close()
+
+    count = 0
+    for version, path in discover():
+        with open(path, encoding='utf-8') as f:
+            sql = f.read()
+        if version in applied:
+            # Versions folded into schema.sql are recorded without a checksum
+            if applied[version][0] and applied[version][0] != checksum(sql):
+                print(f"warning: {version} has changed since it was applied")
+            continue
+        print(f"Applying {version}")
+        apply(conn, version, sql, dry_run)
+        count += 1
+    return count
+
+
+def status(conn):
+    cursor = conn.cursor()
+    applied = applied_versions(cursor)
+    cursor.close()
+
+    pending = 0
+    for version, _ in discover():
+        if version in applied:
+            print(f"  applied  {version}  ({applied[version][1]:%Y-%m-%d %H:%M:%S})")
+        else:
+            print(f"  pending  {version}")
+            pending += 1
+    return pending
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', nargs='?', choices=['up', 'status'], default='up')
+    parser.add_argument('--dry-run', action='store_true', help='print pending statements without running them')
+    args = parser.parse_args(argv)
+
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        if args.command == 'status':
+            pending = status(conn)
+            print(f"{pending} pending migration(s)")
+            return 0
+
+        count = migrate(conn, args.dry_run)
+        print(f"{count} migration(s) {'pending' if args.dry_run else 'applied'}")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
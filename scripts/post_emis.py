@@ -0,0 +1,265 @@
+"""
+Post the EMIs due by a month for every disbursed loan.
+
+    python -m scripts.post_emis                      # installments due this month
+    python -m scripts.post_emis --month 2024-03 --chunk 2000
+
+Installment k of a loan falls due in the k-th month after the month it was
+disbursed (approved_at). Every installment from 1 up to the one due in the
+posting month (or the loan's last) that has no loan_payments row yet is
+due, so installments missed in earlier months are posted as soon as they
+can be. For each chunk of loans, the schedules are computed together with
+amortisation.amortise(). The chunk is then posted in one short transaction:
+
+  - the loan accounts are locked in account_id order
+  - each loan's missing installments are posted oldest first
+  - every balance is updated with one UPDATE
+  - the withdrawal transactions and the loan_payments rows are inserted with
+    multi-row INSERTs
+  - loans with all tenure_months installments posted are closed
+
+A loan's installments stop at the first one that is skipped, because the
+account is not active or its balance does not cover the payment; those
+left unposted are counted and retried on the next run. Loans past their
+tenure with installments still unposted are listed in the report. Running
+the job again for the same month posts only what is still missing, so a job
+that stopped part-way is resumed simply by running it again. loan_payments
+is unique on (loan_id, installment_no), so no installment can be posted
+twice, even by two jobs at once.
+"""
+import argparse
+import sys
+import time
+from collections import Counter
+from datetime import date
+
+import mysql.connector
+from mysql.connector import errorcode
+
+from amortisation import amortise, emi_cents, installments, monthly_rate_micros, to_cents
+from audit import INSERT_SQL as AUDIT_INSERT_SQL, status_change_rows
+from db import DB_CONFIG
+from hot_accounts import fold_slots
+
+RETRYABLE_ERRORS = (errorcode.ER_LOCK_DEADLOCK, errorcode.ER_LOCK_WAIT_TIMEOUT)
+
+LOANS_SQL = """
+    SELECT loan_id, account_id, loan_amount, interest_rate, tenure_months, monthly_emi, approved_at
+    FROM loans
+    WHERE status = 'disbursed' AND approved_at IS NOT NULL AND loan_id > %s
+    ORDER BY loan_id
+    LIMIT %s
+"""
+
+
+def parse_month(value):
+    try:
+        year, month = value.split('-')
+        return date(int(year), int(month), 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM, got {value!r}")
+
+
+def installment_due(approved_at, period):
+    """Number of the installment that falls due in `period`'s month"""
+    return (period.year - approved_at.year) * 12 + period.month - approved_at.month
+
+
+def compute_schedule(loans):
+    """Amortisation schedules of a chunk of loans, up to the last installment due"""
+    principal = [to_cents(loan['loan_amount']) for loan in loans]
+    rates = monthly_rate_micros([loan['interest_rate'] for loan in loans])
+    tenures = [loan['tenure_months'] for loan in loans]
+    fallback = emi_cents(principal, rates, tenures)
+    emi = [to_cents(loan['monthly_emi']) if loan['monthly_emi'] is not None else int(fallback[i])
+           for i, loan in enumerate(loans)]
+    return amortise(principal, rates, emi, tenures, months=max(loan['due_through'] for loan in loans))
+
+
+def post_chunk(conn, loans):
+    """
+    Post the missing installments of one chunk of loans in one transaction.
+    Returns (outcome counts, [(loan_id, installments unposted)] of loans in
+    arrears past their tenure).
+    """
+    outcomes = Counter()
+    overdue = []
+    schedule = compute_schedule(loans)
+    account_ids = sorted({loan['account_id'] for loan in loans})
+    cursor = conn.cursor(dictionary=True)
+    try:
+        conn.start_transaction()
+        # Lock before checking what is posted, so a concurrent run is seen
+        cursor.execute(
+            f"SELECT account_id, balance, currency, status, balance_slots FROM accounts "
+            f"WHERE account_id IN ({', '.join(['%s'] * len(account_ids))}) "
+            f"ORDER BY account_id FOR UPDATE",
+            account_ids
+        )
+        accounts = {row['account_id']: row for row in cursor.fetchall()}
+        # A hot account's payment can use the credits still in its slots
+        folded = fold_slots(cursor, [acc_id for acc_id, row in accounts.items() if row['balance_slots']])
+        for acc_id, amount in folded.items():
+            accounts[acc_id]['balance'] += amount
+
+        loan_ids = [loan['loan_id'] for loan in loans]
+        cursor.execute(
+            f"SELECT loan_id, installment_no FROM loan_payments "
+            f"WHERE loan_id IN ({', '.join(['%s'] * len(loan_ids))})",
+            loan_ids
+        )
+        posted = {}
+        for row in cursor.fetchall():
+            posted.setdefault(row['loan_id'], set()).add(row['installment_no'])
+
+        missing = []
+        for loan in loans:
+            numbers = posted.get(loan['loan_id'], set())
+            missing.append([n for n in range(1, loan['due_through'] + 1) if n not in numbers])
+        rows = [i for i, numbers in enumerate(missing) for _ in numbers]
+        amounts = iter(installments(schedule, [n for numbers in missing for n in numbers], rows))
+
+        balances = {}
+        transactions = []
+        payments = []
+        closed = []
+        for loan, numbers in zip(loans, missing):
+            loan_id, account_id = loan['loan_id'], loan['account_id']
+            loan_amounts = [next(amounts) for _ in numbers]
+            if not numbers:
+                outcomes['already posted'] += 1
+            account = accounts.get(account_id)
+            unposted = 0
+            for k, (number, (payment, principal, interest, remaining)) in enumerate(zip(numbers, loan_amounts)):
+                if not account or account['status'] != 'active':
+                    unposted = len(numbers) - k
+                    outcomes['skipped: account not active'] += unposted
+                    break
+                balance = balances.get(account_id, account['balance'])
+                if balance < payment:
+                    unposted = len(numbers) - k
+                    outcomes['skipped: insufficient balance'] += unposted
+                    break
+                balances[account_id] = balance - payment
+                transactions.append((account_id, payment, account['currency'],
+                                     f"EMI {number}/{loan['tenure_months']} - Loan ID: {loan_id}"))
+                payments.append((loan_id, number, payment, principal, interest, remaining))
+                outcomes['posted'] += 1
+
+            if unposted:
+                outcomes['loans in arrears'] += 1
+                if loan['installment_no'] > loan['tenure_months']:
+                    overdue.append((loan_id, unposted))
+            if len(posted.get(loan_id, ())) + len(numbers) - unposted == loan['tenure_months']:
+                closed.append(loan_id)
+
+        if balances:
+            cursor.execute(
+                f"UPDATE accounts SET balance = CASE account_id "
+                f"{' '.join(['WHEN %s THEN %s'] * len(balances))} END "
+                f"WHERE account_id IN ({', '.join(['%s'] * len(balances))})",
+                [value for item in balances.items() for value in item] + list(balances)
+            )
+            cursor.executemany(
+                "INSERT INTO transactions (from_account, transaction_type, amount, currency, description) "
+                "VALUES (%s, 'withdrawal', %s, %s, %s)",
+                transactions
+            )
+            cursor.executemany(
+                "INSERT INTO loan_payments (loan_id, installment_no, payment_amount, principal_amount, "
+                "interest_amount, remaining_balance) VALUES (%s, %s, %s, %s, %s, %s)",
+                payments
+            )
+        if closed:
+            cursor.execute(
+                f"UPDATE loans SET status = 'closed' WHERE loan_id IN ({', '.join(['%s'] * len(closed))})",
+                closed
+            )
+            # Written in this transaction rather than through the buffered writer
+            cursor.executemany(AUDIT_INSERT_SQL, status_change_rows('loan', closed, 'disbursed', 'closed'))
+        conn.commit()
+        outcomes['loans closed'] += len(closed)
+        outcomes['loans in arrears past tenure'] += len(overdue)
+        return outcomes, overdue
+    except mysql.connector.Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def post_month(conn, period, chunk_size):
+    """Post every loan's installments due by `period`; returns (outcome counts, loans in arrears past tenure)"""
+    outcomes = Counter()
+    overdue = []
+    started = time.perf_counter()
+    scanned = 0
+    last_id = 0
+    cursor = conn.cursor(dictionary=True)
+    try:
+        while True:
+            cursor.execute(LOANS_SQL, (last_id, chunk_size))
+            rows = cursor.fetchall()
+            conn.commit()
+            if not rows:
+                break
+            last_id = rows[-1]['loan_id']
+            scanned += len(rows)
+
+            due = []
+            for row in rows:
+                row['installment_no'] = installment_due(row['approved_at'], period)
+                if row['installment_no'] < 1:
+                    outcomes['not yet due'] += 1
+                else:
+                    row['due_through'] = min(row['installment_no'], row['tenure_months'])
+                    due.append(row)
+
+            if due:
+                for attempt in range(3):
+                    try:
+                        chunk_outcomes, chunk_overdue = post_chunk(conn, due)
+                        outcomes.update(chunk_outcomes)
+                        overdue.extend(chunk_overdue)
+                        break
+                    except mysql.connector.Error as e:
+                        if e.errno not in RETRYABLE_ERRORS or attempt == 2:
+                            raise
+
+            elapsed = time.perf_counter() - started
+            rate = scanned / elapsed if elapsed else 0
+            sys.stdout.write(f"\r  {scanned:,} loans scanned, {outcomes['posted']:,} installments posted "
+                             f"({rate:,.0f} loans/s)")
+            sys.stdout.flush()
+    finally:
+        cursor.close()
+    print()
+    return outcomes, overdue
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--month', type=parse_month, default=date.today().replace(day=1),
+                        help='posting month as YYYY-MM (default: this month)')
+    parser.add_argument('--chunk', type=int, default=2000, help='loans per transaction')
+    args = parser.parse_args(argv)
+
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        started = time.perf_counter()
+        outcomes, overdue = post_month(conn, args.month, args.chunk)
+        elapsed = time.perf_counter() - started
+        print(f"EMIs for {args.month:%Y-%m} done in {elapsed:.1f}s")
+        for outcome, count in sorted(outcomes.items()):
+            print(f"  {outcome:<32} {count:>10,}")
+        if overdue:
+            print("Loans past tenure with installments unposted:")
+            for loan_id, unposted in overdue:
+                print(f"  loan {loan_id:<10} {unposted:>4} installments")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""
+Rebuild or verify the account_rollups table against the raw ledger.
+
+Usage:
+    python -m scripts.rollups verify            # report accounts that disagree
+    python -m scripts.rollups rebuild           # recompute every rollup row
+    python -m scripts.rollups rebuild --account 42
+
+A hot account's rollups are spread over several rows (one per balance
+slot, see hot_accounts.py); they are summed before comparing, and a rebuild
+writes each account's totals back as a single row.
+
+Archived months (see scripts/archive.py) are no longer in transactions, so
+their totals are read from the archive files and added to the ledger's.
+"""
+import argparse
+import sys
+
+import mysql.connector
+
+from db import DB_CONFIG
+from transaction_archive import BEGINNING, transaction_archive
+
+# Ledger totals per account, computed the same way the trigger maintains them
+LEDGER_TOTALS_SQL = """
+    SELECT
+        account_id,
+        SUM(transaction_count) as transaction_count,
+        SUM(total_credits) as total_credits,
+        SUM(total_debits) as total_debits,
+        MAX(last_activity) as last_activity
+    FROM (
+        SELECT from_account as account_id, COUNT(*) as transaction_count,
+               0 as total_credits, SUM(amount) as total_debits,
+               MAX(transaction_date) as last_activity
+        FROM transactions
+        WHERE from_account IS NOT NULL AND transaction_date >= %s {from_filter}
+        GROUP BY from_account
+        UNION ALL
+        SELECT to_account, SUM(from_account IS NULL OR from_account <> to_account),
+               SUM(amount), 0, MAX(transaction_date)
+        FROM transactions
+        WHERE to_account IS NOT NULL AND transaction_date >= %s {to_filter}
+        GROUP BY to_account
+    ) ledger
+    GROUP BY account_id
+"""
+
+
+# Adds archived totals to the rollups written from the live ledger
+ADD_ARCHIVED_SQL = """
+    INSERT INTO account_rollups (account_id, transaction_count, total_credits, total_debits, last_activity)
+    VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        transaction_count = transaction_count + VALUES(transaction_count),
+        total_credits = total_credits + VALUES(total_credits),
+        total_debits = total_debits + VALUES(total_debits),
+        last_activity = GREATEST(COALESCE(last_activity, VALUES(last_activity)), VALUES(last_activity))
+"""
+ROLLUP_COLUMNS = ('transaction_count', 'total_credits', 'total_debits', 'last_activity')
+
+
+def ledger_totals_sql(live_since, account_id=None):
+    """Ledger aggregate query over the live months, optionally limited to one account"""
+    if account_id is None:
+        return LEDGER_TOTALS_SQL.format(from_filter='', to_filter=''), [live_since, live_since]
+    return (
+        LEDGER_TOTALS_SQL.format(from_filter='AND from_account = %s', to_filter='AND to_account = %s'),
+        [live_since, account_id, live_since, account_id]
+    )
+
+
+def add_archived(totals, archived_totals):
+    """Add archived per-account totals into ledger totals keyed by account_id"""
+    for acc_id, archived in archived_totals.items():
+        total = totals.setdefault(acc_id, {'account_id': acc_id, 'transaction_count': 0, 'total_credits': 0,
+                                           'total_debits': 0, 'last_activity': None})
+        for column in ('transaction_count', 'total_credits', 'total_debits'):
+            total[column] += archived[column]
+        total['last_activity'] = max(filter(None, (total['last_activity'], archived['last_activity'])),
+                                     default=None)
+    return totals
+
+
+def verify(conn, account_id=None):
+    """Compare rollups with the ledger inside one consistent snapshot"""
+    cursor = conn.cursor(dictionary=True)
+    try:
+        archived = transaction_archive.current()
+        conn.start_transaction(consistent_snapshot=True, readonly=True)
+
+        sql, params = ledger_totals_sql(archived.live_since or BEGINNING, account_id)
+        cursor.execute(sql, params)
+        expected = {row['account_id']: row for row in cursor.fetchall()}
+        add_archived(expected, archived.account_totals(account_id))
+
+        cursor.execute(
+            "SELECT account_id, SUM(transaction_count) as transaction_count, SUM(total_credits) as total_credits, "
+            "SUM(total_debits) as total_debits, MAX(last_activity) as last_activity FROM account_rollups"
+            + ("" if account_id is None else " WHERE account_id = %s") + " GROUP BY account_id",
+            () if account_id is None else (account_id,)
+        )
+        actual = {row['account_id']: row for row in cursor.fetchall()}
+        conn.commit()
+    finally:
+        cursor.close()
+
+    mismatches = []
+    for acc_id in sorted(set(expected) | set(actual)):
+        want = expected.get(acc_id)
+        have = actual.get(acc_id)
+        for column in ROLLUP_COLUMNS:
+            want_value = want[column] if want else (None if column == 'last_activity' else 0)
+            have_value = have[column] if have else (None if column == 'last_activity' else 0)
+            if want_value != have_value:
+                mismatches.append((acc_id, column, want_value, have_value))
+    return mismatches
+
+
+def rebuild(conn, account_id=None):
+    """Recompute rollups from the ledger in a single transaction"""
+    archived = transaction_archive.current()
+    archived_totals = archived.account_totals(account_id)
+    cursor = conn.cursor()
+    try:
+        conn.start_transaction()
+        sql, params = ledger_totals_sql(archived.live_since or BEGINNING, account_id)
+        if account_id is None:
+            cursor.execute("DELETE FROM account_rollups")
+        else:
+            cursor.execute("DELETE FROM account_rollups WHERE account_id = %s", (account_id,))
+        cursor.execute(
+            "INSERT INTO account_rollups "
+            "(account_id, transaction_count, total_credits, total_debits, last_activity) " + sql,
+            params
+        )
+        rows = cursor.rowcount
+        if archived_totals:
+            cursor.executemany(ADD_ARCHIVED_SQL, [
+                (acc_id,) + tuple(totals[column] for column in ROLLUP_COLUMNS)
+                for acc_id, totals in sorted(archived_totals.items())
+            ])
+        conn.commit()
+        return rows
+    except mysql.connector.Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['verify', 'rebuild'])
+    parser.add_argument('--account', type=int, help='limit to one account_id')
+    args = parser.parse_args(argv)
+
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        if args.command == 'rebuild':
+            rows = rebuild(conn, args.account)
+            print(f"Rebuilt {rows} rollup row(s)")
+            return 0
+
+        mismatches = verify(conn, args.account)
+        for acc_id, column, want, have in mismatches:
+            print(f"account {acc_id}: {column} expected {want}, found {have}")
+        if mismatches:
+            print(f"{len(mismatches)} mismatch(es); run 'python -m scripts.rollups rebuild' to repair")
+            return 1
+        print("Rollups match the ledger")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -31,13 +31,14 @@ async function logout() {
 }
 
 // Load Statistics
-async function loadStats() {
+async function loadStats(exact = false) {
     try {
-        const response = await fetch('/api/admin/stats');
+        const response = await fetch('/api/admin/stats' + (exact ? '?exact=1' : ''));
         const data = await response.json();
         
         if (data.success) {
             displayStats(data.stats);
+            document.getElementById('statsAsOf').textContent = `Statistics as of ${data.as_of}`;
         }
     } catch (error) {
         console.error('Error loading stats:', error);
@@ -83,6 +84,64 @@ function displayStats(stats) {
     `;
 }
 
+// Pending queues, keyed by id and kept current by the change feed
+const pendingAccounts = new Map();
+const pendingLoans = new Map();
+let queuesLoading = false;
+let bufferedEvents = [];
+
+// Ids ticked for a bulk action
+const selectedAccounts = new Set();
+const selectedLoans = new Set();
+
+function newestFirst(rows, field) {
+    return Array.from(rows.values()).sort((a, b) => (b[field] || '').localeCompare(a[field] || ''));
+}
+
+// Subscribe to queue changes; the server starts with a 'reset' that loads the full lists
+function startPendingFeed() {
+    const source = new EventSource('/api/admin/pending-feed');
+    source.addEventListener('reset', reloadPendingQueues);
+    source.onmessage = (event) => applyPendingEvents(JSON.parse(event.data));
+}
+
+async function reloadPendingQueues() {
+    queuesLoading = true;
+    await Promise.all([loadPendingAccounts(), loadPendingLoans()]);
+    queuesLoading = false;
+    // Changes that arrived during the reload are applied on top of it
+    const events = bufferedEvents;
+    bufferedEvents = [];
+    applyPendingEvents(events);
+}
+
+function applyPendingEvents(events) {
+    if (queuesLoading) {
+        bufferedEvents.push(...events);
+        return;
+    }
+    
+    let accountsChanged = false;
+    let loansChanged = false;
+    events.forEach(change => {
+        const rows = change.entity_type === 'account' ? pendingAccounts : pendingLoans;
+        let changed;
+        if (change.event === 'created') {
+            // No row means it was already resolved again
+            changed = Boolean(change.row);
+            if (changed) rows.set(change.id, change.row);
+        } else {
+            changed = rows.delete(change.id);
+        }
+        if (changed && change.entity_type === 'account') accountsChanged = true;
+        if (changed && change.entity_type === 'loan') loansChanged = true;
+    });
+    
+    if (accountsChanged) displayPendingAccounts();
+    if (loansChanged) displayPendingLoans();
+    if (accountsChanged || loansChanged) loadStats();
+}
+
 // Load Pending Accounts
 async function loadPendingAccounts() {
     try {
@@ -90,15 +149,19 @@ async function loadPendingAccounts() {
         const data = await response.json();
         
         if (data.success) {
-            displayPendingAccounts(data.accounts);
+            pendingAccounts.clear();
+            data.accounts.forEach(acc => pendingAccounts.set(acc.account_id, acc));
+            displayPendingAccounts();
         }
     } catch (error) {
         console.error('Error loading pending accounts:', error);
     }
 }
 
-function displayPendingAccounts(accounts) {
+function displayPendingAccounts() {
+    const accounts = newestFirst(pendingAccounts, 'created_at');
     const container = document.getElementById('pendingAccountsList');
+    pruneSelection(selectedAccounts, pendingAccounts);
     
     if (accounts.length === 0) {
         container.innerHTML = `
@@ -115,6 +178,8 @@ function displayPendingAccounts(accounts) {
             <table>
                 <thead>
                     <tr>
+                        <th><input type="checkbox" onchange="selectAll(selectedAccounts, pendingAccounts, this.checked)"
+                                   ${accounts.every(acc => selectedAccounts.has(acc.account_id)) ? 'checked' : ''}></th>
                         <th>Account Number</th>
                         <th>Customer Name</th>
                         <th>Email</th>
@@ -127,6 +192,8 @@ function displayPendingAccounts(accounts) {
                 <tbody>
                     ${accounts.map(acc => `
                         <tr>
+                            <td><input type="checkbox" onchange="toggleSelected(selectedAccounts, ${acc.account_id}, this.checked)"
+                                       ${selectedAccounts.has(acc.account_id) ? 'checked' : ''}></td>
                             <td>${acc.account_number}</td>
                             <td>${acc.full_name}</td>
                             <td>${acc.email}</td>
@@ -164,7 +231,8 @@ async function approveAccount(accountId) {
         
         if (data.success) {
             alert(data.message);
-            loadPendingAccounts();
+            pendingAccounts.delete(accountId);
+            displayPendingAccounts();
             loadStats();
         } else {
             alert('Error: ' + data.message);
@@ -182,14 +250,18 @@ async function loadPendingLoans() {
         const data = await response.json();
         
         if (data.success) {
-            displayPendingLoans(data.loans);
+            pendingLoans.clear();
+            data.loans.forEach(loan => pendingLoans.set(loan.loan_id, loan));
+            displayPendingLoans();
         }
     } catch (error) {
         console.error('Error loading pending loans:', error);
     }
 }
 
-function displayPendingLoans(loans) {
+function displayPendingLoans() {
+    const loans = newestFirst(pendingLoans, 'applied_at');
+    pruneSelection(selectedLoans, pendingLoans);
     const container = document.getElementById('pendingLoansList');
     
     if (loans.length === 0) {
@@ -207,6 +279,8 @@ function displayPendingLoans(loans) {
             <table>
                 <thead>
                     <tr>
+                        <th><input type="checkbox" onchange="selectAll(selectedLoans, pendingLoans, this.checked)"
+                                   ${loans.every(loan => selectedLoans.has(loan.loan_id)) ? 'checked' : ''}></th>
                         <th>Loan ID</th>
                         <th>Customer Name</th>
                         <th>Email</th>
@@ -224,6 +298,8 @@ function displayPendingLoans(loans) {
                 <tbody>
                     ${loans.map(loan => `
                         <tr>
+                            <td><input type="checkbox" onchange="toggleSelected(selectedLoans, ${loan.loan_id}, this.checked)"
+                                       ${selectedLoans.has(loan.loan_id) ? 'checked' : ''}></td>
                             <td>#${loan.loan_id}</td>
                             <td>${loan.full_name}</td>
                             <td>${loan.email}</td>
@@ -274,7 +350,8 @@ async function approveLoan(loanId, approve) {
         
         if (data.success) {
             alert(data.message);
-            loadPendingLoans();
+            pendingLoans.delete(loanId);
+            displayPendingLoans();
             loadStats();
         } else {
             alert('Error: ' + data.message);
@@ -285,18 +362,228 @@ async function approveLoan(loanId, approve) {
     }
 }
 
-// Load All Accounts
-async function loadAllAccounts() {
+// Bulk actions
+function toggleSelected(selection, id, checked) {
+    if (checked) {
+        selection.add(id);
+    } else {
+        selection.delete(id);
+    }
+    updateBulkButtons();
+}
+
+function selectAll(selection, rows, checked) {
+    rows.forEach((row, id) => toggleSelected(selection, id, checked));
+    if (selection === selectedAccounts) displayPendingAccounts();
+    else displayPendingLoans();
+}
+
+function pruneSelection(selection, rows) {
+    selection.forEach(id => {
+        if (!rows.has(id)) selection.delete(id);
+    });
+    updateBulkButtons();
+}
+
+function updateBulkButtons() {
+    const accountsButton = document.getElementById('approveSelectedAccounts');
+    accountsButton.disabled = selectedAccounts.size === 0;
+    accountsButton.textContent = `Approve Selected (${selectedAccounts.size})`;
+    ['approveSelectedLoans', 'rejectSelectedLoans'].forEach(buttonId => {
+        const button = document.getElementById(buttonId);
+        button.disabled = selectedLoans.size === 0;
+        button.textContent = `${buttonId.startsWith('approve') ? 'Approve' : 'Reject'} Selected (${selectedLoans.size})`;
+    });
+}
+
+// POST a bulk decision and summarise the per-item results
+async function postBulk(url, body, idField, rows) {
     try {
-        const response = await fetch('/api/admin/all-accounts');
+        const response = await fetch(url, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(body)
+        });
+        const data = await response.json();
+        
+        if (!data.success) {
+            alert('Error: ' + data.message);
+            return;
+        }
+        
+        const failures = data.results.filter(result => !result.success);
+        data.results.filter(result => result.success).forEach(result => rows.delete(result[idField]));
+        let summary = data.message;
+        if (failures.length) {
+            summary += '\n\n' + failures.slice(0, 10).map(f => `#${f[idField]}: ${f.message}`).join('\n');
+            if (failures.length > 10) summary += `\n...and ${failures.length - 10} more`;
+        }
+        alert(summary);
+        displayPendingAccounts();
+        displayPendingLoans();
+        loadStats();
+    } catch (error) {
+        console.error('Error in bulk action:', error);
+        alert('Bulk action failed');
+    }
+}
+
+async function bulkApproveAccounts(useFilter) {
+    let body;
+    if (useFilter) {
+        const filter = {
+            account_type: document.getElementById('bulkAccountType').value,
+            created_before: document.getElementById('bulkAccountsBefore').value
+        };
+        if (!filter.account_type && !filter.created_before) {
+            alert('Choose an account type or a date first');
+            return;
+        }
+        if (!confirm('Approve every pending account matching this filter?')) return;
+        body = { filter };
+    } else {
+        if (!confirm(`Approve ${selectedAccounts.size} selected account(s)?`)) return;
+        body = { account_ids: Array.from(selectedAccounts) };
+    }
+    await postBulk('/api/admin/approve-accounts', body, 'account_id', pendingAccounts);
+}
+
+async function bulkDecideLoans(approve, useFilter) {
+    const action = approve ? 'approve' : 'reject';
+    let body;
+    if (useFilter) {
+        const filter = {
+            loan_type: document.getElementById('bulkLoanType').value,
+            applied_before: document.getElementById('bulkLoansBefore').value
+        };
+        if (!filter.loan_type && !filter.applied_before) {
+            alert('Choose a loan type or a date first');
+            return;
+        }
+        if (!confirm(`${approve ? 'Approve' : 'Reject'} every pending loan matching this filter?`)) return;
+        body = { filter, approve };
+    } else {
+        if (!confirm(`Are you sure you want to ${action} ${selectedLoans.size} selected loan application(s)?`)) return;
+        body = { loan_ids: Array.from(selectedLoans), approve };
+    }
+    await postBulk('/api/admin/approve-loans', body, 'loan_id', pendingLoans);
+}
+
+// Paginated admin listings: one page at a time, with keyset cursors.
+// cursors[i] is the cursor that fetches page i (null for the first page).
+const listings = {
+    accounts: {
+        url: '/api/admin/all-accounts',
+        rowsKey: 'accounts',
+        sort: 'account_id',
+        order: 'desc',
+        filters: {
+            q: 'accountsSearch',
+            status: 'accountsStatus',
+            account_type: 'accountsType',
+            currency: 'accountsCurrency',
+            min_balance: 'accountsMinBalance',
+            max_balance: 'accountsMaxBalance'
+        },
+        cursors: [null],
+        page: 0,
+        display: displayAllAccounts
+    },
+    loans: {
+        url: '/api/admin/all-loans',
+        rowsKey: 'loans',
+        sort: 'applied_at',
+        order: 'desc',
+        filters: {
+            q: 'loansSearch',
+            status: 'loansStatus',
+            loan_type: 'loansType',
+            min_amount: 'loansMinAmount',
+            max_amount: 'loansMaxAmount'
+        },
+        cursors: [null],
+        page: 0,
+        display: displayAllLoans
+    }
+};
+
+function listingQuery(listing) {
+    const params = new URLSearchParams({ sort: listing.sort, order: listing.order });
+    
+    for (const [param, inputId] of Object.entries(listing.filters)) {
+        const value = document.getElementById(inputId).value.trim();
+        if (value) params.set(param, value);
+    }
+    if (listing.cursors[listing.page]) params.set('cursor', listing.cursors[listing.page]);
+    
+    return params.toString();
+}
+
+async function fetchListingPage(name) {
+    const listing = listings[name];
+    
+    try {
+        const response = await fetch(`${listing.url}?${listingQuery(listing)}`);
         const data = await response.json();
         
         if (data.success) {
-            displayAllAccounts(data.accounts);
+            listing.cursors[listing.page + 1] = data.next_cursor;
+            listing.display(data[listing.rowsKey]);
+            displayPager(name, data.has_more);
+        } else {
+            alert(data.message);
         }
     } catch (error) {
-        console.error('Error loading all accounts:', error);
+        console.error(`Error loading ${name}:`, error);
+    }
+}
+
+// Back to the first page, e.g. after a filter changes
+function loadListing(name) {
+    const listing = listings[name];
+    listing.cursors = [null];
+    listing.page = 0;
+    fetchListingPage(name);
+}
+
+function changeListingPage(name, step) {
+    const listing = listings[name];
+    if (step > 0 && !listing.cursors[listing.page + 1]) return;
+    if (step < 0 && listing.page === 0) return;
+    listing.page += step;
+    fetchListingPage(name);
+}
+
+// Clicking a column sorts by it; clicking it again reverses the order
+function sortListing(name, column) {
+    const listing = listings[name];
+    if (listing.sort === column) {
+        listing.order = listing.order === 'desc' ? 'asc' : 'desc';
+    } else {
+        listing.sort = column;
+        listing.order = 'desc';
     }
+    loadListing(name);
+}
+
+function sortableHeader(name, column, label) {
+    const listing = listings[name];
+    const arrow = listing.sort === column ? (listing.order === 'desc' ? ' ▼' : ' ▲') : '';
+    return `<th style="cursor: pointer;" onclick="sortListing('${name}', '${column}')">${label}${arrow}</th>`;
+}
+
+function displayPager(name, hasMore) {
+    const listing = listings[name];
+    document.getElementById(`${name}Pager`).innerHTML = `
+        <button class="btn btn-secondary" onclick="changeListingPage('${name}', -1)" ${listing.page === 0 ? 'disabled' : ''}>Previous</button>
+        <span style="margin: 0 1rem;">Page ${listing.page + 1}</span>
+        <button class="btn btn-secondary" onclick="changeListingPage('${name}', 1)" ${hasMore ? '' : 'disabled'}>Next</button>
+    `;
+}
+
+// Load All Accounts
+function loadAllAccounts() {
+    loadListing('accounts');
 }
 
 function displayAllAccounts(accounts) {
@@ -317,12 +604,12 @@ function displayAllAccounts(accounts) {
             <table>
                 <thead>
                     <tr>
-                        <th>Account Number</th>
+                        ${sortableHeader('accounts', 'account_number', 'Account Number')}
                         <th>Customer Name</th>
                         <th>Email</th>
                         <th>Phone</th>
                         <th>Type</th>
-                        <th>Balance</th>
+                        ${sortableHeader('accounts', 'balance', 'Balance')}
                         <th>Currency</th>
                         <th>Status</th>
                         <th>Transactions</th>
@@ -353,17 +640,8 @@ function displayAllAccounts(accounts) {
 }
 
 // Load All Loans
-async function loadAllLoans() {
-    try {
-        const response = await fetch('/api/admin/all-loans');
-        const data = await response.json();
-        
-        if (data.success) {
-            displayAllLoans(data.loans);
-        }
-    } catch (error) {
-        console.error('Error loading all loans:', error);
-    }
+function loadAllLoans() {
+    loadListing('loans');
 }
 
 function displayAllLoans(loans) {
@@ -384,17 +662,17 @@ function displayAllLoans(loans) {
             <table>
                 <thead>
                     <tr>
-                        <th>Loan ID</th>
+                        ${sortableHeader('loans', 'loan_id', 'Loan ID')}
                         <th>Customer Name</th>
                         <th>Email</th>
                         <th>Account Number</th>
                         <th>Loan Type</th>
-                        <th>Amount</th>
+                        ${sortableHeader('loans', 'loan_amount', 'Amount')}
                         <th>Interest Rate</th>
                         <th>Tenure</th>
                         <th>Monthly EMI</th>
                         <th>Status</th>
-                        <th>Applied Date</th>
+                        ${sortableHeader('loans', 'applied_at', 'Applied Date')}
                     </tr>
                 </thead>
                 <tbody>
@@ -422,6 +700,10 @@ function displayAllLoans(loans) {
 // Initialize on page load
 document.addEventListener('DOMContentLoaded', () => {
     loadStats();
-    loadPendingAccounts();
-    loadPendingLoans();
+    if (window.EventSource) {
+        startPendingFeed();
+    } else {
+        loadPendingAccounts();
+        loadPendingLoans();
+    }
 });
\ No newline at end of file
@@ -375,26 +375,83 @@ function displayLoans(loans) {
 }
 
 // Load Transactions
+let transactionRows = [];
+let transactionCursor = null;
+
+function transactionQuery() {
+    const params = new URLSearchParams();
+    const type = document.getElementById('transactionType').value;
+    const fromDate = document.getElementById('transactionFromDate').value;
+    const toDate = document.getElementById('transactionToDate').value;
+    
+    if (type) params.set('type', type);
+    if (fromDate) params.set('from_date', fromDate);
+    if (toDate) params.set('to_date', toDate);
+    if (transactionCursor) params.set('cursor', transactionCursor);
+    
+    return params.toString();
+}
+
 async function loadTransactions() {
     const accountId = document.getElementById('transactionAccount').value;
     
+    transactionRows = [];
+    transactionCursor = null;
+    
     if (!accountId) {
         document.getElementById('transactionsList').innerHTML = '';
+        document.getElementById('transactionsMore').style.display = 'none';
         return;
     }
     
+    await fetchTransactionPage(accountId);
+}
+
+async function loadMoreTransactions() {
+    const accountId = document.getElementById('transactionAccount').value;
+    
+    if (accountId && transactionCursor) {
+        await fetchTransactionPage(accountId);
+    }
+}
+
+async function fetchTransactionPage(accountId) {
     try {
-        const response = await fetch(`/api/user/transactions/${accountId}`);
+        const response = await fetch(`/api/user/transactions/${accountId}?${transactionQuery()}`);
         const data = await response.json();
         
         if (data.success) {
-            displayTransactions(data.transactions);
+            transactionRows = transactionRows.concat(data.transactions);
+            transactionCursor = data.next_cursor;
+            displayTransactions(transactionRows);
+            document.getElementById('transactionsMore').style.display = data.has_more ? 'block' : 'none';
         }
     } catch (error) {
         console.error('Error loading transactions:', error);
     }
 }
 
+// Download a statement for the selected account and filters
+function downloadStatement(format) {
+    const accountId = document.getElementById('transactionAccount').value;
+    
+    if (!accountId) {
+        alert('Select an account first');
+        return;
+    }
+    
+    const params = new URLSearchParams({ format: format, gzip: '1' });
+    const type = document.getElementById('transactionType').value;
+    const fromDate = document.getElementById('transactionFromDate').value;
+    const toDate = document.getElementById('transactionToDate').value;
+    
+    if (type) params.set('type', type);
+    if (fromDate) params.set('from_date', fromDate);
+    if (toDate) params.set('to_date', toDate);
+    
+    window.location.href = `/api/user/statement/${accountId}?${params.toString()}`;
+}
+
 function displayTransactions(transactions) {
     const container = document.getElementById('transactionsList');
     
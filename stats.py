@@ -0,0 +1,198 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+from mysql.connector import Error
+
+from db import get_db_connection
+from transaction_archive import BEGINNING, transaction_archive
+
+# Seconds a computed snapshot is served before it is recomputed
+STATS_TTL = float(os.environ.get('ADMIN_STATS_TTL', 30))
+# After a write invalidates the snapshot, recompute at most this often
+STATS_MIN_REFRESH = float(os.environ.get('ADMIN_STATS_MIN_REFRESH', 2))
+
+# All dashboard aggregates in one round trip
+ADMIN_STATS_SQL = """
+    SELECT
+        (SELECT COUNT(*) FROM users) as total_users,
+        (SELECT SUM(CASE WHEN is_active = TRUE THEN 1 ELSE 0 END) FROM users) as active_users,
+        (SELECT COUNT(*) FROM accounts) as total_accounts,
+        (SELECT SUM(CASE WHEN status = 'active' THEN 1 ELSE 0 END) FROM accounts) as active_accounts,
+        (SELECT SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END) FROM accounts) as pending_accounts,
+        (SELECT SUM(balance) FROM accounts)
+            + (SELECT COALESCE(SUM(amount), 0) FROM account_balance_slots) as total_balance,
+        (SELECT COUNT(*) FROM loans) as total_loans,
+        (SELECT SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END) FROM loans) as pending_loans,
+        (SELECT SUM(CASE WHEN status IN ('approved', 'disbursed') THEN loan_amount ELSE 0 END)
+         FROM loans) as total_loan_amount,
+        (SELECT COUNT(*) FROM transactions WHERE status = 'completed' AND transaction_date >= %(live_since)s)
+            as total_transactions,
+        (SELECT SUM(amount) FROM transactions WHERE status = 'completed' AND transaction_date >= %(live_since)s)
+            as total_transaction_amount
+"""
+
+# The same aggregates as independent queries, for callers that can run
+# them concurrently (see async_app.py)
+STATS_QUERIES = {
+    'users': """
+        SELECT
+            COUNT(*) as total_users,
+            SUM(CASE WHEN is_active = TRUE THEN 1 ELSE 0 END) as active_users
+        FROM users
+    """,
+    'accounts': """
+        SELECT
+            COUNT(*) as total_accounts,
+            SUM(CASE WHEN status = 'active' THEN 1 ELSE 0 END) as active_accounts,
+            SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END) as pending_accounts,
+            SUM(balance) + (SELECT COALESCE(SUM(amount), 0) FROM account_balance_slots) as total_balance
+        FROM accounts
+    """,
+    'loans': """
+        SELECT
+            COUNT(*) as total_loans,
+            SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END) as pending_loans,
+            SUM(CASE WHEN status IN ('approved', 'disbursed') THEN loan_amount ELSE 0 END) as total_loan_amount
+        FROM loans
+    """,
+    'transactions': """
+        SELECT
+            COUNT(*) as total_transactions,
+            SUM(amount) as total_transaction_amount
+        FROM transactions
+        WHERE status = 'completed' AND transaction_date >= %(live_since)s
+    """
+}
+
+STATS_GROUPS = {
+    'users': ('total_users', 'active_users'),
+    'accounts': ('total_accounts', 'active_accounts', 'pending_accounts', 'total_balance'),
+    'loans': ('total_loans', 'pending_loans', 'total_loan_amount'),
+    'transactions': ('total_transactions', 'total_transaction_amount')
+}
+
+
+def stats_params(group, archived):
+    """Parameters of STATS_QUERIES[group]; transactions count only the months still in MySQL"""
+    return {'live_since': archived.live_since or BEGINNING} if group == 'transactions' else ()
+
+
+def add_archived_totals(stats, archived):
+    """Add the completed transactions of the archived months, from the manifest"""
+    if archived.months:
+        count, amount = archived.totals()
+        transactions = stats['transactions']
+        transactions['total_transactions'] = (transactions['total_transactions'] or 0) + count
+        transactions['total_transaction_amount'] = (transactions['total_transaction_amount'] or 0) + amount
+    return stats
+
+
+def compute_admin_stats():
+    """Run the dashboard aggregates and group them like the API response"""
+    conn = get_db_connection(readonly=True)
+    if not conn:
+        raise Error(msg='Database connection failed')
+
+    archived = transaction_archive.current()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(ADMIN_STATS_SQL, stats_params('transactions', archived))
+        row = cursor.fetchone()
+        cursor.close()
+    finally:
+        conn.close()
+
+    stats = {group: {column: row[column] for column in columns} for group, columns in STATS_GROUPS.items()}
+    return add_archived_totals(stats, archived)
+
+
+class AdminStatsCache:
+    """
+    Serves the admin statistics from memory.
+
+    A snapshot is reused until it is older than `ttl`, or until a write has
+    invalidated it and at least `min_refresh` seconds have passed, so a burst
+    of writes costs one recompute rather than one per dashboard refresh. Only
+    one thread recomputes at a time; the others keep serving the previous
+    snapshot meanwhile.
+    """
+
+    def __init__(self, compute, ttl=STATS_TTL, min_refresh=STATS_MIN_REFRESH):
+        self.compute = compute
+        self.ttl = ttl
+        self.min_refresh = min_refresh
+        self._snapshot = None
+        self._computed_at = 0.0
+        self._as_of = None
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def invalidate(self):
+        self._dirty = True
+
+    def get(self, force=False):
+        """Return (stats, as_of, cached)"""
+        if force:
+            self._refresh_lock.acquire()
+        else:
+            snapshot = self._fresh_snapshot()
+            if snapshot:
+                return snapshot + (True,)
+            # Wait for a concurrent recompute only when there is nothing to serve
+            if not self._refresh_lock.acquire(blocking=self._snapshot is None):
+                with self._lock:
+                    return self._snapshot, self._as_of, True
+
+        try:
+            if not force:
+                snapshot = self._fresh_snapshot()
+                if snapshot:
+                    return snapshot + (True,)
+            self._dirty = False
+            started = time.monotonic()
+            as_of = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            try:
+                stats = self.compute()
+            except Exception:
+                self._dirty = True
+                raise
+            with self._lock:
+                self._snapshot = stats
+                self._computed_at = started
+                self._as_of = as_of
+                return stats, as_of, False
+        finally:
+            self._refresh_lock.release()
+
+    def peek(self):
+        """Return (stats, as_of) if the snapshot can be served, else None"""
+        return self._fresh_snapshot()
+
+    def begin_refresh(self):
+        """Start an external recompute; returns a token for store()"""
+        self._dirty = False
+        return time.monotonic(), datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    def store(self, stats, token):
+        """Install a snapshot computed elsewhere (e.g. by the async app)"""
+        computed_at, as_of = token
+        with self._lock:
+            self._snapshot = stats
+            self._computed_at = computed_at
+            self._as_of = as_of
+        return as_of
+
+    def _fresh_snapshot(self):
+        with self._lock:
+            if self._snapshot is None:
+                return None
+            age = time.monotonic() - self._computed_at
+            if age < self.min_refresh or (age < self.ttl and not self._dirty):
+                return self._snapshot, self._as_of
+            return None
+
+
+admin_stats = AdminStatsCache(compute_admin_stats)
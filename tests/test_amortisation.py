@@ -0,0 +1,70 @@
+from decimal import Decimal
+
+from amortisation import amortise, emi_cents, from_cents, installments, monthly_rate_micros, to_cents
+
+# Rs 10,000 at 12% over 3 months (monthly rate 0.01, EMI Rs 3,400.22), by hand:
+#
+#   month  interest                     principal            balance
+#   1      1000000 * 0.01 = 10000.00    340022 - 10000       669978
+#   2      669978 * 0.01  =  6699.78    340022 - 6700        336656
+#   3      336656 * 0.01  =  3366.56    336656 (the rest)         0
+#
+# and Rs 1,000 at 0% over 2 months, which pays nothing in month 3.
+PRINCIPAL = [1_000_000, 100_000]
+RATES = [10_000, 0]
+EMI = [340_022, 50_000]
+TENURES = [3, 2]
+
+
+def test_monthly_rate_rounds_like_calculate_emi():
+    # 12 / 1200 = 0.01, 10.5 / 1200 = 0.00875, 7.25 / 1200 = 0.0060416... -> 0.006042
+    assert monthly_rate_micros(['12', '10.5', '7.25']).tolist() == [10_000, 8_750, 6_042]
+
+
+def test_emi():
+    # 1000000 * 0.01 * 1.01^3 / (1.01^3 - 1) = 340022.11
+    assert emi_cents([1_000_000], [10_000], [3]).tolist() == [340_022]
+
+
+def test_cents_round_trip():
+    assert to_cents(Decimal('3400.225')) == 340_023
+    assert from_cents(340_023) == Decimal('3400.23')
+
+
+def test_amortise_matches_hand_computed_schedule():
+    schedule = amortise(PRINCIPAL, RATES, EMI, TENURES)
+
+    assert schedule.interest.tolist() == [[10_000, 6_700, 3_367], [0, 0, 0]]
+    assert schedule.principal.tolist() == [[330_022, 333_322, 336_656], [50_000, 50_000, 0]]
+    assert schedule.balance.tolist() == [[669_978, 336_656, 0], [50_000, 0, 0]]
+    # The final installment settles the rounding left by the stored EMI
+    assert schedule.payment.tolist() == [[340_022, 340_022, 340_023], [50_000, 50_000, 0]]
+    assert schedule.principal.sum(axis=1).tolist() == PRINCIPAL
+
+
+def test_amortise_limits_months():
+    schedule = amortise(PRINCIPAL, RATES, EMI, TENURES, months=2)
+
+    assert schedule.payment.shape == (2, 2)
+    assert schedule.balance.tolist() == [[669_978, 336_656], [50_000, 0]]
+
+
+def test_amortise_large_amounts_use_exact_integers():
+    # principal * rate overflows int64, so the object-dtype path is taken
+    schedule = amortise([10 ** 15], [10 ** 5], [10 ** 15], [1])
+
+    assert schedule.interest.tolist() == [[10 ** 14]]
+    assert schedule.principal.tolist() == [[10 ** 15]]
+
+
+def test_installments():
+    schedule = amortise(PRINCIPAL, RATES, EMI, TENURES)
+
+    assert installments(schedule, [3, 1]) == [
+        (Decimal('3400.23'), Decimal('3366.56'), Decimal('33.67'), Decimal('0.00')),
+        (Decimal('500.00'), Decimal('500.00'), Decimal('0.00'), Decimal('500.00'))
+    ]
+    assert installments(schedule, [1, 2], rows=[0, 0]) == [
+        (Decimal('3400.22'), Decimal('3300.22'), Decimal('100.00'), Decimal('6699.78')),
+        (Decimal('3400.22'), Decimal('3333.22'), Decimal('67.00'), Decimal('3366.56'))
+    ]
@@ -0,0 +1,130 @@
+from datetime import datetime
+from decimal import Decimal
+
+from scripts.post_emis import post_chunk
+
+
+class FakeCursor:
+    """Dictionary cursor answering post_chunk()'s two SELECTs and recording its writes"""
+
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+
+    def execute(self, sql, params=()):
+        if sql.startswith('SELECT') and 'FROM accounts' in sql:
+            self.rows = [dict(account) for account in self.db.accounts]
+        elif sql.startswith('SELECT') and 'FROM loan_payments' in sql:
+            self.rows = [{'loan_id': loan_id, 'installment_no': number} for loan_id, number in self.db.posted]
+        else:
+            self.rows = []
+            self.db.writes.append((sql, params))
+
+    def executemany(self, sql, rows):
+        self.db.writes.append((sql, rows))
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, balance, posted=()):
+        self.accounts = [{'account_id': 10, 'balance': Decimal(balance), 'currency': 'INR',
+                          'status': 'active', 'balance_slots': 0}]
+        self.posted = list(posted)
+        self.writes = []
+        self.committed = False
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self)
+
+    def start_transaction(self):
+        pass
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+    def written(self, prefix):
+        """Parameters of every write whose SQL starts with `prefix`"""
+        return [params for sql, params in self.writes if sql.startswith(prefix)]
+
+
+def loan(installment_no):
+    """
+    Rs 10,000 at 12% over 3 months, EMI Rs 3,400.22 (the schedule in
+    test_amortisation.py), with installment `installment_no` due this month
+    """
+    return {
+        'loan_id': 1, 'account_id': 10, 'loan_amount': Decimal('10000.00'),
+        'interest_rate': Decimal('12.00'), 'tenure_months': 3, 'monthly_emi': Decimal('3400.22'),
+        'approved_at': datetime(2024, 1, 15), 'installment_no': installment_no,
+        'due_through': min(installment_no, 3)
+    }
+
+
+def test_missed_installments_are_posted_oldest_first():
+    conn = FakeConnection('10000.00')
+
+    outcomes, overdue = post_chunk(conn, [loan(2)])
+
+    assert outcomes['posted'] == 2
+    assert not overdue
+    [payments] = conn.written('INSERT INTO loan_payments')
+    assert payments == [
+        (1, 1, Decimal('3400.22'), Decimal('3300.22'), Decimal('100.00'), Decimal('6699.78')),
+        (1, 2, Decimal('3400.22'), Decimal('3333.22'), Decimal('67.00'), Decimal('3366.56'))
+    ]
+    [transactions] = conn.written('INSERT INTO transactions')
+    assert [description for *_, description in transactions] == ['EMI 1/3 - Loan ID: 1', 'EMI 2/3 - Loan ID: 1']
+    [balances] = conn.written('UPDATE accounts')
+    assert balances == [10, Decimal('3199.56'), 10]
+    assert not conn.written('UPDATE loans')
+    assert conn.committed
+
+
+def test_already_posted_installments_are_skipped():
+    conn = FakeConnection('10000.00', posted=[(1, 1)])
+
+    outcomes, _ = post_chunk(conn, [loan(2)])
+
+    assert outcomes['posted'] == 1
+    [payments] = conn.written('INSERT INTO loan_payments')
+    assert [number for _, number, *_ in payments] == [2]
+
+
+def test_insufficient_balance_stops_the_loan_at_the_first_unpaid_installment():
+    # Covers installment 1 only; 2 and 3 stay unposted, and the loan is past its tenure
+    conn = FakeConnection('5000.00')
+
+    outcomes, overdue = post_chunk(conn, [loan(4)])
+
+    assert outcomes['posted'] == 1
+    assert outcomes['skipped: insufficient balance'] == 2
+    assert outcomes['loans in arrears'] == 1
+    assert overdue == [(1, 2)]
+    [payments] = conn.written('INSERT INTO loan_payments')
+    assert [number for _, number, *_ in payments] == [1]
+    [balances] = conn.written('UPDATE accounts')
+    assert balances == [10, Decimal('1599.78'), 10]
+    assert not conn.written('UPDATE loans')
+
+
+def test_final_installment_closes_the_loan():
+    conn = FakeConnection('10000.00', posted=[(1, 1), (1, 2)])
+
+    outcomes, _ = post_chunk(conn, [loan(3)])
+
+    assert outcomes['posted'] == 1
+    assert outcomes['loans closed'] == 1
+    [payments] = conn.written('INSERT INTO loan_payments')
+    # The last installment pays off the remaining principal exactly
+    assert payments == [(1, 3, Decimal('3400.23'), Decimal('3366.56'), Decimal('33.67'), Decimal('0.00'))]
+    assert conn.written("UPDATE loans SET status = 'closed'") == [[1]]
+    [audit_rows] = conn.written('INSERT INTO audit_log')
+    assert [(entity, entity_id, action) for entity, entity_id, action, *_ in audit_rows] == [('loan', 1, 'status_change')]
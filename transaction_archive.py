@@ -0,0 +1,234 @@
+"""
+Archived transaction history.
+
+scripts/archive.py moves closed months of the transactions table into one
+Parquet file per month under ARCHIVE_DIR and lists them in manifest.json.
+Archived months are always the oldest ones, so everything before
+`live_since` (the first day after the newest archived month) is read from
+the files and everything from `live_since` on from MySQL. A month is served
+from its file as soon as it is in the manifest, even while its partition is
+still being dropped, so no month is ever counted twice.
+
+Each file has one row per account and side of a transaction, in the shape
+of the history API (type 'Debit' or 'Credit', other_account), sorted by
+account and date. Reading one account's history therefore reads only the
+row groups whose account_id range covers it. A transfer between two
+accounts is stored twice, a deposit or withdrawal once, so every column of
+the original transaction can still be recovered from the file.
+
+The manifest is re-read whenever its modification time changes, so every
+process sharing ARCHIVE_DIR switches over together.
+"""
+import json
+import os
+import threading
+from datetime import datetime
+from decimal import Decimal
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Directory holding the monthly Parquet files and manifest.json; must be
+# shared by every app host
+ARCHIVE_DIR = os.environ.get(
+    'ARCHIVE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'archive', 'transactions')
+)
+MANIFEST_FILE = 'manifest.json'
+
+# Earliest DATETIME MySQL accepts; the live-data cutoff when nothing is archived
+BEGINNING = datetime(1000, 1, 1)
+
+ARCHIVE_SCHEMA = pa.schema([
+    ('account_id', pa.int32()),
+    ('type', pa.string()),
+    ('other_account_id', pa.int32()),
+    ('other_account', pa.string()),
+    ('transaction_id', pa.int32()),
+    ('transaction_type', pa.string()),
+    ('amount', pa.decimal128(15, 2)),
+    ('fee', pa.decimal128(10, 2)),
+    ('currency', pa.string()),
+    ('description', pa.string()),
+    ('transaction_date', pa.timestamp('us')),
+    ('status', pa.string()),
+    ('exchange_rate', pa.decimal128(10, 4)),
+    ('rate_version', pa.string()),
+])
+
+# Columns of a history row, as returned by app.build_history_query
+HISTORY_COLUMNS = ('transaction_id', 'transaction_type', 'amount', 'fee', 'description', 'transaction_date',
+                   'status', 'type', 'other_account')
+
+
+def month_key(month):
+    """'YYYY-MM' for a date in the month"""
+    return f"{month:%Y-%m}"
+
+
+def month_start(key):
+    year, month = key.split('-')
+    return datetime(int(year), int(month), 1)
+
+
+def next_month(start):
+    return start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+
+
+class ArchiveSnapshot:
+    """
+    The archived months as listed by one version of the manifest.
+
+    A request should take one snapshot and use it for both its live query
+    cutoff and its archive reads.
+    """
+
+    def __init__(self, directory, months):
+        self.directory = directory
+        # 'YYYY-MM' -> manifest entry, oldest first
+        self.months = dict(sorted(months.items()))
+        self.live_since = next_month(month_start(max(self.months))) if self.months else None
+
+    def path(self, key):
+        return os.path.join(self.directory, self.months[key]['file'])
+
+    def totals(self):
+        """(count, amount) of completed transactions across archived months"""
+        count = sum(entry['completed_count'] for entry in self.months.values())
+        amount = sum((Decimal(entry['completed_amount']) for entry in self.months.values()), Decimal('0'))
+        return count, amount
+
+    def history(self, account_id, filters, after=None, limit=None, descending=True):
+        """
+        Archived history rows of one account, with the same filters, keyset
+        and order as app.build_history_query.
+        """
+        rows = []
+        for row in self.iter_history(account_id, filters, after, descending):
+            rows.append(row)
+            if limit and len(rows) >= limit:
+                break
+        return rows
+
+    def iter_history(self, account_id, filters, after=None, descending=True):
+        """Generator form of history(), reading one month file at a time"""
+        keys = list(self.months)
+        for key in reversed(keys) if descending else keys:
+            start, end = month_start(key), next_month(month_start(key))
+            if filters.get('from_date') and end <= filters['from_date']:
+                continue
+            if filters.get('to_date') and start >= filters['to_date']:
+                continue
+            if after and (start > after[0] if descending else end <= after[0]):
+                continue
+            rows = [row for row in self._read_account(key, account_id) if self._matches(row, filters, after,
+                                                                                          descending)]
+            rows.sort(key=lambda row: (row['transaction_date'], row['transaction_id']), reverse=descending)
+            for row in rows:
+                yield {column: row[column] for column in HISTORY_COLUMNS}
+
+    def _read_account(self, key, account_id):
+        table = pq.read_table(self.path(key), filters=[('account_id', '=', account_id)])
+        rows = table.to_pylist()
+        # A self-transfer is listed once, as a debit
+        return [row for row in rows if row['type'] == 'Debit' or row['other_account_id'] != account_id]
+
+    @staticmethod
+    def _matches(row, filters, after, descending):
+        if filters.get('direction') and row['type'] != filters['direction'].capitalize():
+            return False
+        if filters.get('types') and row['transaction_type'] not in filters['types']:
+            return False
+        if filters.get('from_date') and row['transaction_date'] < filters['from_date']:
+            return False
+        if filters.get('to_date') and row['transaction_date'] >= filters['to_date']:
+            return False
+        if after:
+            key = (row['transaction_date'], row['transaction_id'])
+            return key < after if descending else key > after
+        return True
+
+    def account_totals(self, account_id=None):
+        """
+        Rollup totals over the archived months, per account, computed the
+        way the maintain_account_rollups trigger counts them:
+        {account_id: {transaction_count, total_credits, total_debits, last_activity}}.
+        """
+        totals = {}
+        for key in self.months:
+            table = pq.read_table(
+                self.path(key),
+                columns=['account_id', 'type', 'other_account_id', 'amount', 'transaction_date'],
+                filters=[('account_id', '=', account_id)] if account_id is not None else None
+            )
+            debit = pc.equal(table['type'], 'Debit')
+            zero = pa.scalar(Decimal('0.00'), table['amount'].type)
+            # A self-transfer adds to credits but is counted once, on the debit side
+            counted = pc.or_kleene(debit, pc.or_kleene(pc.is_null(table['other_account_id']),
+                                                       pc.not_equal(table['other_account_id'], table['account_id'])))
+            grouped = pa.table({
+                'account_id': table['account_id'],
+                'counted': pc.cast(counted, pa.int64()),
+                'credits': pc.if_else(debit, zero, table['amount']),
+                'debits': pc.if_else(debit, table['amount'], zero),
+                'transaction_date': table['transaction_date'],
+            }).group_by('account_id').aggregate([
+                ('counted', 'sum'), ('credits', 'sum'), ('debits', 'sum'), ('transaction_date', 'max')
+            ])
+            for row in grouped.to_pylist():
+                total = totals.setdefault(row['account_id'], {
+                    'transaction_count': 0, 'total_credits': Decimal('0.00'), 'total_debits': Decimal('0.00'),
+                    'last_activity': None
+                })
+                total['transaction_count'] += row['counted_sum']
+                total['total_credits'] += row['credits_sum']
+                total['total_debits'] += row['debits_sum']
+                total['last_activity'] = max(filter(None, (total['last_activity'], row['transaction_date_max'])),
+                                             default=None)
+        return totals
+
+
+class TransactionArchive:
+    """Loads the manifest of ARCHIVE_DIR, again whenever it changes"""
+
+    def __init__(self, directory=ARCHIVE_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._snapshot = ArchiveSnapshot(directory, {})
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.directory, MANIFEST_FILE)
+
+    def current(self):
+        """The ArchiveSnapshot for the manifest as it is now"""
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        with self._lock:
+            if mtime != self._mtime:
+                self._snapshot = ArchiveSnapshot(self.directory, self.read_manifest())
+                self._mtime = mtime
+            return self._snapshot
+
+    def read_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)['months']
+        except FileNotFoundError:
+            return {}
+
+    def write_manifest(self, months):
+        """Replace manifest.json atomically, so readers never see half a file"""
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({'months': dict(sorted(months.items()))}, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.manifest_path)
+
+
+transaction_archive = TransactionArchive()
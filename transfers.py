@@ -0,0 +1,210 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from mysql.connector import Error, errorcode
+
+from account_numbers import recipient_not_found_message
+from hot_accounts import fold_slots
+from rates import RateUnavailable, lookup_rate, rate_service
+
+BATCH_MAX_ITEMS = 1000
+BATCH_DEFAULT_CHUNK = 100
+
+# Same fee as calculate_intl_fee()
+INTL_FEE_RATE = Decimal('0.02')
+
+RETRYABLE_ERRORS = (errorcode.ER_LOCK_DEADLOCK, errorcode.ER_LOCK_WAIT_TIMEOUT)
+CENTS = Decimal('0.01')
+
+
+def to_amount(value):
+    """Parse a transfer amount as a 2-decimal Decimal, or None if invalid"""
+    try:
+        amount = Decimal(str(value)).quantize(CENTS, rounding=ROUND_HALF_UP)
+    except (InvalidOperation, ValueError, TypeError):
+        return None
+    return amount if amount.is_finite() else None
+
+
+def resolve_recipients(cursor, account_numbers):
+    """Look up all recipient accounts with a single query"""
+    numbers = sorted(set(account_numbers))
+    if not numbers:
+        return {}
+    cursor.execute(
+        f"SELECT account_id, account_number FROM accounts "
+        f"WHERE account_number IN ({', '.join(['%s'] * len(numbers))})",
+        numbers
+    )
+    return {row['account_number']: row['account_id'] for row in cursor.fetchall()}
+
+
+def execute_transfer_batch(conn, user_id, from_account, items, chunk_size=BATCH_DEFAULT_CHUNK, atomic=False):
+    """
+    Apply many transfers out of one account.
+
+    Recipients are resolved in one query. Each chunk then runs in its own
+    transaction: every account it touches is locked with a single
+    `SELECT ... ORDER BY account_id FOR UPDATE`, the same canonical order the
+    transfer_money procedure uses, so batches and single transfers cannot
+    deadlock each other. Items that fail validation are reported and skipped.
+    With `atomic`, the whole batch is one chunk and any failure rolls it back.
+
+    Returns one result dict per item, in request order.
+    """
+    cursor = conn.cursor(dictionary=True)
+    try:
+        results = [None] * len(items)
+        pending = []
+        for index, item in enumerate(items):
+            amount = to_amount(item.get('amount'))
+            number = item.get('to_account_number')
+            if amount is None or amount <= 0:
+                results[index] = _failed(index, number, 'Invalid amount')
+            elif not number:
+                results[index] = _failed(index, number, 'Recipient account number is required')
+            else:
+                pending.append((index, number, amount, item.get('description') or 'Money transfer'))
+
+        recipients = resolve_recipients(cursor, [number for _, number, _, _ in pending])
+        conn.commit()
+        # Resolved once, before any row locks are taken
+        rates = rate_service.snapshot(conn)
+
+        ready = []
+        for index, number, amount, description in pending:
+            if number not in recipients:
+                results[index] = _failed(index, number, recipient_not_found_message(number))
+            else:
+                ready.append((index, number, recipients[number], amount, description))
+
+        if atomic and len(ready) != len(items):
+            return _rolled_back(results, items)
+
+        step = len(ready) if atomic else max(1, chunk_size)
+        for start in range(0, len(ready), step or 1):
+            chunk = ready[start:start + step]
+            for attempt in range(3):
+                try:
+                    chunk_results = _apply_chunk(conn, cursor, user_id, from_account, chunk, rates, atomic)
+                    break
+                except Error as e:
+                    conn.rollback()
+                    if e.errno not in RETRYABLE_ERRORS or attempt == 2:
+                        raise
+            for result in chunk_results:
+                results[result['index']] = result
+
+        if atomic and any(not r['success'] for r in results):
+            return _rolled_back(results, items)
+        return results
+    finally:
+        cursor.close()
+
+
+def _apply_chunk(conn, cursor, user_id, from_account, chunk, rates, atomic):
+    account_ids = sorted({from_account} | {to_id for _, _, to_id, _, _ in chunk})
+
+    conn.start_transaction()
+    cursor.execute(
+        f"SELECT account_id, user_id, balance, currency, status, account_type, balance_slots FROM accounts "
+        f"WHERE account_id IN ({', '.join(['%s'] * len(account_ids))}) "
+        f"ORDER BY account_id FOR UPDATE",
+        account_ids
+    )
+    accounts = {row['account_id']: row for row in cursor.fetchall()}
+
+    sender = accounts.get(from_account)
+    if not sender or sender['user_id'] != user_id:
+        conn.rollback()
+        return [_failed(index, number, 'Invalid source account') for index, number, _, _, _ in chunk]
+    if sender['status'] != 'active':
+        conn.rollback()
+        return [_failed(index, number, 'Source account is not active') for index, number, _, _, _ in chunk]
+
+    # Every row is locked for update, so hot recipients are credited on their
+    # balance directly; a hot sender spends its slots too
+    if sender['balance_slots']:
+        sender['balance'] += fold_slots(cursor, [from_account]).get(from_account, 0)
+    balances = {acc_id: row['balance'] for acc_id, row in accounts.items()}
+    rate_table, rates_version = rates
+    results = []
+    rows = []
+    for index, number, to_id, amount, description in chunk:
+        recipient = accounts[to_id]
+        if recipient['status'] != 'active':
+            results.append(_failed(index, number, 'Recipient account is not active'))
+            continue
+
+        fee = Decimal('0.00')
+        converted = amount
+        trans_type = 'transfer'
+        rate = rate_version = None
+        if recipient['account_type'] == 'international' and sender['currency'] == 'INR':
+            try:
+                rate, rate_version = lookup_rate(rate_table, 'INR', recipient['currency']), rates_version
+            except RateUnavailable:
+                results.append(_failed(index, number, 'Exchange rate not available'))
+                continue
+            fee = (amount * INTL_FEE_RATE).quantize(CENTS, rounding=ROUND_HALF_UP)
+            converted = (amount * rate).quantize(CENTS, rounding=ROUND_HALF_UP)
+            trans_type = 'international_transfer'
+
+        if balances[from_account] < amount + fee:
+            results.append(_failed(index, number, 'Insufficient balance'))
+            continue
+
+        balances[from_account] -= amount + fee
+        balances[to_id] += converted
+        rows.append((from_account, to_id, trans_type, amount, fee, sender['currency'], description,
+                     rate, rate_version))
+        results.append({
+            'index': index,
+            'to_account_number': number,
+            'success': True,
+            'message': f'Transfer successful. Fee: {fee}'
+        })
+
+    if not rows or (atomic and len(rows) != len(chunk)):
+        conn.rollback()
+        return results
+
+    changed = [acc_id for acc_id in account_ids if balances[acc_id] != accounts[acc_id]['balance']]
+    if changed:
+        cursor.execute(
+            "UPDATE accounts SET balance = CASE account_id "
+            + ' '.join(['WHEN %s THEN %s'] * len(changed))
+            + f" END WHERE account_id IN ({', '.join(['%s'] * len(changed))})",
+            [value for acc_id in changed for value in (acc_id, balances[acc_id])] + changed
+        )
+
+    cursor.executemany(
+        "INSERT INTO transactions (from_account, to_account, transaction_type, amount, fee, currency, description, "
+        "exchange_rate, rate_version) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+        rows
+    )
+    # We hold the sender's row lock, so the only rows debiting it from the
+    # first new id onwards are the ones just inserted, in insertion order
+    first_id = cursor.lastrowid
+    cursor.execute(
+        "SELECT transaction_id FROM transactions "
+        "WHERE from_account = %s AND transaction_id >= %s ORDER BY transaction_id LIMIT %s",
+        (from_account, first_id, len(rows))
+    )
+    transaction_ids = [row['transaction_id'] for row in cursor.fetchall()]
+    conn.commit()
+
+    successes = (r for r in results if r['success'])
+    for result, transaction_id in zip(successes, transaction_ids):
+        result['transaction_id'] = transaction_id
+    return results
+
+
+def _rolled_back(results, items):
+    return [
+        r if r and not r['success'] else _failed(index, item.get('to_account_number'), 'Batch rolled back')
+        for index, (r, item) in enumerate(zip(results, items))
+    ]
+
+
+def _failed(index, number, message):
+    return {'index': index, 'to_account_number': number, 'success': False, 'message': message}